@@ -0,0 +1,163 @@
+# admission.py
+# Admission control for expensive endpoints (/api/gm: one LLM completion plus
+# Firestore I/O per call). Requests are checked in this order, cheapest first:
+#   1. per-client token bucket          -> 429 with Retry-After
+#   2. per-player single flight         -> 409 with Retry-After
+#   3. global concurrency cap with a bounded wait queue -> 503 with Retry-After
+# so excess load is shed up front instead of queueing until timeouts.
+# Requests of different players for the same state document (SESSION_DOCS=shared)
+# wait for each other in that queue instead of being rejected.
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+_log = logging.getLogger("vexal.admission")
+
+
+class Rejected(Exception):
+    """Raised by AdmissionController.admit; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(self.retry_after)}
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now=None, amount=1.0):
+        """Consume `amount` tokens. Returns 0 on success, else seconds until they are available."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket per key; the least recently used buckets are dropped past `max_keys`."""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def check(self, key, now=None):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+class AdmissionController:
+    """
+    Rate limit, single flight and concurrency cap in one `async with admit(...)`.
+    At most `max_concurrent` requests run; up to `max_queue` more wait (each at most
+    `queue_timeout` seconds) and the rest are rejected immediately. Requests for the
+    same document run one at a time, in arrival order.
+    """
+
+    def __init__(self, rate_per_min=20, burst=5, max_concurrent=8, max_queue=32, queue_timeout=10.0):
+        self.limiter = RateLimiter(rate_per_min / 60.0, burst) if rate_per_min > 0 else None
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._running = 0
+        self._in_flight = set()
+        self._docs = {}   # doc -> [asyncio.Lock, requests holding or waiting for it]
+        self.service_s = 5.0   # moving average of admitted request time, for Retry-After
+
+    def _estimate_wait(self):
+        return self.service_s * (self._waiting + 1) / self.max_concurrent
+
+    async def _enter(self, doc_lock):
+        if doc_lock is not None:
+            await doc_lock.acquire()
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            if doc_lock is not None:
+                doc_lock.release()
+            raise
+
+    def _doc_lock(self, doc):
+        entry = self._docs.get(doc)
+        if entry is None:
+            entry = self._docs[doc] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _drop_doc_lock(self, doc):
+        entry = self._docs[doc]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._docs[doc]
+
+    @asynccontextmanager
+    async def admit(self, client_key, flight_key, doc=None):
+        """
+        client_key: rate-limit bucket (the client's address). flight_key: at most one
+        request in flight per key (one player). doc: requests for the same document queue.
+        """
+        if self.limiter is not None:
+            wait = self.limiter.check(client_key)
+            if wait:
+                raise Rejected(429, "Too many requests. Slow down.", wait)
+        if flight_key in self._in_flight:
+            raise Rejected(409, "A turn is already in progress for this session.", self.service_s)
+        if (self._slots.locked() or doc in self._docs) and self._waiting >= self.max_queue:
+            _log.warning("GM queue full", extra={"running": self._running, "waiting": self._waiting})
+            raise Rejected(503, "The Game Master is busy. Try again shortly.", self._estimate_wait())
+
+        self._in_flight.add(flight_key)
+        doc_lock = self._doc_lock(doc) if doc is not None else None
+        try:
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._enter(doc_lock), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise Rejected(503, "The Game Master is busy. Try again shortly.", self._estimate_wait()) from None
+            finally:
+                self._waiting -= 1
+            self._running += 1
+            t0 = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._running -= 1
+                self._slots.release()
+                if doc_lock is not None:
+                    doc_lock.release()
+                self.service_s = 0.8 * self.service_s + 0.2 * (time.perf_counter() - t0)
+        finally:
+            self._in_flight.discard(flight_key)
+            if doc_lock is not None:
+                self._drop_doc_lock(doc)
+
+    def stats(self):
+        return {"running": self._running, "waiting": self._waiting, "service_s": round(self.service_s, 3)}
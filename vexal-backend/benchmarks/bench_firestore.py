@@ -0,0 +1,87 @@
+# benchmarks/bench_firestore.py
+# Turn persistence latency under concurrency against the Firestore emulator:
+# the old pattern (sync Client called inside async handlers) vs. AsyncFirestoreStore
+# (AsyncClient, get_all for state+lore, one batch commit for state+lore+history).
+#
+#   gcloud emulators firestore start --host-port=localhost:8081
+#   FIRESTORE_EMULATOR_HOST=localhost:8081 python -m benchmarks.bench_firestore [--sessions 200 --turns 5]
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_state_model import sample_state
+from firestore_store import AsyncFirestoreStore
+
+PROJECT = "vexal-bench"
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered), p99
+
+
+async def _sync_turn(db, sid, turn):
+    # What main.py did before: blocking gRPC calls straight from the event loop.
+    doc = db.document(f"bench/{sid}")
+    snap = doc.get()
+    lore = db.document(f"bench/{sid}/data/lore").get()
+    state = snap.to_dict() or sample_state()
+    state["turn"] = turn
+    doc.set(state)
+    db.document(f"bench/{sid}/data/lore").set(lore.to_dict() or {"persons": {}})
+    db.document(f"bench/{sid}/history/{turn:010d}").set({"turn": turn, "command": "look"})
+
+
+async def _async_turn(store, sid, turn):
+    loaded = await store.load(f"bench/{sid}")
+    state = loaded["state"] or sample_state()
+    state["turn"] = turn
+    await store.save(f"bench/{sid}", state=state, lore=loaded["lore"] or {"persons": {}},
+                     history={"turn": turn, "command": "look"})
+
+
+async def _run(turn_fn, client, sessions, turns):
+    latencies = []
+
+    async def session(sid):
+        for turn in range(turns):
+            t0 = time.perf_counter()
+            await turn_fn(client, sid, turn)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session(f"s{i}") for i in range(sessions)))
+    return latencies, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firestore persistence latency benchmark (emulator only)")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST to a running Firestore emulator; this benchmark never touches production.")
+
+    from google.cloud import firestore
+
+    async def bench():
+        results = {"sync client": await _run(_sync_turn, firestore.Client(project=PROJECT), args.sessions, args.turns)}
+        store = AsyncFirestoreStore(firestore.AsyncClient(project=PROJECT))
+        results["AsyncFirestoreStore"] = await _run(_async_turn, store, args.sessions, args.turns)
+        return results
+
+    print(f"{args.sessions} concurrent sessions x {args.turns} turns (load + save per turn)")
+    for label, (latencies, elapsed) in asyncio.run(bench()).items():
+        p50, p99 = _percentiles(latencies)
+        print(f"{label:20s} p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   {len(latencies) / elapsed:8.1f} turns/s")
+
+
+if __name__ == "__main__":
+    main()
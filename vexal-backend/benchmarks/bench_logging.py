@@ -0,0 +1,60 @@
+# benchmarks/bench_logging.py
+# Per-turn logging cost: the old DEBUG f-string state dump vs. the JSON/queue pipeline.
+# Run from vexal-backend/:  python -m benchmarks.bench_logging
+import io
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from log_config import configure_logging, shutdown_logging, state_diff
+
+
+def _state(n_items=200):
+    return {
+        "player": {"hp": 100, "mana": 50, "stamina": 30},
+        "inventory": [{"name": f"Item {i}", "type": "Misc", "weight": i % 7} for i in range(n_items)],
+        "lore": {f"Person {i}": {"notes": ["note"] * 5} for i in range(n_items)},
+    }
+
+
+def _run(fn, turns):
+    t0 = time.perf_counter()
+    for _ in range(turns):
+        fn()
+    return (time.perf_counter() - t0) / turns * 1e6
+
+
+def main(turns=2000):
+    gs = _state()
+    log = logging.getLogger("bench")
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    logging.basicConfig(level=logging.DEBUG, stream=io.StringIO())
+
+    def old_turn():
+        log.info(f"Updated game state: {gs}")
+
+    old_us = _run(old_turn, turns)
+
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    configure_logging(level="INFO", stream=io.StringIO())
+    before = dict(gs["player"])
+
+    def new_turn():
+        log.info("Updated game state", extra={"diff": state_diff(before, gs["player"])})
+
+    new_us = _run(new_turn, turns)
+    shutdown_logging()
+
+    print(f"f-string full dump : {old_us:8.1f} us/turn")
+    print(f"json + diff + queue: {new_us:8.1f} us/turn  ({old_us / max(new_us, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
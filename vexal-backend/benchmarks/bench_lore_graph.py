@@ -0,0 +1,77 @@
+# benchmarks/bench_lore_graph.py
+# Lore graph on a synthetic world: build time, neighbourhood / 2-hop query latency,
+# serialized size, and lazy-load cost (from_bytes + first query).
+# Run from vexal-backend/:  python -m benchmarks.bench_lore_graph [--edges 100000]
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lore_graph import LoreGraph
+
+RELATIONS = (("member_of", "factions"), ("located_in", "locations"), ("ally_of", "persons"),
+             ("enemy_of", "persons"), ("seen_at", "locations"))
+
+
+def synthetic_world(n_edges, seed=0):
+    """Persons, locations and factions in rough proportion 10:3:1, random typed edges."""
+    rng = random.Random(seed)
+    n_nodes = max(10, n_edges // 5)
+    pools = {
+        "persons": [f"Person {i}" for i in range(n_nodes * 10 // 14)],
+        "locations": [f"Location {i}" for i in range(n_nodes * 3 // 14)],
+        "factions": [f"Faction {i}" for i in range(max(1, n_nodes // 14))],
+    }
+    graph = LoreGraph()
+    while len(graph) < n_edges:
+        relation, target_kind = rng.choice(RELATIONS)
+        graph.add_edge(rng.choice(pools["persons"]), relation, rng.choice(pools[target_kind]),
+                       "persons", target_kind)
+    return graph, pools
+
+
+def _time(fn, items):
+    t0 = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - t0) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lore graph benchmark")
+    parser.add_argument("--edges", type=int, default=100_000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    graph, pools = synthetic_world(args.edges)
+    build_s = time.perf_counter() - t0
+    print(f"build            {len(graph.names)} nodes, {len(graph)} edges in {build_s:.2f} s")
+
+    rng = random.Random(1)
+    locations = rng.sample(pools["locations"], min(500, len(pools["locations"])))
+    people = rng.sample(pools["persons"], 500)
+    print(f"neighbors        {_time(graph.neighbors, people):8.1f} us")
+    print(f"2-hop (location) {_time(lambda n: graph.k_hop(n, 2), locations):8.1f} us"
+          f"   ({sum(len(graph.k_hop(n, 2)) for n in locations) / len(locations):.0f} nodes avg)")
+    print(f"2-hop capped 50  {_time(lambda n: graph.edges_within(graph.k_hop(n, 2, max_nodes=50)), locations):8.1f} us"
+          f"   (incl. edges_within, i.e. lore_context)")
+
+    t0 = time.perf_counter()
+    blob = graph.to_bytes()
+    dump_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    lazy = LoreGraph.from_bytes(blob)
+    open_us = (time.perf_counter() - t0) * 1e6
+    t0 = time.perf_counter()
+    lazy.neighbors(people[0])
+    first_ms = (time.perf_counter() - t0) * 1000
+    print(f"to_bytes         {len(blob) / 1024:8.1f} KiB in {dump_ms:.1f} ms "
+          f"({len(blob) / len(graph):.1f} B/edge)")
+    print(f"from_bytes       {open_us:8.1f} us   first query (decode) {first_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_scaleout.py
+# Multi-process scale-out test: starts router.py with 1, 2, 4 ... workers (event-log
+# persistence in a temp dir, one state document per session, a stub LLM that sleeps
+# --llm-ms) and drives concurrent sessions through it. Reports GM turns/s per worker
+# count and checks for lost updates: every session's final state_version must have
+# advanced by exactly its number of successful turns.
+#
+# Run from vexal-backend/:
+#   python -m benchmarks.bench_scaleout --workers 1,2,4 --sessions 32 --turns 5
+#   python -m benchmarks.bench_scaleout --policy round-robin   # no affinity: locks only
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def _worker_app():
+    """main.app with the LLM replaced by a BENCH_LLM_MS sleep (the worker's WORKER_APP)."""
+    import main
+
+    llm_s = float(os.getenv("BENCH_LLM_MS", "200")) / 1000
+
+    class StubCompletion:
+        @staticmethod
+        def create(**kwargs):
+            time.sleep(llm_s)   # runs in a worker thread, like the real client
+            text = "The corridor bends left; torchlight flickers on wet stone."
+            return {"choices": [{"message": {"content": text}}], "usage": {"total_tokens": 120}}
+
+    main.openai_client.factory = lambda: type("StubOpenAI", (), {"ChatCompletion": StubCompletion})
+    main.openai_client.reset()
+    return main.app
+
+
+def __getattr__(name):
+    # uvicorn imports "benchmarks.bench_scaleout:app"; build it only in worker processes.
+    if name == "app":
+        return _worker_app()
+    raise AttributeError(name)
+
+
+async def _wait_ready(client, workers, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status = (await client.get("/_router")).json()
+            if all(w["alive"] for w in status["workers"].values()) and (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"router with {workers} workers did not become ready")
+
+
+async def _session(client, sid, turns, counts):
+    headers = {"X-Session-Id": sid}
+    start = (await client.get("/api/state", headers=headers)).json().get("state_version", 0)
+    ok = 0
+    while ok < turns:
+        response = await client.post("/api/gm", json={"prompt": f"look around ({ok})"}, headers=headers)
+        if response.status_code == 200:
+            ok += 1
+        elif response.status_code in (409, 429, 503):
+            counts["retried"] += 1
+            await asyncio.sleep(0.05)
+        else:
+            counts["errors"] += 1
+            await asyncio.sleep(0.05)
+    final = (await client.get("/api/state", headers=headers)).json().get("state_version", 0)
+    if final - start != ok:
+        counts["lost"] += 1
+    return ok
+
+
+async def drive(port, workers, sessions, turns):
+    import httpx
+
+    counts = {"retried": 0, "errors": 0, "lost": 0}
+    limits = httpx.Limits(max_connections=sessions * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120.0, limits=limits) as client:
+        await _wait_ready(client, workers)
+        t0 = time.perf_counter()
+        done = await asyncio.gather(*(_session(client, f"bench-{i}", turns, counts) for i in range(sessions)))
+        elapsed = time.perf_counter() - t0
+    return sum(done), elapsed, counts
+
+
+def run(workers, args):
+    with tempfile.TemporaryDirectory() as log_dir:
+        env = {**os.environ, "WORKERS": str(workers), "PORT": str(args.port),
+               "WORKER_BASE_PORT": str(args.port + 1), "WORKER_APP": "benchmarks.bench_scaleout:app",
+               "ROUTER_POLICY": args.policy, "BENCH_LLM_MS": str(args.llm_ms), "PERSISTENCE_MODE": "events",
+               "EVENT_LOG_DIR": log_dir, "SESSION_DOCS": "header", "GM_RATE_PER_MIN": "0", "LOG_LEVEL": "WARNING"}
+        router = subprocess.Popen([sys.executable, "-c", _LAUNCH], cwd=BACKEND, env=env)
+        try:
+            return asyncio.run(drive(args.port, workers, args.sessions, args.turns))
+        finally:
+            router.terminate()
+            try:
+                router.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                router.kill()
+
+
+# Always go through the router (also for one worker) so every run pays the same proxy hop.
+_LAUNCH = """
+import os, uvicorn, router
+n = int(os.environ["WORKERS"]); port = int(os.environ["PORT"]); base = int(os.environ["WORKER_BASE_PORT"])
+app = router.create_router([(f"w{i}", base + i) for i in range(n)], app_spec=os.environ["WORKER_APP"],
+                           router_url=f"http://127.0.0.1:{port}", policy=os.environ["ROUTER_POLICY"])
+uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GM turn throughput vs. number of workers")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=5, help="successful turns per session")
+    parser.add_argument("--llm-ms", type=float, default=200.0)
+    parser.add_argument("--policy", choices=("hash", "round-robin"), default="hash")
+    parser.add_argument("--port", type=int, default=8700)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.sessions} sessions x {args.turns} turns, LLM {args.llm_ms:g} ms, "
+          f"policy {args.policy}")
+    base = None
+    lost = 0
+    for workers in (int(w) for w in args.workers.split(",")):
+        turns, elapsed, counts = run(workers, args)
+        rate = turns / elapsed
+        base = base or rate
+        lost += counts["lost"]
+        print(f"{workers:2d} workers  {rate:8.1f} turns/s  x{rate / base:4.2f}  retried {counts['retried']:5d}  "
+              f"errors {counts['errors']:3d}  sessions with lost updates {counts['lost']}")
+    sys.exit(1 if lost else 0)
+
+
+if __name__ == "__main__":
+    main()
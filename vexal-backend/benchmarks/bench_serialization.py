@@ -0,0 +1,48 @@
+# benchmarks/bench_serialization.py
+# Response/persistence encoding cost: FastAPI's jsonable_encoder + json.dumps vs. serialization.dumps (orjson) and CBOR.
+# Run from vexal-backend/:  python -m benchmarks.bench_serialization
+import json
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.bench_state_model import sample_state
+from serialization import dumps, loads, orjson, to_cbor
+
+
+def _large_state(n_items=300, n_lore=500):
+    gs = sample_state()
+    gs["inventory"] = [{"name": f"Item {i}", "material": "Steel", "weight": i % 9} for i in range(n_items)]
+    gs["lore"] = OrderedDict(
+        (f"entity_{i}", {"type": "NPC", "tags": {"village", f"faction_{i % 7}"}, "mentions": i})
+        for i in range(n_lore))
+    return gs
+
+
+def _time(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    if orjson is None:
+        print("orjson is not installed; serialization.dumps is using the stdlib fallback")
+    for label, state, n in (("turn state", sample_state(), 20000), ("large state", _large_state(), 200)):
+        baseline = lambda: json.dumps(jsonable_encoder(state)).encode("utf-8")
+        body = dumps(state)
+        assert loads(body).keys() == loads(baseline()).keys()  # set order differs, contents match
+        print(f"{label:12s} jsonable_encoder+json {_time(baseline, n):9.1f} us"
+              f"   dumps {_time(lambda: dumps(state), n):7.1f} us ({len(body)} B)"
+              f"   cbor {_time(lambda: to_cbor(state), n):7.1f} us ({len(to_cbor(state))} B)"
+              f"   loads {_time(lambda: loads(body), n):7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_snapshots.py
+# Idle-session memory and per-turn snapshot cost: deepcopy vs. copy-on-write state.
+# Run from vexal-backend/:  python -m benchmarks.bench_snapshots
+import copy
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from snapshots import CowDict, StateHistory
+from benchmarks.bench_state_model import sample_state
+
+
+def _template(n_items=300):
+    gs = sample_state()
+    gs["inventory"] = [{"name": f"Item {i}", "material": "Steel", "weight": i % 9} for i in range(n_items)]
+    gs["equipment"] = {slot: {"type": "Armor", "material": "Steel"} for slot in ("Head", "Torso", "Legs", "Hands")}
+    return gs
+
+
+def _mem_per(build, n):
+    tracemalloc.start()
+    objs = [build() for _ in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return size / n
+
+
+def main(sessions=2000, turns=500):
+    template = _template()
+    print(f"idle session     deepcopy {_mem_per(lambda: copy.deepcopy(template), sessions):9.0f} B"
+          f"   CowDict {_mem_per(lambda: CowDict(template), sessions):6.0f} B")
+
+    def play(history_kind):
+        gs = copy.deepcopy(template) if history_kind == "deepcopy" else CowDict(template)
+        history = [] if history_kind == "deepcopy" else StateHistory(max_turns=turns)
+        for turn in range(turns):
+            gs["hp"] = 100 - turn % 50
+            gs["conditions"]["Fatigued"] = bool(turn % 2)
+            if history_kind == "deepcopy":
+                history.append(copy.deepcopy(gs))
+            else:
+                history.record(turn, gs.freeze())
+        return history
+
+    for kind in ("deepcopy", "cow"):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        hist = play(kind)
+        elapsed = (time.perf_counter() - t0) / turns * 1e6
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del hist
+        print(f"{kind:9s} history of {turns} turns: {size / 1024:8.1f} KiB  {elapsed:7.1f} us/turn")
+
+
+if __name__ == "__main__":
+    main()
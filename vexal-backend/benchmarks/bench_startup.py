@@ -0,0 +1,67 @@
+# benchmarks/bench_startup.py
+# Cold-start cost of the API: `import main` time (and its heaviest imports), then
+# startup-to-first-response latency, each measured in a fresh interpreter.
+# Run from vexal-backend/:  python -m benchmarks.bench_startup [--runs 5]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+_FIRST_REQUEST = """
+import time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t_started = time.perf_counter()
+    client.get("/api/state")
+    t_first = time.perf_counter()
+print(f"{(t_import - t0) * 1000:.1f} {(t_started - t_import) * 1000:.1f} {(t_first - t_started) * 1000:.1f}")
+"""
+
+
+def _run(args, env):
+    return subprocess.run([sys.executable, *args], cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+
+
+def heaviest_imports(env, top=8):
+    """Cumulative -X importtime of main's direct imports, slowest first."""
+    stderr = _run(["-X", "importtime", "-c", "import main"], env).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            rows.append((int(parts[1]) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PERSISTENCE_MODE="events", EVENT_LOG_DIR=tmp, LOG_LEVEL="WARNING")
+        samples = [list(map(float, _run(["-c", _FIRST_REQUEST], env).stdout.split())) for _ in range(args.runs)]
+        imports = heaviest_imports(env)
+
+    for i, label in enumerate(("import main", "startup handlers", "first /api/state")):
+        values = [s[i] for s in samples]
+        print(f"{label:18s} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    print("heaviest imports of main (cumulative):")
+    for ms, name in imports:
+        print(f"  {ms:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_state_model.py
+# Memory, copy and hash cost of a session's dict game_state (the stored form),
+# next to a copy-on-write fork. sample_state is the fixture the other benchmarks share.
+# Run from vexal-backend/:  python -m benchmarks.bench_state_model
+import copy
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from snapshots import CowDict
+
+
+def sample_state(seed=0):
+    skills = {
+        "Combat": {"One-Handed": 30, "Two-Handed": 15, "Archery": 20, "Block": 12, "Dodge": 18},
+        "Social": {"Persuasion": 25, "Intimidation": 8, "Deception": 5},
+        "Body": {"Athletics": 28, "Stealth": 14, "Survival": 9},
+        "Magic": {"Restoration": 11, "Destruction": 7, "Alteration": 3},
+    }
+    return {
+        "attributes": {"STR": 14 + seed % 3, "DEX": 12, "CON": 13, "INT": 10, "WIS": 11, "CHA": 9},
+        "hp": 100, "hp_max": 100, "mana": 50, "mana_max": 50, "stamina": 30, "stamina_max": 30,
+        "conditions": {"Fatigued": True, "Blessed": True},
+        "skills": skills,
+        "skills_exp": {c: {s: seed % 7 for s in sks} for c, sks in skills.items()},
+        "level": 3, "experience": 40, "experience_next": 100,
+        "game_datetime": "1000-01-01T08:00:00", "hours_per_turn": 6,
+    }
+
+
+def _mem(build, n):
+    tracemalloc.start()
+    objs = [build(i) for i in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return size / n
+
+
+def _time(fn, n=20000):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main(n=5000):
+    template = sample_state()
+    dict_bytes = _mem(lambda i: json.loads(json.dumps(sample_state(i))), n)
+    fork_bytes = _mem(lambda i: CowDict(template), n)
+
+    print(f"memory/session   dict {dict_bytes:8.0f} B   cow fork {fork_bytes:8.0f} B")
+    print(f"copy             deepcopy {_time(lambda: copy.deepcopy(template)):6.1f} us   cow fork {_time(lambda: CowDict(template)):6.1f} us")
+    dict_hash = lambda: hashlib.blake2b(json.dumps(template, sort_keys=True).encode(), digest_size=16).hexdigest()
+    print(f"hash             json+blake2b {_time(dict_hash):6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/replay.py
+# Load generator driven by recorded traffic (see traffic.py). Every recorded session
+# becomes a virtual player that sends its turns with the recorded think times,
+# compressed by --speed; --sessions clones recorded sessions (with jittered start
+# times) or keeps only the first N. A player waits for its previous turn before
+# sending the next, as the frontend does, and falls behind schedule when the
+# target is slow - that lag is reported next to latency and status counts.
+#
+# Run from vexal-backend/, against a deployment whose LLM is benchmarks.stub_llm:
+#   python -m benchmarks.replay traces.vxt --target http://localhost:8080 --speed 10 --sessions 200
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from traffic import read_traces, synthetic_prompt
+
+
+def sessions_from_traces(traces):
+    """[[(offset_s, record)]] per recorded session, offsets relative to the first trace."""
+    records = sorted(traces, key=lambda r: r["t"])
+    if not records:
+        return []
+    t0 = records[0]["t"]
+    by_session = defaultdict(list)
+    for record in records:
+        by_session[record["session"]].append((record["t"] - t0, record))
+    return sorted(by_session.values(), key=lambda turns: turns[0][0])
+
+
+def plan(recorded, n_sessions=None, speed=1.0, seed=0):
+    """
+    [[(scheduled_s, record)]] per virtual session. Sessions beyond the recorded ones
+    are clones shifted by up to one median think time, so copies do not fire in lockstep.
+    """
+    rng = random.Random(seed)
+    n_sessions = len(recorded) if n_sessions is None else n_sessions
+    virtual = []
+    for v in range(n_sessions):
+        turns = recorded[v % len(recorded)]
+        shift = 0.0
+        if v >= len(recorded):
+            gaps = [b[0] - a[0] for a, b in zip(turns, turns[1:])]
+            shift = rng.uniform(0, statistics.median(gaps) if gaps else 1.0)
+        virtual.append([((offset + shift) / speed, record) for offset, record in turns])
+    return virtual
+
+
+async def _player(client, sid, turns, start, results, rng, deadline):
+    for scheduled, record in turns:
+        if scheduled > deadline:
+            return
+        delay = start + scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent = time.perf_counter()
+        headers = {"X-Session-Id": sid}
+        try:
+            if record.get("method", "POST") == "POST":
+                prompt = synthetic_prompt(record.get("prompt_chars", 20), rng)
+                response = await client.post(record["path"], json={"prompt": prompt}, headers=headers)
+            else:
+                response = await client.get(record["path"], headers=headers)
+            status = response.status_code
+        except Exception as exc:
+            status = type(exc).__name__
+        results.append({"status": status, "ms": (time.perf_counter() - sent) * 1000,
+                        "lag_ms": max(0.0, sent - start - scheduled) * 1000})
+
+
+async def replay(target, virtual, duration=None, timeout=120.0, seed=0):
+    import httpx
+
+    rng = random.Random(seed)
+    results = []
+    limits = httpx.Limits(max_connections=max(1, len(virtual)), max_keepalive_connections=max(1, len(virtual)))
+    deadline = duration if duration is not None else float("inf")
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_player(client, f"replay-{i}", turns, start, results, rng, deadline)
+                               for i, turns in enumerate(virtual)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def report(results, elapsed, scheduled):
+    ok = [r["ms"] for r in results if r["status"] == 200]
+    statuses = Counter(str(r["status"]) for r in results)
+    lags = [r["lag_ms"] for r in results]
+    print(f"{len(results)}/{scheduled} requests in {elapsed:.1f} s ({len(results) / max(elapsed, 1e-9):.1f} req/s)")
+    print("status  " + "  ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    if ok:
+        print(f"latency (200)  p50 {_pct(ok, 0.5):8.1f} ms   p95 {_pct(ok, 0.95):8.1f} ms   "
+              f"p99 {_pct(ok, 0.99):8.1f} ms")
+    if lags:
+        print(f"schedule lag   p50 {_pct(lags, 0.5):8.1f} ms   p99 {_pct(lags, 0.99):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against a deployment")
+    parser.add_argument("trace", type=Path, help="traffic trace file (TRAFFIC_TRACE_PATH output)")
+    parser.add_argument("--target", default="http://localhost:8080")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression, e.g. 1, 10 or 100")
+    parser.add_argument("--sessions", type=int, default=None, help="virtual players (default: as recorded)")
+    parser.add_argument("--duration", type=float, default=None, help="stop scheduling after this many seconds")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    recorded = sessions_from_traces(read_traces(args.trace))
+    if not recorded:
+        sys.exit(f"No traces in {args.trace}")
+    virtual = plan(recorded, args.sessions, args.speed, args.seed)
+    scheduled = sum(1 for turns in virtual for at, _ in turns if args.duration is None or at <= args.duration)
+    span = max(turns[-1][0] for turns in virtual)
+    print(f"{len(recorded)} recorded sessions -> {len(virtual)} players, {scheduled} requests over "
+          f"{span:.1f} s at {args.speed:g}x against {args.target}")
+    results, elapsed = asyncio.run(replay(args.target, virtual, args.duration, args.timeout, args.seed))
+    report(results, elapsed, scheduled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/stub_llm.py
+# OpenAI-compatible stand-in for load tests. POST /v1/chat/completions waits for a
+# latency drawn from the llm_ms values of a traffic trace (see traffic.py) and
+# answers with filler text of a recorded response length, so a replayed deployment
+# sees the production latency distribution without calling (or paying for) the LLM.
+#
+# Run from vexal-backend/:
+#   python -m benchmarks.stub_llm traces.vxt --port 8089 [--latency-scale 1.0]
+# and start the target with OPENAI_API_BASE=http://localhost:8089/v1
+# (OPENAI_BASE_URL for openai>=1.0) and any non-empty OPENAI_API_KEY.
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from traffic import EmpiricalDistribution, read_traces
+
+FILLER = ("The torchlight gutters as you move deeper into the ruins. Somewhere ahead, "
+          "water drips onto stone and a distant bell answers your footsteps. ")
+
+
+def create_app(traces, latency_scale=1.0, seed=None):
+    from fastapi import FastAPI
+
+    records = [r for r in traces if r.get("llm_ms") is not None]
+    latency = EmpiricalDistribution((r["llm_ms"] for r in records), default=800.0)
+    length = EmpiricalDistribution((r.get("response_chars") for r in records), default=400)
+    rng = random.Random(seed)
+    app = FastAPI()
+    app.state.served = 0
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(body: dict):
+        await asyncio.sleep(latency.sample(rng) * latency_scale / 1000)
+        chars = int(length.sample(rng))
+        content = (FILLER * (chars // len(FILLER) + 1))[:chars]
+        app.state.served += 1
+        return {
+            "id": f"stub-{app.state.served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": chars // 4, "total_tokens": chars // 4},
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"served": app.state.served, "samples": len(latency),
+                "llm_ms_p50": latency.percentile(0.5), "llm_ms_p99": latency.percentile(0.99)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub replaying recorded LLM latency")
+    parser.add_argument("trace", type=Path, help="traffic trace file (TRAFFIC_TRACE_PATH output)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply recorded latencies")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    traces = list(read_traces(args.trace))
+    app = create_app(traces, args.latency_scale, args.seed)
+    print(f"stub LLM on http://{args.host}:{args.port}/v1 with {len(traces)} traces")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
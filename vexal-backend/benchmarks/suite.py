@@ -0,0 +1,444 @@
+# benchmarks/suite.py
+# Offline performance regression suite: stubbed LLM, local event log, Streamlit in
+# bare mode - no network and no credentials. Every case runs at a realistic size
+# ("1x") and at 100x that size, and reports microseconds per operation.
+#
+# Each timing is also divided by a fixed pure-Python calibration loop measured right
+# before it, so a baseline recorded on one machine stays roughly comparable on
+# another and CPU frequency drift during a run cancels out. The baseline stores only
+# these normalized values. A case fails when its normalized time exceeds the baseline
+# by more than --threshold (I/O-bound cases allow more, see case()); suspected
+# regressions are re-measured first, to keep scheduler noise out of the verdict.
+#
+# data.py (item/material tables) is not part of this tree; when it cannot be
+# imported a small fixture stands in for it, and likewise a minimal bare-mode
+# module for Streamlit when that is not installed.
+#
+# Run from vexal-backend/:
+#   python -m benchmarks.suite                      # compare against benchmarks/baseline.json
+#   python -m benchmarks.suite --update-baseline    # record a new baseline
+#   python -m benchmarks.suite -k lore --threshold 0.5
+# Exit status: 0 ok, 1 regression, 2 no baseline to compare against.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_state_model import sample_state
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+SCALES = (1, 100)
+MIN_REPEAT = 3   # fewer repeats are too noisy to gate on
+CASES = {}
+THRESHOLDS = {}   # case -> allowed slowdown overriding --threshold when larger
+
+
+def case(name, threshold=None):
+    """
+    Register `build(scale) -> (fn, ops)`: `fn()` performs `ops` operations at the given
+    data scale. Cases whose modules cannot be imported here are reported as skipped.
+    `threshold`: a wider allowed slowdown for cases dominated by I/O and scheduling.
+    """
+    def register(build):
+        CASES[name] = build
+        if threshold is not None:
+            THRESHOLDS[name] = threshold
+        return build
+    return register
+
+
+class Skip(Exception):
+    pass
+
+
+def _require(module):
+    try:
+        return __import__(module)
+    except ImportError as exc:
+        raise Skip(str(exc)) from None
+
+
+def _stub_module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    module.__bench_fixture__ = True
+    sys.modules[name] = module
+    return module
+
+
+def _cache_decorator(*args, **kwargs):
+    """st.cache_data / st.cache_resource stand-in: no caching, original on __wrapped__."""
+    def wrap(fn):
+        def cached(*a, **kw):
+            return fn(*a, **kw)
+        cached.__wrapped__ = fn
+        return cached
+    return wrap(args[0]) if args and callable(args[0]) else wrap
+
+
+class _SessionState(dict):
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+    __delattr__ = dict.__delitem__
+
+
+def _ensure_fixtures():
+    """Install the data.py fixture (and bare Streamlit) where the real modules are missing."""
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        noop = lambda *a, **kw: None   # noqa: E731
+        _stub_module("streamlit", session_state=_SessionState(), cache_data=_cache_decorator,
+                     cache_resource=_cache_decorator, success=noop, warning=noop, info=noop, error=noop,
+                     logger=_stub_module("streamlit.logger", set_log_level=noop))
+    try:
+        import data  # noqa: F401
+    except ImportError:
+        _stub_module("data", INITIAL_GAME_STATE=scaled_state(1),
+                     MAT_PROPS={"Iron": {"Dex_Penalty": -2, "Armor": 20}, "Leather": {"Dex_Penalty": 0, "Armor": 8}})
+
+
+def _fixture_note():
+    stubbed = [name for name in ("data", "streamlit") if getattr(sys.modules.get(name), "__bench_fixture__", False)]
+    return f" (fixtures for: {', '.join(stubbed)})" if stubbed else ""
+
+
+def _session_state():
+    st = _require("streamlit")
+    from streamlit import logger as st_logger
+
+    st_logger.set_log_level("error")   # bare mode warns on every session_state access
+    return st.session_state
+
+
+# ----------------- fixtures -----------------
+_FIRST = ["Mera", "Tovin", "Ashka", "Orlen", "Belis", "Corvan", "Ysra", "Daleth", "Kestra", "Umbren"]
+_PLACES = ["Khar Ruins", "Vel Harbor", "Greymarsh", "Sunken Archive", "Iron Gate", "Thornwood"]
+
+
+def narrative(scale):
+    """A GM narration paragraph; 100x repeats it with fresh names so the lore keeps growing."""
+    parts = []
+    for i in range(scale):
+        person = f"{_FIRST[i % len(_FIRST)]} {_FIRST[(i * 7 + 3) % len(_FIRST)]}on"
+        place = _PLACES[i % len(_PLACES)]
+        parts.append(
+            f"You step into {place} as rain hammers the stones. {person} the archivist waits by the gate, "
+            f"clutching a fragment of the Bastion. The Iron Order has sealed the roads, and whispers of "
+            f"Vexal spread through the market. You attack the shadow that lunges from the alley.")
+    return " ".join(parts)
+
+
+def lore_markdown(scale):
+    lines = []
+    for section in ("Persons", "Locations", "Factions"):
+        lines.append(f"## {section}")
+        for i in range(15 * scale):
+            lines.append(f"**{section[:-1]} {i}** — A figure of some renown in the northern reaches.")
+            lines.append("- Role: Keeper of records")
+            lines.append("- Located in: Khar Ruins, Vel Harbor")
+            lines.append("- Tags: scholar, vexal, bastion")
+            lines.append("Seen often near the old archive after dusk.")
+    return "\n".join(lines)
+
+
+def scaled_state(scale):
+    """sample_state plus a player block and inventory/equipment that grow with `scale`."""
+    gs = sample_state()
+    gs["player"] = {"hp": 100, "mana": 50, "stamina": 30}
+    gs["inventory"] = [{"name": f"Item {i}", "type": "Misc", "weight": 1.0, "value": i}
+                       for i in range(20 * scale)]
+    gs["equipment"] = {slot: {"name": f"{slot} plate", "type": "Armor", "material": "Iron"}
+                       for slot in ("Head", "Torso", "Legs", "Hands", "OffHand")}
+    return gs
+
+
+# ----------------- cases -----------------
+@case("gm_roundtrip", threshold=0.6)
+def gm_roundtrip(scale):
+    """
+    POST /api/gm end to end (admission, event-log persistence, delta bookkeeping) from
+    8 concurrent clients, each playing its own session, with an instant stub LLM.
+    100x carries a 100x larger game state.
+    """
+    # main reads these at import time.
+    os.environ.setdefault("PERSISTENCE_MODE", "events")
+    os.environ.setdefault("EVENT_LOG_DIR", tempfile.mkdtemp(prefix="vexal-bench-events-"))
+    os.environ.setdefault("GM_RATE_PER_MIN", "0")
+    os.environ.setdefault("GM_MAX_QUEUE", "1000")
+    os.environ["SESSION_DOCS"] = "header"
+    httpx = _require("httpx")
+    main = _require("main")
+    if main.SESSION_DOCS != "header":
+        raise Skip("main was imported before SESSION_DOCS=header was set")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    class StubCompletion:
+        @staticmethod
+        def create(**kwargs):
+            return {"choices": [{"message": {"content": "You attack the shadow. It recoils into the rain."}}]}
+
+    class StubOpenAI:
+        ChatCompletion = StubCompletion
+
+    main.openai_client.factory = lambda: StubOpenAI
+    main.openai_client.reset()
+    if main.event_store.get() is None:
+        raise Skip("main is not in events persistence mode")
+
+    clients, turns = 8, 4
+    sessions = [f"bench{scale}x-c{cid}" for cid in range(clients)]
+    for session in sessions:
+        store = main.event_store_for(f"sessions/{session}")
+        if store.log.last_seq() == 0:
+            store.append_turn(None, None, {}, scaled_state(scale))
+
+    async def client(http, session):
+        for _ in range(turns):
+            r = await http.post("/api/gm", json={"prompt": "attack"}, headers={"X-Session-Id": session})
+            r.raise_for_status()
+
+    async def burst():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            await asyncio.gather(*(client(http, session) for session in sessions))
+
+    return (lambda: asyncio.run(burst())), clients * turns
+
+
+@case("update_game_state")
+def update_game_state(scale):
+    _require("main")
+    import main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    gs = scaled_state(scale)
+    response = narrative(scale)
+
+    def run():
+        gs["player"]["stamina"] = 30
+        main.update_game_state(gs, response)
+
+    return run, 1
+
+
+@case("get_effective_stats")
+def get_effective_stats(scale):
+    _session_state()
+    game_state = _require("game_state")
+    from conditions import CONDITION_EFFECTS
+
+    gs = scaled_state(scale)
+    gs["conditions"] = {name: True for name in CONDITION_EFFECTS}
+    gs["conditions"].update({f"Custom {i}": True for i in range(5 * (scale - 1))})
+    compute = game_state.get_effective_stats.__wrapped__   # the uncached computation
+    return (lambda: compute(gs)), 1
+
+
+@case("update_condition_timers")
+def update_condition_timers(scale):
+    state = _session_state()
+    game_state = _require("game_state")
+
+    names = [f"Condition {i}" for i in range(5 * scale)]
+    gs = scaled_state(scale)
+    state.game_state = gs
+
+    def run():
+        gs["conditions"] = dict.fromkeys(names, True)
+        state.condition_timers = {name: i % 3 for i, name in enumerate(names)}
+        game_state.update_condition_timers()
+
+    return run, 1
+
+
+@case("gain_experience")
+def gain_experience(scale):
+    state = _session_state()
+    skills = _require("skills")
+
+    gs = scaled_state(1)
+    if scale > 1:
+        gs["skills"] = {f"{cat} {i}": dict(sks) for i in range(scale) for cat, sks in gs["skills"].items()}
+        gs["skills_exp"] = {cat: dict.fromkeys(sks, 0) for cat, sks in gs["skills"].items()}
+    state.game_state = gs
+
+    def run():
+        gs["experience"] = 0
+        skills.gain_experience(25)
+
+    return run, 1
+
+
+@case("parse_markdown_entries")
+def parse_markdown_entries(scale):
+    _session_state()
+    lore = _require("lore")
+    text = lore_markdown(scale)
+    return (lambda: lore._parse_markdown_entries(text)), 1
+
+
+@case("auto_extract_and_add")
+def auto_extract_and_add(scale):
+    state = _session_state()
+    lore = _require("lore")
+
+    text = narrative(scale)
+    for key in ("lore", "lore_index", "lore_graph"):
+        if key in state:
+            del state[key]
+    lore.auto_extract_and_add(text)   # first call registers the entities; time the steady state
+    return (lambda: lore.auto_extract_and_add(text)), 1
+
+
+@case("inventory_equip")
+def inventory_equip(scale):
+    """
+    game_state.equip_item / unequip_item of one armor piece, as the app calls them, with
+    20x`scale` items in the bags (2 ops).
+    """
+    state = _session_state()
+    game_state = _require("game_state")
+    from snapshots import CowDict
+
+    gs = scaled_state(scale)
+    gs["inventory"].append({"id": "bench-helm", "name": "Iron helm", "type": "Armor", "material": "Iron",
+                            "slot": "Head"})
+    state.game_state = gs = CowDict(gs)
+    game_state.assign_ids(gs)
+    game_state.unequip_item("Head")
+
+    def run():
+        game_state.equip_item("bench-helm")
+        game_state.unequip_item("Head")
+
+    return run, 2
+
+
+@case("inventory_stats")
+def inventory_stats(scale):
+    """Equipment modifiers of a state with 20x`scale` items, as get_effective_stats reads them (version checked)."""
+    inventory = _require("inventory")
+
+    gs = scaled_state(scale)
+    inventory.Inventory.from_state(gs, mat_props={"Iron": {"Dex_Penalty": -2}}).write_to(gs)
+    return (lambda: inventory.equipment_modifiers(gs)), 1
+
+
+# ----------------- runner -----------------
+def _calibration():
+    total = 0
+    for i in range(20000):
+        total += i * i % 7
+    return total
+
+
+def measure(fn, ops=1, repeat=5):
+    """Best-of-`repeat` microseconds per operation (each repeat runs at least ~0.2 s)."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number / ops * 1e6
+
+
+def run_case(fn, ops, repeat):
+    """(us per op, us per op / calibration us), calibrated right before the case runs."""
+    calibration = measure(_calibration, repeat=repeat)
+    us = measure(fn, ops, repeat)
+    return us, us / calibration
+
+
+def run_cases(selected, repeat):
+    """{case: (fn, ops)} as built, {case: (us, normalized)} and {case: reason} for skips."""
+    built, results, skipped = {}, {}, {}
+    for name in selected:
+        for scale in SCALES:
+            key = f"{name}[{scale}x]"
+            try:
+                built[key] = CASES[name](scale)
+            except Skip as reason:
+                skipped[key] = str(reason)
+                continue
+            results[key] = run_case(*built[key], repeat)
+    return built, results, skipped
+
+
+def change(result, base):
+    """Normalized slowdown vs. a baseline entry (0.1 == 10% slower)."""
+    return result[1] / base["normalized"] - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance regression suite")
+    parser.add_argument("--update-baseline", action="store_true", help=f"write results to {BASELINE.name}")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown vs. baseline, as a fraction (default 0.25)")
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help=f"timing repeats per case (at least {MIN_REPEAT})")
+    parser.add_argument("--retries", type=int, default=2, help="re-measurements before reporting a regression")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    args = parser.parse_args()
+    if args.repeat < MIN_REPEAT:
+        print(f"--repeat {args.repeat} is too noisy to gate on; using {MIN_REPEAT}.")
+        args.repeat = MIN_REPEAT
+
+    _ensure_fixtures()
+    selected = [name for name in CASES if args.pattern in name]
+    built, results, skipped = run_cases(selected, args.repeat)
+
+    if args.update_baseline:
+        cases = {}
+        if args.pattern and args.baseline.exists():
+            cases = json.loads(args.baseline.read_text())["cases"]
+        # Only calibration-normalized values: absolute timings belong to one machine.
+        cases.update({key: {"normalized": round(norm, 6)} for key, (us, norm) in results.items()})
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "cases": dict(sorted(cases.items())),
+        }, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline} ({len(results)} cases){_fixture_note()}")
+        for key, reason in skipped.items():
+            print(f"  skipped {key}: {reason}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        return 2
+    baseline = json.loads(args.baseline.read_text())["cases"]
+    print(f"{'case':36s} {'us/op':>12s} {'normalized':>12s} {'baseline':>12s} {'change':>9s}"
+          f"   (threshold +{args.threshold:.0%}){_fixture_note()}")
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:36s} {result[0]:12.2f} {result[1]:12.6f} {'-':>12s} {'new':>9s}")
+            continue
+        threshold = max(args.threshold, THRESHOLDS.get(key.split("[")[0], 0))
+        for _ in range(args.retries):
+            if change(result, base) <= threshold:
+                break
+            result = min(result, run_case(*built[key], args.repeat), key=lambda r: r[1])
+        flag = ""
+        if change(result, base) > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:36s} {result[0]:12.2f} {result[1]:12.6f} {base['normalized']:12.6f} "
+              f"{change(result, base):+9.1%}{flag}")
+    for key, reason in skipped.items():
+        print(f"{key:36s} {'skipped':>12s}  ({reason})")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
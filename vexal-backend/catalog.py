@@ -0,0 +1,59 @@
+# catalog.py
+# Static game catalog (conditions, materials, skills) served to the frontend by /api/catalog.
+# Built once per process; the version is a content hash, used as the ETag and as
+# the frontend's cache key, so the Python definitions stay the single source of truth.
+import gzip
+import hashlib
+import json
+import logging
+
+from conditions import CONDITION_EFFECTS
+from state_model import CONDITION_BITS
+
+_log = logging.getLogger("vexal.catalog")
+_catalog = None
+
+
+class Catalog:
+    """Serialized catalog plus its version/ETag and a pre-compressed body."""
+    __slots__ = ("data", "version", "etag", "body", "gzip_body")
+
+    def __init__(self, data):
+        content = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.version = hashlib.sha256(content).hexdigest()[:16]
+        self.data = {"version": self.version, **data}
+        self.body = json.dumps(self.data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{self.version}"'
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+
+
+def _game_data():
+    """MAT_PROPS and the starting skill table from data.py, if it is deployed."""
+    try:
+        from data import INITIAL_GAME_STATE, MAT_PROPS
+    except ImportError:
+        _log.warning("data module not available; catalog ships without materials and skills")
+        return {}, {}
+    return MAT_PROPS, INITIAL_GAME_STATE.get("skills", {})
+
+
+def build_catalog():
+    materials, skills = _game_data()
+    conditions = {
+        # `id` is the condition's bit index in state_model, usable as a compact reference.
+        name: {"id": CONDITION_BITS[name].bit_length() - 1, **effect}
+        for name, effect in CONDITION_EFFECTS.items()
+    }
+    return Catalog({
+        "conditions": conditions,
+        "materials": materials,
+        "skills": {cat: sorted(sks) for cat, sks in skills.items()},
+    })
+
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = build_catalog()
+    return _catalog
+
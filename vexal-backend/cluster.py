@@ -0,0 +1,321 @@
+# cluster.py
+# Multi-worker support: consistent-hash session routing, a shared cache/lock tier
+# and cross-worker invalidation messages.
+#
+# Workers keep per-session data in memory (recent state versions, speculation,
+# pub/sub subscribers). With several workers that stays correct because:
+#   - router.py sends every request of a session to the worker that owns it on a
+#     HashRing, so those in-memory copies are the ones that get hit;
+#   - a GM turn holds the session's lock in the shared tier, so two workers never
+#     run turns on one session at once (e.g. while a worker restarts);
+#   - the committed state_version is written to the shared tier before the lock is
+#     released; a worker whose copy is older reloads from storage (version fencing),
+#     and a "committed" message tells the other workers to drop theirs right away.
+#
+# Limitation: locks are plain TTL leases without a fencing token. A turn that runs
+# longer than its TTL (GM_TURN_LOCK_TTL) silently loses the lock, another worker
+# can then start a turn on the same session, and storage does not reject the
+# older holder's late write. Keep the TTL well above the slowest turn.
+#
+# If the tier itself is unreachable, lock() raises TierUnavailable (callers answer
+# 503); a failed release is only logged, and the lease expires after its TTL.
+#
+# Shared tiers (one async interface):
+#   LocalCache  - in-process, the single-worker default
+#   HttpCache   - served by router.py under /_cluster for the workers it starts
+#   RedisCache  - Redis, for workers on several hosts / Cloud Run instances (optional dependency)
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional: only needed for RedisCache
+    aioredis = None
+
+from pubsub import InMemoryHub
+from serialization import dumps, loads
+
+_log = logging.getLogger("vexal.cluster")
+
+TOKEN_HEADER = "X-Cluster-Token"
+LOCK_POLL_S = 0.05   # retry interval of a waiting lock()
+
+
+class TierUnavailable(Exception):
+    """The shared tier could not be reached to take a lock."""
+
+
+class LockHeld(Exception):
+    """The lock is held by someone else (and was not released within the `wait` given to lock())."""
+
+
+# ----------------- routing -----------------
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing with `replicas` virtual points per node: adding or removing
+    one of N nodes moves only ~1/N of the keys.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self._points = []   # sorted hashes
+        self._owners = {}   # hash -> node
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.remove(point)
+
+    def node_for(self, key):
+        if not self._points:
+            raise LookupError("hash ring is empty")
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[i]]
+
+
+# ----------------- shared tiers -----------------
+class SharedCache:
+    """
+    Interface: get/set/delete of JSON values, non-blocking named locks with a TTL
+    (so a crashed holder cannot wedge a session), and publish() to the other workers.
+    """
+    distributed = False
+
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id or os.getenv("WORKER_ID") or uuid.uuid4().hex[:8]
+        self._handlers = []
+
+    def on_message(self, handler):
+        """Call `handler(message)` for messages published by other workers."""
+        self._handlers.append(handler)
+
+    def deliver(self, message):
+        if message.get("origin") == self.worker_id:
+            return
+        for handler in self._handlers:
+            try:
+                handler(message)
+            except Exception:
+                _log.exception("Cluster message handler failed")
+
+    @asynccontextmanager
+    async def lock(self, name, ttl=60.0, wait=0.0):
+        """Hold lock `name` for at most `ttl` seconds; retry for up to `wait` seconds before raising LockHeld."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                acquired = await self.acquire(name, token, ttl)
+            except Exception as exc:   # httpx.HTTPError, redis errors, bad responses
+                raise TierUnavailable(name) from exc
+            if acquired:
+                break
+            if time.monotonic() >= deadline:
+                raise LockHeld(name)
+            await asyncio.sleep(LOCK_POLL_S)
+        try:
+            yield
+        finally:
+            try:
+                await self.release(name, token)
+            except Exception:
+                _log.warning("Could not release lock %s; it expires after %ss", name, ttl, exc_info=True)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class LocalCache(SharedCache):
+    """In-process tier: correct for one worker, and the store behind router.py's /_cluster."""
+
+    def __init__(self, worker_id=None):
+        super().__init__(worker_id)
+        self._values = {}   # key -> (value, expires_at or None)
+        self._locks = {}    # name -> (token, expires_at)
+
+    def _live(self, table, key):
+        item = table.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del table[key]
+            return None
+        return item
+
+    async def get(self, key):
+        item = self._live(self._values, key)
+        return None if item is None else item[0]
+
+    async def set(self, key, value, ttl=None):
+        self._values[key] = (value, None if ttl is None else time.monotonic() + ttl)
+
+    async def delete(self, key):
+        self._values.pop(key, None)
+
+    async def acquire(self, name, token, ttl):
+        if self._live(self._locks, name) is not None:
+            return False
+        self._locks[name] = (token, time.monotonic() + ttl)
+        return True
+
+    async def release(self, name, token):
+        item = self._locks.get(name)
+        if item is None or item[0] != token:
+            return False
+        del self._locks[name]
+        return True
+
+    async def publish(self, message):
+        pass   # no other workers
+
+
+class HttpCache(SharedCache):
+    """Client of the tier router.py serves at `url` (http://127.0.0.1:<port>/_cluster)."""
+    distributed = True
+
+    def __init__(self, url, worker_id=None, token=None):
+        import httpx
+
+        super().__init__(worker_id)
+        self.url = url.rstrip("/")
+        headers = {TOKEN_HEADER: token or os.getenv("CLUSTER_TOKEN", "")}
+        self._client = httpx.AsyncClient(base_url=self.url, headers=headers, timeout=5.0)
+
+    async def get(self, key):
+        r = await self._client.get(f"/cache/{key}")
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return loads(r.content)["value"]
+
+    async def set(self, key, value, ttl=None):
+        (await self._client.put(f"/cache/{key}", content=dumps({"value": value, "ttl": ttl}))).raise_for_status()
+
+    async def delete(self, key):
+        (await self._client.delete(f"/cache/{key}")).raise_for_status()
+
+    async def acquire(self, name, token, ttl):
+        r = await self._client.post(f"/lock/{name}", content=dumps({"token": token, "ttl": ttl}))
+        r.raise_for_status()
+        return loads(r.content)["acquired"]
+
+    async def release(self, name, token):
+        r = await self._client.request("DELETE", f"/lock/{name}", content=dumps({"token": token}))
+        r.raise_for_status()
+        return loads(r.content)["released"]
+
+    async def publish(self, message):
+        r = await self._client.post("/publish", content=dumps({**message, "origin": self.worker_id}))
+        r.raise_for_status()
+
+    async def stop(self):
+        await self._client.aclose()
+
+
+# Release only if we still own the lock (it may have expired and been taken over).
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end
+"""
+
+
+class RedisCache(SharedCache):
+    """Shared tier on Redis; messages travel on one pub/sub channel."""
+    distributed = True
+
+    def __init__(self, url, worker_id=None, prefix="vexal:cluster:"):
+        if aioredis is None:
+            raise RuntimeError("redis is not installed")
+        super().__init__(worker_id)
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+        self._release = self.redis.register_script(_RELEASE_LUA)
+        self._task = None
+
+    async def get(self, key):
+        raw = await self.redis.get(self.prefix + key)
+        return None if raw is None else loads(raw)
+
+    async def set(self, key, value, ttl=None):
+        await self.redis.set(self.prefix + key, dumps(value), px=None if ttl is None else int(ttl * 1000))
+
+    async def delete(self, key):
+        await self.redis.delete(self.prefix + key)
+
+    async def acquire(self, name, token, ttl):
+        return bool(await self.redis.set(f"{self.prefix}lock:{name}", token, nx=True, px=int(ttl * 1000)))
+
+    async def release(self, name, token):
+        return bool(await self._release(keys=[f"{self.prefix}lock:{name}"], args=[token]))
+
+    async def publish(self, message):
+        await self.redis.publish(self.prefix + "messages", dumps({**message, "origin": self.worker_id}))
+
+    async def start(self):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.prefix + "messages")
+        self._task = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        async for item in pubsub.listen():
+            if item.get("type") == "message":
+                try:
+                    self.deliver(loads(item["data"]))
+                except ValueError:
+                    _log.warning("Dropping malformed cluster message")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        await self.redis.aclose()
+
+
+def create_cache(url=None, worker_id=None):
+    """LocalCache by default; HttpCache for http(s):// URLs, RedisCache for redis(s):// URLs."""
+    if url and url.startswith(("redis://", "rediss://")):
+        return RedisCache(url, worker_id)
+    if url and url.startswith(("http://", "https://")):
+        return HttpCache(url, worker_id)
+    return LocalCache(worker_id)
+
+
+# ----------------- pub/sub over the shared tier -----------------
+class ClusterHub(InMemoryHub):
+    """
+    Pub/sub hub that forwards published messages to the other workers through the
+    shared tier, so SSE/WebSocket subscribers on any worker see every commit.
+    """
+
+    def __init__(self, cache, queue_size=64):
+        super().__init__(queue_size)
+        self.cache = cache
+        cache.on_message(self._on_message)
+
+    async def publish(self, topic, message):
+        self.deliver(topic, message)
+        await self.cache.publish({"type": "hub", "topic": topic, "message": message})
+
+    def _on_message(self, message):
+        if message.get("type") == "hub":
+            self.deliver(message["topic"], message["message"])
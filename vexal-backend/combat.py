@@ -0,0 +1,173 @@
+# combat.py
+# Vectorized combat resolution for many combatants per round.
+#
+# Combatants are packed into numpy arrays (one row each) built from effective
+# stats (game_state.get_effective_stats output), equipment and MAT_PROPS.
+# Every roll comes from a caller-supplied numpy Generator, so a fight replays
+# exactly from its seed.
+import re
+
+import numpy as np
+
+from inventory import ARMOR_SLOTS, WEAPON_SLOTS
+from state_model import CONDITION_BITS
+
+UNARMED_DICE = (1, 4)
+# A single hit dealing at least this fraction of max HP leaves the target Wounded.
+WOUND_FRACTION = 0.25
+WOUNDED_BIT = CONDITION_BITS["Wounded"]
+_DICE_RX = re.compile(r"^\s*(\d*)d(\d+)\s*([+-]\s*\d+)?\s*$", re.IGNORECASE)
+
+
+def parse_dice(spec, default=UNARMED_DICE):
+    """'2d6+1' -> (2, 6, 1). Malformed specs fall back to `default` with no bonus."""
+    m = _DICE_RX.match(str(spec or ""))
+    if not m:
+        return default[0], default[1], 0
+    bonus = int(m.group(3).replace(" ", "")) if m.group(3) else 0
+    return int(m.group(1) or 1), int(m.group(2)), bonus
+
+
+def _mod(score):
+    return (score - 10) // 2
+
+
+def combatant_from_state(effective, equipment=None, hp=None, conditions=(), mat_props=None, hp_max=100):
+    """
+    Build one combatant row (a dict of scalars) from effective stats and equipment.
+    `effective` is get_effective_stats() output; armor comes from item armorValue,
+    else the material's MAT_PROPS "Armor" value. `hp_max` is the unmodified cap from
+    the player's pools (player["hp_max"]); the conditions' hp_max_penalty is applied to it.
+    """
+    if mat_props is None:
+        from data import MAT_PROPS as mat_props
+    attrs = effective.get("attributes", {})
+    equipment = equipment or {}
+    armor = 0
+    for slot in ARMOR_SLOTS:
+        item = equipment.get(slot)
+        if item and item.get("type") == "Armor":
+            armor += item.get("armorValue", mat_props.get(item.get("material"), {}).get("Armor", 0))
+    weapon = next((equipment[s] for s in WEAPON_SLOTS if equipment.get(s)), None)
+    n, sides, bonus = parse_dice(weapon.get("damage") if weapon else None)
+    hp_max = max(1, hp_max + effective.get("hp_max_penalty", 0))
+    cond_bits = 0
+    for name in conditions:
+        cond_bits |= CONDITION_BITS.get(name, 0)
+    return {
+        "hp": hp_max if hp is None else hp,
+        "hp_max": hp_max,
+        "attack": _mod(attrs.get("STR", 10)),
+        "defense": 10 + _mod(attrs.get("DEX", 10)) + armor // 10,
+        "soak": armor // 20,
+        "dice_n": n,
+        "dice_sides": sides,
+        "damage_bonus": bonus + _mod(attrs.get("STR", 10)),
+        "conditions": cond_bits,
+    }
+
+
+class Combatants:
+    """Struct-of-arrays for combatant rows (see combatant_from_state for the fields)."""
+    FIELDS = ("hp", "hp_max", "attack", "defense", "soak", "dice_n", "dice_sides", "damage_bonus", "conditions")
+
+    def __init__(self, rows):
+        for field in self.FIELDS:
+            setattr(self, field, np.array([r[field] for r in rows], dtype=np.int64))
+
+    @classmethod
+    def tile(cls, row, n):
+        """n identical copies of one combatant (Monte-Carlo setups)."""
+        obj = cls.__new__(cls)
+        for field in cls.FIELDS:
+            setattr(obj, field, np.full(n, row[field], dtype=np.int64))
+        return obj
+
+    def __len__(self):
+        return len(self.hp)
+
+    @property
+    def alive(self):
+        return self.hp > 0
+
+
+def _roll_dice(rng, n, sides):
+    """Sum of n[i] dice with sides[i] faces for every i (vectorized, ragged counts)."""
+    max_n = int(n.max()) if len(n) else 0
+    if max_n == 0:
+        return np.zeros(len(n), dtype=np.int64)
+    rolls = rng.integers(1, sides[:, None] + 1, size=(len(n), max_n))
+    return np.where(np.arange(max_n)[None, :] < n[:, None], rolls, 0).sum(axis=1)
+
+
+def resolve_attacks(rng, attackers, att_idx, defenders, def_idx, apply=True):
+    """
+    Resolve attacks att_idx[i] -> def_idx[i] simultaneously. Dead attackers do not act.
+    With apply=True the damage and Wounded condition are applied to `defenders`
+    (several hits on one target accumulate). Returns per-attack arrays: hit, crit, damage.
+    """
+    att_idx = np.asarray(att_idx)
+    def_idx = np.asarray(def_idx)
+    acting = attackers.hp[att_idx] > 0
+    d20 = rng.integers(1, 21, size=len(att_idx))
+    crit = (d20 == 20) & acting
+    hit = acting & (d20 != 1) & ((d20 + attackers.attack[att_idx] >= defenders.defense[def_idx]) | crit)
+
+    dice_n = attackers.dice_n[att_idx] * np.where(crit, 2, 1)
+    raw = _roll_dice(rng, dice_n, attackers.dice_sides[att_idx]) + attackers.damage_bonus[att_idx]
+    damage = np.where(hit, np.maximum(raw - defenders.soak[def_idx], 1), 0)
+    if apply:
+        apply_damage(defenders, def_idx, damage)
+    return {"hit": hit, "crit": crit, "damage": damage}
+
+
+def apply_damage(defenders, def_idx, damage):
+    """Subtract damage (accumulating repeats), clamp at 0 and mark heavy hits as Wounded."""
+    np.subtract.at(defenders.hp, def_idx, damage)
+    np.maximum(defenders.hp, 0, out=defenders.hp)
+    wounded = def_idx[damage >= defenders.hp_max[def_idx] * WOUND_FRACTION]
+    defenders.conditions[wounded] |= WOUNDED_BIT
+
+
+def simulate_duels(a, b, n_fights=100_000, seed=0, max_rounds=50):
+    """
+    Monte-Carlo duels between combatant rows `a` and `b`, all fights in parallel.
+    Both sides strike simultaneously each round. Deterministic for a given seed.
+    Returns win rates, draw rate and mean rounds.
+    """
+    rng = np.random.default_rng(seed)
+    side_a = Combatants.tile(a, n_fights)
+    side_b = Combatants.tile(b, n_fights)
+    idx = np.arange(n_fights)
+    rounds = np.zeros(n_fights, dtype=np.int64)
+    for _ in range(max_rounds):
+        live = idx[side_a.alive & side_b.alive]
+        if not len(live):
+            break
+        rounds[live] += 1
+        a_hits = resolve_attacks(rng, side_a, live, side_b, live, apply=False)
+        b_hits = resolve_attacks(rng, side_b, live, side_a, live, apply=False)
+        apply_damage(side_b, live, a_hits["damage"])
+        apply_damage(side_a, live, b_hits["damage"])
+    a_win = side_a.alive & ~side_b.alive
+    b_win = side_b.alive & ~side_a.alive
+    return {
+        "a_win": float(a_win.mean()),
+        "b_win": float(b_win.mean()),
+        "draw": float(1.0 - a_win.mean() - b_win.mean()),
+        "mean_rounds": float(rounds.mean()),
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    knight = combatant_from_state(
+        {"attributes": {"STR": 16, "DEX": 12}},
+        {"Torso": {"type": "Armor", "armorValue": 30}, "MainHand": {"damage": "1d8"}}, mat_props={}, hp_max=100)
+    goblin = combatant_from_state(
+        {"attributes": {"STR": 10, "DEX": 14}},
+        {"MainHand": {"damage": "1d6"}}, mat_props={}, hp_max=40)
+    t0 = time.perf_counter()
+    result = simulate_duels(knight, goblin, n_fights=100_000, seed=42)
+    print(result, f"{time.perf_counter() - t0:.2f}s for 100k fights")
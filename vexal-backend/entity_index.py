@@ -0,0 +1,124 @@
+# entity_index.py
+# Name resolution for lore entities, so "Archivist Mera", "Mera" and
+# "mera the archivist" all land on one canonical entry.
+#
+# Lookup order, cheapest first:
+#   1. exact normalized key   - casefolded, accents/punctuation/articles dropped, tokens sorted
+#   2. core key               - the same without titles ("archivist", "lord", ...), if unambiguous
+#   3. fuzzy                  - core-key trigram candidates scored by Jaccard similarity (typos,
+#                               spelling variants); titles never count towards the score, so
+#                               "Sister Nira" does not resolve to "Sister Mira"
+# Short core names need a near-exact match (SHORT_THRESHOLD): one wrong letter in
+# a four-letter name is a different person, not a typo.
+# Fuzzy candidates come only from the query's rarest trigrams (prefix filtering:
+# a match above the threshold must share at least one of them), so common grams
+# like "lor"/"ord" never fan out and resolution stays well under a millisecond.
+import math
+import re
+import unicodedata
+
+STOP_WORDS = frozenset({"the", "a", "an", "of"})
+TITLES = frozenset({
+    "archivist", "scholar", "priest", "priestess", "captain", "lord", "lady", "sir", "dame",
+    "king", "queen", "prince", "princess", "magister", "master", "mistress", "merchant",
+    "clerk", "keeper", "elder", "brother", "sister", "father", "mother", "old", "young",
+})
+FUZZY_THRESHOLD = 0.6
+SHORT_THRESHOLD = 0.8
+SHORT_CORE_CHARS = 6
+MIN_FUZZY_CHARS = 4
+_TOKEN_RX = re.compile(r"[a-z0-9]+")
+_POSSESSIVE_RX = re.compile(r"['’]s\b")
+
+
+def name_tokens(name):
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").casefold()
+    return [t for t in _TOKEN_RX.findall(_POSSESSIVE_RX.sub("", text)) if t not in STOP_WORDS]
+
+
+def normalize_name(name):
+    """Order-insensitive key: 'Mera the Archivist' and 'Archivist Mera' -> 'archivist mera'."""
+    return " ".join(sorted(set(name_tokens(name))))
+
+
+def core_name(name):
+    """normalize_name without titles: 'Archivist Mera' -> 'mera'."""
+    return " ".join(sorted({t for t in name_tokens(name) if t not in TITLES}))
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class EntityIndex:
+    """Normalized-name, alias and trigram index mapping name variants to canonical names."""
+
+    def __init__(self, threshold=FUZZY_THRESHOLD, short_threshold=SHORT_THRESHOLD):
+        self.threshold = threshold
+        self.short_threshold = short_threshold
+        self._exact = {}   # normalized key -> canonical
+        self._core = {}    # core key -> {canonical}
+        self._grams = {}   # trigram -> {core key}
+        self._core_grams = {}  # core key -> its trigrams
+
+    def __len__(self):
+        return len(set(self._exact.values()))
+
+    def add(self, canonical, aliases=()):
+        """Register `canonical` and its aliases (all resolve to `canonical`)."""
+        for name in (canonical, *aliases):
+            key = normalize_name(name)
+            if not key or key in self._exact:
+                continue
+            self._exact[key] = canonical
+            core = core_name(name)
+            if not core:
+                continue
+            self._core.setdefault(core, set()).add(canonical)
+            if core not in self._core_grams:
+                grams = self._core_grams[core] = trigrams(core)
+                for gram in grams:
+                    self._grams.setdefault(gram, set()).add(core)
+
+    def resolve(self, name):
+        """Canonical name for `name`, or None if it matches nothing (or is ambiguous)."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        found = self._exact.get(key)
+        if found is not None:
+            return found
+        core = core_name(name)
+        matches = self._core.get(core) if core else None
+        if matches and len(matches) == 1:
+            return next(iter(matches))
+        if len(core) < MIN_FUZZY_CHARS:
+            return None
+        return self._fuzzy(core)
+
+    def _fuzzy(self, core):
+        threshold = self.short_threshold if len(core) < SHORT_CORE_CHARS else self.threshold
+        grams = trigrams(core)
+        rarest = sorted(grams, key=lambda gram: len(self._grams.get(gram, ())))
+        prefix = len(grams) - math.ceil(threshold * len(grams)) + 1
+        candidates = set()
+        for gram in rarest[:prefix]:
+            candidates.update(self._grams.get(gram, ()))
+        scores = {}
+        for candidate in candidates:
+            other = self._core_grams[candidate]
+            n = len(grams & other)
+            score = n / (len(grams) + len(other) - n)
+            if score < threshold:
+                continue
+            if len(candidate) < SHORT_CORE_CHARS and score < self.short_threshold:
+                continue   # a long typo must not land on a short name either
+            for canonical in self._core[candidate]:   # a shared core scores a tie below
+                scores[canonical] = max(score, scores.get(canonical, 0.0))
+        if not scores:
+            return None
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if len(ranked) > 1 and ranked[1][1] == ranked[0][1]:
+            return None   # tie between different entities: don't guess
+        return ranked[0][0]
@@ -0,0 +1,229 @@
+# event_log.py
+# Event-sourced persistence: each turn appends {command, response, delta} to an
+# append-only log and a full snapshot is written every `snapshot_every` turns.
+# Loading replays the deltas recorded after the newest snapshot.
+#
+# Two log backends share one interface:
+#   SegmentFileLog     - local directory of rotating JSON-lines segment files
+#   FirestoreEventLog  - `events` / `snapshots` subcollections under a session document
+import logging
+import os
+import time
+from copy import deepcopy
+from pathlib import Path
+
+from serialization import dumps, loads
+from state_sync import apply_delta, state_delta
+
+_log = logging.getLogger("vexal.event_log")
+
+
+# ----------------- Local segment files -----------------
+class SegmentFileLog:
+    """
+    Append-only JSON-lines log split into segments of at most `segment_bytes`.
+    Snapshots are separate files named by the sequence number they cover.
+    """
+
+    def __init__(self, directory, segment_bytes=1 << 20):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self._seq = None
+
+    def _segments(self):
+        return sorted(self.dir.glob("segment-*.jsonl"))
+
+    def last_seq(self):
+        if self._seq is None:
+            self._seq = 0
+            segments = self._segments()
+            if segments:
+                for event in self._read(segments[-1]):
+                    self._seq = event["seq"]
+            snap = self.latest_snapshot()
+            if snap:
+                self._seq = max(self._seq, snap[0])
+        return self._seq
+
+    def refresh(self):
+        """Forget the cached last sequence number (another process may have appended)."""
+        self._seq = None
+
+    def append(self, event):
+        seq = self.last_seq() + 1
+        event = {"seq": seq, **event}
+        segments = self._segments()
+        path = segments[-1] if segments else None
+        if path is None or path.stat().st_size >= self.segment_bytes:
+            path = self.dir / f"segment-{seq:010d}.jsonl"
+        line = dumps(event) + b"\n"
+        with open(path, "ab") as fh:
+            fh.write(line)
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._seq = seq
+        return seq
+
+    def _read(self, path):
+        with open(path, "rb") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except ValueError:
+                    # torn final write: stop at the last complete record
+                    _log.warning("Truncated event record in %s", path)
+                    return
+
+    def events(self, after=0, upto=None):
+        segments = self._segments()
+        for i, path in enumerate(segments):
+            # Skip whole segments that end before `after` (names carry their first seq).
+            if i + 1 < len(segments) and int(segments[i + 1].stem.split("-")[1]) <= after + 1:
+                continue
+            for event in self._read(path):
+                if event["seq"] <= after:
+                    continue
+                if upto is not None and event["seq"] > upto:
+                    return
+                yield event
+
+    def write_snapshot(self, seq, state):
+        tmp = self.dir / f".snapshot-{seq:010d}.tmp"
+        tmp.write_bytes(dumps({"seq": seq, "state": state}))
+        os.replace(tmp, self.dir / f"snapshot-{seq:010d}.json")
+
+    def latest_snapshot(self, upto=None):
+        for path in sorted(self.dir.glob("snapshot-*.json"), reverse=True):
+            seq = int(path.stem.split("-")[1])
+            if upto is None or seq <= upto:
+                data = loads(path.read_bytes())
+                return data["seq"], data["state"]
+        return None
+
+
+# ----------------- Firestore subcollections -----------------
+def _op_to_map(op):
+    stored = {"op": op[0], "path": list(op[1])}
+    if len(op) > 2:
+        stored["value"] = op[2]
+    return stored
+
+
+def _op_from_map(stored):
+    if "value" in stored:
+        return [stored["op"], stored["path"], stored["value"]]
+    return [stored["op"], stored["path"]]
+
+
+class FirestoreEventLog:
+    """
+    Same interface on Firestore: `<doc>/events/<seq>` and `<doc>/snapshots/<seq>`.
+    Document ids are zero-padded so lexical order equals sequence order.
+    Firestore rejects arrays directly inside arrays, so delta ops are stored as
+    {"op", "path", "value"} maps and turned back into lists on read.
+    """
+
+    def __init__(self, db, doc_path):
+        self.doc = db.document(doc_path)
+        self._seq = None
+
+    def last_seq(self):
+        if self._seq is None:
+            self._seq = 0
+            last = list(self.doc.collection("events").order_by("seq", direction="DESCENDING").limit(1).stream())
+            if last:
+                self._seq = last[0].to_dict()["seq"]
+        return self._seq
+
+    def refresh(self):
+        """Forget the cached last sequence number (another writer may have appended)."""
+        self._seq = None
+
+    def append(self, event):
+        seq = self.last_seq() + 1
+        # create() fails if another writer took this seq, instead of silently overwriting it.
+        stored = {"seq": seq, **event}
+        if "delta" in stored:
+            stored["delta"] = [_op_to_map(op) for op in stored["delta"]]
+        self.doc.collection("events").document(f"{seq:010d}").create(stored)
+        self._seq = seq
+        return seq
+
+    def events(self, after=0, upto=None):
+        query = self.doc.collection("events").where("seq", ">", after).order_by("seq")
+        for snap in query.stream():
+            event = snap.to_dict()
+            if upto is not None and event["seq"] > upto:
+                return
+            if "delta" in event:
+                event["delta"] = [_op_from_map(op) for op in event["delta"]]
+            yield event
+
+    def write_snapshot(self, seq, state):
+        self.doc.collection("snapshots").document(f"{seq:010d}").set({"seq": seq, "state": state})
+
+    def latest_snapshot(self, upto=None):
+        query = self.doc.collection("snapshots")
+        if upto is not None:
+            query = query.where("seq", "<=", upto)
+        found = list(query.order_by("seq", direction="DESCENDING").limit(1).stream())
+        if not found:
+            return None
+        data = found[0].to_dict()
+        return data["seq"], data["state"]
+
+
+# ----------------- Store -----------------
+class EventSourcedStore:
+    """Turn persistence on top of an event log: small appends, periodic snapshots, replay on load."""
+
+    def __init__(self, log, snapshot_every=20):
+        self.log = log
+        self.snapshot_every = snapshot_every
+
+    def append_turn(self, command, response, old_state, new_state, **fields):
+        """
+        Append one turn; returns its sequence number. `old_state` must be the state
+        the log currently ends at (the one load() returns).
+        """
+        if self.log.last_seq() == 0 and old_state:
+            # First turn of a log: pin the starting state so turn 0 can be replayed too.
+            self.log.write_snapshot(0, old_state)
+        event = {
+            "ts": round(time.time(), 3),
+            "command": command,
+            "response": response,
+            "delta": state_delta(old_state or {}, new_state),
+            **fields,
+        }
+        seq = self.log.append(event)
+        if self.snapshot_every and seq % self.snapshot_every == 0:
+            self.log.write_snapshot(seq, new_state)
+        return seq
+
+    def load(self, upto=None):
+        """Rebuild the state at `upto` (default: latest) from the nearest snapshot plus deltas."""
+        snap = self.log.latest_snapshot(upto=upto)
+        seq, state = (snap[0], deepcopy(snap[1])) if snap else (0, {})
+        for event in self.log.events(after=seq, upto=upto):
+            apply_delta(state, event["delta"])
+        return state
+
+    def history(self, after=0, upto=None):
+        """Audit trail: (seq, ts, command, response) for each turn."""
+        for event in self.log.events(after=after, upto=upto):
+            yield event["seq"], event.get("ts"), event.get("command"), event.get("response")
+
+    def rewind(self, seq):
+        """
+        Roll the session back to turn `seq`. The log stays append-only: the rewind is
+        recorded as a new event whose delta takes the latest state back to turn `seq`.
+        Returns the restored state.
+        """
+        target = self.load(upto=seq)
+        self.append_turn(None, None, self.load(), target, rewind_to=seq)
+        return target
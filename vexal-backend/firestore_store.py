@@ -0,0 +1,86 @@
+# firestore_store.py
+# Non-blocking session persistence on Firestore's AsyncClient.
+#
+# One AsyncClient per process, so every request shares one gRPC channel. A
+# session is several documents, read with a single get_all and written with a
+# single batch commit:
+#   <doc_path>                 game state
+#   <doc_path>/data/lore       lore registry
+#   <doc_path>/history/<turn>  one entry per turn (command, response, ts)
+import logging
+import time
+
+from serialization import dumps, loads
+
+_log = logging.getLogger("vexal.firestore_store")
+
+PARTS = ("state", "lore")
+
+
+def _plain(value):
+    """Firestore cannot store sets, tuples as keys, numpy values, etc.; round-trip through JSON types."""
+    return loads(dumps(value))
+
+
+class AsyncFirestoreStore:
+    def __init__(self, client):
+        self.client = client
+
+    def _ref(self, doc_path, part):
+        if part == "state":
+            return self.client.document(doc_path)
+        return self.client.document(f"{doc_path}/data/{part}")
+
+    def _history_ref(self, doc_path, turn):
+        # Zero-padded so lexical order equals turn order.
+        return self.client.document(f"{doc_path}/history/{int(turn):010d}")
+
+    async def load(self, doc_path, parts=PARTS):
+        """{part: dict} for one session in one round trip; missing documents come back as {}."""
+        return (await self.load_many([doc_path], parts))[doc_path]
+
+    async def load_many(self, doc_paths, parts=PARTS):
+        """{doc_path: {part: dict}} for many sessions in one get_all."""
+        refs = {}
+        for doc_path in doc_paths:
+            for part in parts:
+                ref = self._ref(doc_path, part)
+                refs[ref.path] = (doc_path, part)
+        result = {doc_path: {part: {} for part in parts} for doc_path in doc_paths}
+        if not refs:
+            return result
+        async for snap in self.client.get_all([self.client.document(path) for path in refs]):
+            if snap.exists:
+                doc_path, part = refs[snap.reference.path]
+                result[doc_path][part] = snap.to_dict()
+        return result
+
+    async def save(self, doc_path, state=None, lore=None, history=None):
+        """
+        Write any of state, lore and one history entry (must carry "turn") atomically
+        in one batch commit.
+        """
+        batch = self.client.batch()
+        if state is not None:
+            batch.set(self._ref(doc_path, "state"), state)
+        if lore is not None:
+            batch.set(self._ref(doc_path, "lore"), _plain(lore))
+        if history is not None:
+            batch.set(self._history_ref(doc_path, history["turn"]), {"ts": round(time.time(), 3), **_plain(history)})
+        await batch.commit()
+
+    async def save_many(self, states):
+        """{doc_path: state} in batches of at most 500 writes (the Firestore batch limit)."""
+        items = list(states.items())
+        for start in range(0, len(items), 500):
+            batch = self.client.batch()
+            for doc_path, state in items[start:start + 500]:
+                batch.set(self._ref(doc_path, "state"), state)
+            await batch.commit()
+
+    async def history(self, doc_path, limit=50):
+        """The most recent `limit` history entries, oldest first."""
+        query = (self.client.collection(f"{doc_path}/history")
+                 .order_by("turn", direction="DESCENDING").limit(limit))
+        entries = [snap.to_dict() async for snap in query.stream()]
+        return entries[::-1]
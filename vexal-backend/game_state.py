@@ -1,16 +1,26 @@
 import streamlit as st
-from copy import deepcopy
 from data import INITIAL_GAME_STATE, MAT_PROPS
 from conditions import CONDITION_EFFECTS
+from inventory import assign_ids, equip_in_state, equipment_modifiers, unequip_in_state
+from snapshots import CowDict, StateHistory
+from session_lifecycle import create_lifecycle
 from datetime import datetime, timedelta
 
+@st.cache_resource
+def session_lifecycle():
+    """Process-wide idle-session hibernation manager (see session_lifecycle.py)."""
+    return create_lifecycle()
+
 def init_session_state():
     """
     Initialize all session_state keys used by the app.
     Preserves existing data keys and backfills missing compatibility fields.
+    A session hibernated while idle is rehydrated first.
     """
+    session_lifecycle().attach()
     if "game_state" not in st.session_state:
-        st.session_state.game_state = deepcopy(INITIAL_GAME_STATE)
+        # Copy-on-write view: the session shares INITIAL_GAME_STATE until it first writes.
+        st.session_state.game_state = CowDict(INITIAL_GAME_STATE)
     if "messages" not in st.session_state:
         st.session_state.messages = []
     if "cmd_buffer" not in st.session_state:
@@ -23,6 +33,8 @@ def init_session_state():
         st.session_state.turn_count = 0
     if "last_action_time" not in st.session_state:
         st.session_state.last_action_time = datetime.utcnow().isoformat()
+    if "state_history" not in st.session_state:
+        st.session_state.state_history = StateHistory()
 
     gs = st.session_state.game_state
     if "skills_exp" not in gs:
@@ -35,6 +47,8 @@ def init_session_state():
         gs["game_datetime"] = datetime(1000, 1, 1, 8, 0).isoformat()
     if "hours_per_turn" not in gs:
         gs["hours_per_turn"] = 6
+    # Stable item ids, so equip/unequip can address items across reruns and saves.
+    assign_ids(gs)
 
 def update_condition_timers():
     """Decrement timers and remove expired conditions from game_state."""
@@ -87,11 +101,10 @@ def get_effective_stats(_gs_dict):
             movement_speed *= effects.get('movement_speed', 1.0)
             mana_regen *= effects.get('mana_regen', 1.0)
 
-    for slot in ['Head', 'Torso', 'Legs', 'Hands', 'OffHand']:
-        item = _gs_dict.get('equipment', {}).get(slot)
-        if item and item.get('type') == 'Armor':
-            mat = item.get('material')
-            eff_attr['DEX'] += MAT_PROPS.get(mat, {}).get('Dex_Penalty', 0)
+    # Maintained on equip/unequip (see inventory.py), so this does not walk the equipment.
+    equipment_mods = equipment_modifiers(_gs_dict, MAT_PROPS)
+    for attr, delta in equipment_mods['attributes'].items():
+        eff_attr[attr] = eff_attr.get(attr, 0) + delta
 
     return {
         'attributes': eff_attr,
@@ -100,12 +113,56 @@ def get_effective_stats(_gs_dict):
         'stamina_drain': stamina_drain,
         'spell_cost_multiplier': spell_cost_multiplier,
         'movement_speed': movement_speed,
-        'mana_regen': mana_regen
+        'mana_regen': mana_regen,
+        'armor': equipment_mods['armor'],
+        'equipped_weight': equipment_mods['weight']
     }
 
+# ----------------- Inventory & Equipment -----------------
+def equip_item(item_id, slot=None):
+    """
+    Equip an inventory item (in its own slot unless `slot` is given); a displaced
+    item goes back to the bags. Returns the displaced item's id, or None.
+    """
+    return equip_in_state(st.session_state.game_state, item_id, slot, MAT_PROPS)
+
+def unequip_item(slot):
+    """Move the item in `slot` back to the bags. Returns its id, or None if the slot was empty."""
+    return unequip_in_state(st.session_state.game_state, slot, MAT_PROPS)
+
 def get_gs_copy():
-    """Return a shallow dict copy of the live game_state for caching calls and safe reads."""
-    return dict(st.session_state.game_state)
+    """
+    Return a read-only snapshot of the live game_state for caching calls and safe reads.
+    For copy-on-write state this is free: the snapshot shares all subtrees with the live
+    state, the state history and INITIAL_GAME_STATE, so it is not a private copy. Callers
+    must not mutate it or anything inside it; use copy.deepcopy() to get one they can change.
+    """
+    gs = st.session_state.game_state
+    if isinstance(gs, CowDict):
+        return gs.freeze()
+    return dict(gs)
+
+def record_turn_snapshot():
+    """Store the current game_state as the snapshot for the current turn_count."""
+    gs = st.session_state.game_state
+    if not isinstance(gs, CowDict):
+        gs = st.session_state.game_state = CowDict(gs)
+    history = st.session_state.setdefault("state_history", StateHistory())
+    history.record(st.session_state.get("turn_count", 0), gs.freeze())
+
+def rewind_to_turn(turn):
+    """
+    Restore game_state to the snapshot taken at `turn` (or the nearest earlier one).
+    Later snapshots are discarded. Returns True if a snapshot was found.
+    """
+    history = st.session_state.get("state_history")
+    snap = history.get(turn) if history else None
+    if snap is None:
+        return False
+    history.truncate_after(turn)
+    st.session_state.game_state = CowDict(snap)
+    st.session_state["turn_count"] = turn
+    return True
 
 # ----------------- In-Game Time Utilities -----------------
 def parse_game_datetime(gs):
@@ -134,6 +191,7 @@ def advance_game_time(turns=1):
     # increment turn counter and timestamp
     st.session_state["turn_count"] = st.session_state.get("turn_count", 0) + max(1, int(turns))
     st.session_state["last_action_time"] = datetime.utcnow().isoformat()
+    record_turn_snapshot()
     return format_game_datetime(gs)
 
 def advance_game_time_delta(hours=0, seconds=0):
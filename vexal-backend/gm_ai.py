@@ -1,13 +1,26 @@
+import json
+import logging
+import os
+from urllib.parse import urlencode
+
 import streamlit as st
+import streamlit.components.v1 as components
 from game_state import update_condition_timers, apply_time_spec
 from skills import gain_experience
 import lore
 from datetime import datetime
 import gm_static
 
+_log = logging.getLogger("vexal.gm_ai")
+
+# Backend narration endpoint (".../api/tts"). When set, the browser streams the audio
+# from it chunk by chunk; otherwise it is synthesized in this process.
+TTS_URL = os.getenv("VEXAL_TTS_URL")
+
 def get_gm_response(prompt):
     """
-    Unified GM response entrypoint supporting three modes:
+    Unified GM response entrypoint supporting four modes:
+      - 'nlp'       : spaCy NER extraction via lore.nlp_extract_and_add (default)
       - 'llm'       : try LLM-backed extraction (Gemini/GenAI) via lore.llm_extract_and_add
       - 'heuristic' : fallback lightweight parser lore.auto_extract_and_add
       - 'static'    : deterministic template-based gm_static.static_get_response
@@ -25,7 +38,7 @@ def get_gm_response(prompt):
 
     gs = st.session_state.game_state
 
-    gm_mode = st.session_state.get("gm_mode", "llm")  # default to llm
+    gm_mode = st.session_state.get("gm_mode", "nlp")  # default to nlp
     narrative = ""
     extracted = {}
     llm_used = False
@@ -41,7 +54,13 @@ def get_gm_response(prompt):
         extracted = lore.auto_extract_and_add(narrative) or {"source": "heuristic"}
         llm_used = False
 
-    # LLM mode: try the LLM-backed extractor and fall back to heuristic.
+    # NLP mode: spaCy NER (falls back to heuristic by itself if no model is installed)
+    elif gm_mode == "nlp":
+        narrative = f"Narrative: Amara acts upon '{prompt}'."
+        extracted = lore.nlp_extract_and_add(narrative)
+        llm_used = False
+
+    # LLM mode: try the LLM-backed extractor and fall back to NLP / heuristic.
     else:  # 'llm'
         narrative = f"Narrative: Amara acts upon '{prompt}'."
         try:
@@ -50,8 +69,8 @@ def get_gm_response(prompt):
             # assume LLM was used. Our heuristic returns {"source":"heuristic"} when used.
             llm_used = not (extracted.get("source") == "heuristic")
         except Exception:
-            # Safe fallback to heuristic if LLM fails
-            extracted = lore.auto_extract_and_add(narrative) or {"source": "heuristic"}
+            # Safe fallback to NLP (itself falling back to heuristic) if LLM fails
+            extracted = lore.nlp_extract_and_add(narrative) or {"source": "heuristic"}
             llm_used = False
 
     # Record for debugging / save export whether LLM was used
@@ -73,10 +92,40 @@ def get_gm_response(prompt):
         narrative = f"Narrative: Amara acts upon '{prompt}'. (No special handling.)"
     return narrative
 
+@st.cache_resource
+def _tts_pipeline():
+    import tts
+
+    return tts.create_pipeline()
+
+
+def _browser_speech(text):
+    """Narrate with the browser's own speech synthesis (fallback when server TTS fails)."""
+    literal = json.dumps(text).replace("</", "<\\/")
+    components.html(f"<script>speechSynthesis.speak(new SpeechSynthesisUtterance({literal}));</script>", height=0)
+
+
 def trigger_tts(text):
     """
-    Fire HTML5 TTS playback via st.components.v1.html if TTS enabled.
+    Narrate `text` with server-side TTS (cached per sentence) if TTS is enabled:
+    streamed from TTS_URL when configured, else synthesized here. Falls back to
+    browser speech if synthesis fails.
     """
-    if st.session_state.get("tts_enabled", True):
-        clean_text = text.replace("'", "\\'").replace("\n", " ")
-        st.components.v1.html(f"<script>speak('{clean_text}');</script>", height=0)
+    if not st.session_state.get("tts_enabled", True) or not text:
+        return
+    if TTS_URL:
+        st.audio(f"{TTS_URL}?{urlencode({'text': text})}", autoplay=True)
+        return
+    try:
+        pipeline = _tts_pipeline()
+        audio = pipeline.synthesize(text)
+    except Exception:
+        _log.exception("Server TTS failed; using browser speech")
+        _browser_speech(text)
+        return
+    if pipeline.media_type.startswith("audio/L16"):
+        import tts
+
+        st.audio(tts.pcm_to_wav(audio), format="audio/wav", autoplay=True)
+    else:
+        st.audio(audio, format=pipeline.media_type, autoplay=True)
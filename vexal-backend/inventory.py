@@ -0,0 +1,445 @@
+# inventory.py
+# Inventory and equipment engine.
+#
+# An item is an interned template (the shared, immutable definition: name, type,
+# material, slot, tags, weight, ...) plus a per-instance delta (condition, quantity
+# and anything else this copy changes). Fifty "Healing Potion"s share one template;
+# each instance stores only its id and what is its own.
+#
+# Inventory indexes items by type, slot and tag, and keeps the equipment-derived
+# modifiers (attribute deltas, armor, equipped weight) up to date on equip/unequip,
+# so a stat query reads one precomputed block instead of walking the equipment.
+#
+# The game state stays plain dicts: Inventory.from_state() builds the engine from
+# "inventory" and "equipment", and write_to() stores them back together with the
+# "equipment_modifiers" block that game_state.get_effective_stats reads.
+# equip_in_state() / unequip_in_state() move one item and patch that block without
+# building an Inventory. The block records the state's "equipment_version", which
+# every write path here bumps; code that edits "equipment" directly must call
+# mark_equipment_changed() so the block is recomputed on read instead of trusted.
+#
+# Items get an "id" when they first reach an Inventory (assign_ids), written into the
+# state so the same item keeps its id across rebuilds and saves.
+import logging
+import uuid
+import weakref
+from copy import deepcopy
+from types import MappingProxyType
+
+_log = logging.getLogger("vexal.inventory")
+
+ARMOR_SLOTS = ("Head", "Torso", "Legs", "Hands", "OffHand")
+WEAPON_SLOTS = ("MainHand", "Weapon")
+# Per-copy fields; everything else belongs to the shared template.
+INSTANCE_FIELDS = frozenset({"id", "condition", "quantity", "notes"})
+MODIFIERS_KEY = "equipment_modifiers"
+VERSION_KEY = "equipment_version"
+
+
+def _material_props():
+    """MAT_PROPS from data.py, if it is deployed."""
+    try:
+        from data import MAT_PROPS
+    except ImportError:
+        _log.warning("data module not available; materials add no modifiers")
+        return {}
+    return MAT_PROPS
+
+
+def _freeze(value):
+    """Hashable, immutable form of a JSON value (template key and stored props)."""
+    if hasattr(value, "to_dict"):   # CowDict / CowList
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _key(value):
+    if isinstance(value, MappingProxyType):
+        return tuple(sorted((k, _key(v)) for k, v in value.items()))
+    if isinstance(value, tuple):
+        return tuple(_key(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+# ----------------- templates -----------------
+class ItemTemplate:
+    """Shared definition of an item; `props` is read-only. Obtain through TemplateRegistry.intern."""
+    __slots__ = ("props", "type", "slot", "tags", "__weakref__")
+
+    def __init__(self, props):
+        self.props = props
+        self.type = props.get("type")
+        self.slot = props.get("slot")
+        tags = props.get("tags") or ()
+        self.tags = frozenset(tags if isinstance(tags, tuple) else (tags,))
+
+    def get(self, field, default=None):
+        return self.props.get(field, default)
+
+
+class TemplateRegistry:
+    """
+    Interns templates: equal definitions map to one ItemTemplate. Entries are weak,
+    so definitions no inventory uses any more are freed.
+    """
+
+    def __init__(self):
+        self._templates = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def intern(self, props):
+        frozen = {k: _freeze(v) for k, v in props.items() if k not in INSTANCE_FIELDS}
+        key = tuple(sorted((k, _key(v)) for k, v in frozen.items()))
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = ItemTemplate(MappingProxyType(frozen))
+        return template
+
+
+TEMPLATES = TemplateRegistry()   # process-wide, so sessions share definitions
+
+
+class Item:
+    """One copy of an item: its template plus the fields that differ (None when none do)."""
+    __slots__ = ("id", "template", "delta")
+
+    def __init__(self, item_id, template, delta=None):
+        self.id = item_id
+        self.template = template
+        self.delta = delta or None
+
+    def get(self, field, default=None):
+        if self.delta is not None and field in self.delta:
+            return self.delta[field]
+        return self.template.props.get(field, default)
+
+    def to_dict(self):
+        return {**_thaw(self.template.props), **(self.delta or {}), "id": self.id}
+
+
+# ----------------- modifiers -----------------
+def item_modifiers(item, slot, mat_props):
+    """(attribute deltas, armor, weight) an item contributes when equipped in `slot`."""
+    attributes = {}
+    armor = 0
+    if item.get("type") == "Armor" and slot in ARMOR_SLOTS:
+        material = mat_props.get(item.get("material"), {})
+        dex_penalty = material.get("Dex_Penalty", 0)
+        if dex_penalty:
+            attributes["DEX"] = dex_penalty
+        armor = item.get("armorValue", material.get("Armor", 0)) or 0
+    return attributes, armor, item.get("weight", 0) or 0
+
+
+def empty_modifiers():
+    return {"attributes": {}, "armor": 0, "weight": 0}
+
+
+def mark_equipment_changed(gs):
+    """Invalidate the stored modifier block after editing "equipment" directly. Returns the new version."""
+    version = gs[VERSION_KEY] = (gs.get(VERSION_KEY) or 0) + 1
+    return version
+
+
+def _apply(modifiers, contribution, sign):
+    attributes, armor, weight = contribution
+    totals = modifiers["attributes"]
+    for attr, delta in attributes.items():
+        value = totals.get(attr, 0) + sign * delta
+        if value:
+            totals[attr] = value
+        else:
+            totals.pop(attr, None)
+    modifiers["armor"] += sign * armor
+    modifiers["weight"] += sign * weight
+
+
+def equipment_modifiers(gs, mat_props=None):
+    """
+    Equipment-derived modifiers of a game state: the stored block while its version
+    matches the state's "equipment_version", else (no block, or "equipment" changed
+    since) computed from "equipment". A computed block is not stored: `gs` may be a snapshot.
+    """
+    version = gs.get(VERSION_KEY) or 0
+    modifiers = gs.get(MODIFIERS_KEY)
+    if modifiers is not None and modifiers.get("version") == version:
+        return modifiers
+    if mat_props is None:
+        mat_props = _material_props()
+    modifiers = empty_modifiers()
+    for slot, item in (gs.get("equipment") or {}).items():
+        if item:
+            _apply(modifiers, item_modifiers(item, slot, mat_props), 1)
+    modifiers["version"] = version
+    return modifiers
+
+
+def _state_items(gs):
+    yield from gs.get("inventory") or ()
+    yield from (item for item in (gs.get("equipment") or {}).values() if item)
+
+
+def new_item_id():
+    return uuid.uuid4().hex[:12]
+
+
+def assign_ids(gs):
+    """Give every item of `gs` that has no "id" a new one, in place. Returns how many were assigned."""
+    assigned = 0
+    for props in _state_items(gs):
+        if not props.get("id"):
+            props["id"] = new_item_id()
+            assigned += 1
+    return assigned
+
+
+# ----------------- in-place state edits -----------------
+def _modifiers_for_edit(gs, mat_props):
+    """A private copy of the state's current modifier block, to patch and store back."""
+    modifiers = equipment_modifiers(gs, mat_props)
+    return {"attributes": dict(modifiers["attributes"]), "armor": modifiers["armor"], "weight": modifiers["weight"]}
+
+
+def _store_modifiers(gs, modifiers):
+    modifiers["version"] = mark_equipment_changed(gs)
+    gs[MODIFIERS_KEY] = modifiers
+
+
+def _detached(props):
+    """A plain private copy of an item: a CowDict view must not travel to another place in the state."""
+    if hasattr(props, "to_dict"):   # CowDict
+        props = props.to_dict()
+    return deepcopy(dict(props))
+
+
+def _take_from_slot(gs, slot, modifiers, mat_props):
+    equipment = gs.get("equipment") or {}
+    props = equipment.get(slot)
+    if not props:
+        return None
+    props = _detached(props)
+    del equipment[slot]
+    _apply(modifiers, item_modifiers(props, slot, mat_props), -1)
+    return props
+
+
+def equip_in_state(gs, item_id, slot=None, mat_props=None):
+    """
+    Equip item `item_id` of the plain-dict state `gs` in `slot` (default: the item's own),
+    moving a displaced item back to the bags and patching the stored modifier block
+    instead of rebuilding an Inventory. Returns the displaced item's id, or None.
+    """
+    mat_props = _material_props() if mat_props is None else mat_props
+    equipment = gs.get("equipment")
+    if equipment is None:
+        equipment = gs["equipment"] = {}
+    bags = gs.get("inventory")
+    if bags is None:
+        bags = gs["inventory"] = []
+    worn = next((s for s, props in equipment.items() if props and props.get("id") == item_id), None)
+    if worn is None:
+        # Newest first: unequipped and newly found items are appended, and those are the ones re-equipped.
+        index = next((i for i in range(len(bags) - 1, -1, -1) if bags[i].get("id") == item_id), None)
+        if index is None:
+            raise KeyError(item_id)
+        props = _detached(bags[index])
+    else:
+        props = _detached(equipment[worn])
+    slot = slot or props.get("slot")
+    if not slot:
+        raise ValueError(f"item {item_id!r} has no slot")
+    if worn == slot:
+        return None
+    modifiers = _modifiers_for_edit(gs, mat_props)
+    if worn is None:
+        del bags[index]
+    else:
+        _take_from_slot(gs, worn, modifiers, mat_props)
+    displaced = _take_from_slot(gs, slot, modifiers, mat_props)
+    if displaced is not None:
+        bags.append(displaced)
+    equipment[slot] = props
+    _apply(modifiers, item_modifiers(props, slot, mat_props), 1)
+    _store_modifiers(gs, modifiers)
+    return None if displaced is None else displaced.get("id")
+
+
+def unequip_in_state(gs, slot, mat_props=None):
+    """Move the item in `slot` of `gs` back to the bags. Returns its id, or None if the slot was empty."""
+    mat_props = _material_props() if mat_props is None else mat_props
+    if not (gs.get("equipment") or {}).get(slot):
+        return None
+    modifiers = _modifiers_for_edit(gs, mat_props)
+    props = _take_from_slot(gs, slot, modifiers, mat_props)
+    bags = gs.get("inventory")
+    if bags is None:
+        bags = gs["inventory"] = []
+    bags.append(props)
+    _store_modifiers(gs, modifiers)
+    return props.get("id")
+
+
+# ----------------- inventory -----------------
+class Inventory:
+    """
+    Items by id with indexes by type, slot and tag. Equipped items stay in the
+    inventory (and its indexes); `equipped` maps slot -> item id.
+    """
+
+    def __init__(self, registry=None, mat_props=None):
+        self.registry = registry or TEMPLATES
+        self.mat_props = _material_props() if mat_props is None else mat_props
+        self._items = {}      # id -> Item, in insertion order
+        self._by_type = {}    # type -> {id}
+        self._by_slot = {}    # template slot -> {id}
+        self._by_tag = {}     # tag -> {id}
+        self.equipped = {}    # slot -> id
+        self._slot_of = {}    # id -> slot it is equipped in
+        self._contributions = {}   # slot -> item_modifiers(...) of the equipped item
+        self.modifiers = empty_modifiers()
+
+    @classmethod
+    def from_state(cls, gs, registry=None, mat_props=None):
+        """Build from the state's "inventory" and "equipment"; items without an id get one in `gs` (assign_ids)."""
+        assign_ids(gs)
+        inventory = cls(registry, mat_props)
+        for props in gs.get("inventory") or ():
+            inventory.add(props)
+        for slot, props in (gs.get("equipment") or {}).items():
+            if props:
+                inventory.equip(inventory.add(props).id, slot)
+        return inventory
+
+    def write_to(self, gs):
+        """Store inventory, equipment and the modifier block into the game state `gs`."""
+        gs["inventory"] = [item.to_dict() for item_id, item in self._items.items() if item_id not in self._slot_of]
+        gs["equipment"] = {slot: self._items[item_id].to_dict() for slot, item_id in self.equipped.items()}
+        gs[MODIFIERS_KEY] = {**self.modifiers, "attributes": dict(self.modifiers["attributes"]),
+                             "version": mark_equipment_changed(gs)}
+        return gs
+
+    # ----------------- items -----------------
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def get(self, item_id):
+        return self._items[item_id]
+
+    def add(self, props):
+        """Add an item given as a dict (state format). Returns the Item."""
+        if hasattr(props, "to_dict"):   # CowDict
+            props = props.to_dict()
+        template = self.registry.intern(props)
+        item_id = props.get("id") or new_item_id()
+        if item_id in self._items:
+            raise ValueError(f"duplicate item id {item_id!r}")
+        delta = {k: v for k, v in props.items() if k in INSTANCE_FIELDS and k != "id"}
+        item = self._items[item_id] = Item(item_id, template, delta)
+        self._index(item, 1)
+        return item
+
+    def remove(self, item_id):
+        """Remove an item (unequipping it first). Returns the Item."""
+        if item_id in self._slot_of:
+            self.unequip(self._slot_of[item_id])
+        item = self._items.pop(item_id)
+        self._index(item, -1)
+        return item
+
+    def update(self, item_id, **fields):
+        """Change per-copy fields of an item; an equipped item's modifiers are re-derived."""
+        item = self._items[item_id]
+        unknown = set(fields) - INSTANCE_FIELDS
+        if unknown:
+            raise ValueError(f"not per-copy fields: {sorted(unknown)}")
+        item.delta = {**(item.delta or {}), **fields} or None
+        slot = self._slot_of.get(item_id)
+        if slot is not None:
+            self._set_contribution(slot, item)
+        return item
+
+    def _index(self, item, sign):
+        template = item.template
+        keys = [(self._by_type, template.type), (self._by_slot, template.slot)]
+        keys += [(self._by_tag, tag) for tag in template.tags]
+        for index, key in keys:
+            if key is None:
+                continue
+            if sign > 0:
+                index.setdefault(key, set()).add(item.id)
+            else:
+                ids = index[key]
+                ids.discard(item.id)
+                if not ids:
+                    del index[key]
+
+    def _lookup(self, index, key):
+        return [self._items[item_id] for item_id in index.get(key, ())]
+
+    def by_type(self, item_type):
+        return self._lookup(self._by_type, item_type)
+
+    def by_slot(self, slot):
+        """Items whose template names `slot` (equippable there without an explicit slot)."""
+        return self._lookup(self._by_slot, slot)
+
+    def by_tag(self, tag):
+        return self._lookup(self._by_tag, tag)
+
+    # ----------------- equipment -----------------
+    def _set_contribution(self, slot, item):
+        previous = self._contributions.pop(slot, None)
+        if previous is not None:
+            _apply(self.modifiers, previous, -1)
+        if item is not None:
+            contribution = self._contributions[slot] = item_modifiers(item, slot, self.mat_props)
+            _apply(self.modifiers, contribution, 1)
+
+    def equip(self, item_id, slot=None):
+        """Equip an item in `slot` (default: its template's slot). Returns the id it displaced, or None."""
+        item = self._items[item_id]
+        slot = slot or item.template.slot
+        if not slot:
+            raise ValueError(f"item {item_id!r} has no slot")
+        if self._slot_of.get(item_id) == slot:
+            return None
+        if item_id in self._slot_of:
+            self.unequip(self._slot_of[item_id])
+        displaced = self.unequip(slot)
+        self.equipped[slot] = item_id
+        self._slot_of[item_id] = slot
+        self._set_contribution(slot, item)
+        return displaced
+
+    def unequip(self, slot):
+        """Move the item in `slot` back to the bags. Returns its id, or None if the slot was empty."""
+        item_id = self.equipped.pop(slot, None)
+        if item_id is None:
+            return None
+        del self._slot_of[item_id]
+        self._set_contribution(slot, None)
+        return item_id
+
+    def equipped_item(self, slot):
+        item_id = self.equipped.get(slot)
+        return None if item_id is None else self._items[item_id]
@@ -0,0 +1,64 @@
+# lazy.py
+# Deferred initialization for heavy clients and optional subsystems (Firestore,
+# OpenAI, TTS, NLP). Importing a module that declares a LazyResource costs nothing;
+# the factory runs on first get(), or earlier from a background warm-up task.
+import asyncio
+import logging
+import threading
+import time
+
+_log = logging.getLogger("vexal.lazy")
+
+_registry = {}
+
+
+class LazyResource:
+    """
+    Thread-safe, build-once wrapper around `factory()`.
+    A factory returning None (e.g. an optional subsystem that is switched off) is
+    cached as unavailable: `ready` then only says the factory ran, `available` that
+    there is a value. A factory that raises is retried on the next get().
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.ready = False
+        self.init_ms = None
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def get(self):
+        if self.ready:
+            return self.value
+        with self._lock:
+            if not self.ready:
+                t0 = time.perf_counter()
+                self.value = self.factory()
+                self.init_ms = round((time.perf_counter() - t0) * 1000, 1)
+                self.ready = True
+                _log.info("Initialized %s", self.name, extra={"init_ms": self.init_ms,
+                                                              "available": self.value is not None})
+        return self.value
+
+    @property
+    def available(self):
+        return self.ready and self.value is not None
+
+    async def aget(self):
+        """get() without blocking the event loop while the factory runs."""
+        if self.ready:
+            return self.value
+        return await asyncio.to_thread(self.get)
+
+    def reset(self):
+        with self._lock:
+            self.value = None
+            self.ready = False
+
+
+def status():
+    """{name: {"ready", "available", "init_ms"}} for every declared resource."""
+    return {name: {"ready": r.ready, "available": r.available, "init_ms": r.init_ms}
+            for name, r in _registry.items()}
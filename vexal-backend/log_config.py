@@ -0,0 +1,138 @@
+# log_config.py
+# Structured JSON logging for the backend: lazy formatting, sampling of noisy
+# events, compact state diffs and a queue handler so log I/O stays off the request path.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+
+_listener = None
+
+# Attributes every LogRecord carries; anything else was passed through `extra=`.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON line (Cloud Logging parses `severity` and `message`)."""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records tagged with `extra={"sample": "<event>"}`.
+    Untagged records and WARNING+ always pass.
+    """
+
+    def __init__(self, rate=0.1, rng=None):
+        super().__init__()
+        self.rate = float(rate)
+        self._rng = rng or random.random
+
+    def filter(self, record):
+        if getattr(record, "sample", None) is None or record.levelno >= logging.WARNING:
+            return True
+        return self._rng() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that skips the stdlib's full format() in prepare(). Only the
+    %-message is rendered here, on the logging thread, so mutable args (e.g. a
+    state dict changed right after the call) are captured as they were; the JSON
+    rendering is left to the listener thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def state_diff(old, new, prefix=""):
+    """
+    Return {dotted.path: new_value} for keys that changed between two nested dicts.
+    Removed keys map to None.
+    """
+    changes = {}
+    old = old or {}
+    new = new or {}
+    for key in old.keys() | new.keys():
+        path = f"{prefix}{key}"
+        a = old.get(key)
+        b = new.get(key)
+        if a is b:
+            continue
+        if isinstance(a, dict) and isinstance(b, dict):
+            changes.update(state_diff(a, b, path + "."))
+        elif a != b:
+            changes[path] = b
+    return changes
+
+
+def configure_logging(level=None, sample_rate=None, stream=None):
+    """
+    Install the JSON/queue logging pipeline on the root logger (idempotent).
+    Level and sample rate default to LOG_LEVEL (INFO) and LOG_SAMPLE_RATE (0.1).
+    """
+    global _listener
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return root
+
+    sink = logging.StreamHandler(stream)
+    sink.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, sink, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """Flush and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class timed:
+    """Context manager that records elapsed milliseconds in `self.ms` (for `extra=` fields)."""
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        self.ms = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = round((time.perf_counter() - self._t0) * 1000, 2)
+        return False
@@ -6,8 +6,12 @@ import re
 import json
 import logging
 from pathlib import Path
+from entity_index import EntityIndex
+from lore_graph import LoreGraph, relations_from_bullets
+from profiling import caps_from_env, trim_oldest
 
 _log = logging.getLogger("vexal.lore")
+_CAPS = caps_from_env()   # SESSION_MAX_NOTES keeps only the newest notes per list
 
 def init_lore():
     """Initialize the lore repository in session_state."""
@@ -23,26 +27,74 @@ def init_lore():
             "tags": set()
         }
 
+# ----------------- Entity resolution -----------------
+def _entity_index(kind):
+    """
+    Name-resolution index for lore[kind], kept next to the lore in session_state.
+    It is derived data: rebuilt from the stored names and aliases whenever it is missing.
+    """
+    indexes = st.session_state.setdefault("lore_index", {})
+    index = indexes.get(kind)
+    if index is None:
+        index = indexes[kind] = EntityIndex()
+        for name, entry in st.session_state.lore[kind].items():
+            index.add(name, entry.get("aliases", ()))
+    return index
+
+def _canonical_name(kind, name):
+    """
+    Resolve a mention to an existing entry of lore[kind], recording new spellings as
+    aliases, or register it as a new canonical name. Returns the key to store under.
+    """
+    name = " ".join(str(name).split())
+    registry = st.session_state.lore[kind]
+    index = _entity_index(kind)
+    canonical = index.resolve(name)
+    if canonical is None or canonical not in registry:
+        index.add(name)
+        return name
+    if name != canonical:
+        aliases = registry[canonical].setdefault("aliases", [])
+        if name not in aliases:
+            aliases.append(name)
+            index.add(canonical, [name])
+    return canonical
+
+def find_entity(name):
+    """(kind, canonical name, entry) for any spelling of a known person/location/faction, else None."""
+    init_lore()
+    for kind in ("persons", "locations", "factions"):
+        canonical = _entity_index(kind).resolve(name)
+        if canonical is not None and canonical in st.session_state.lore[kind]:
+            return kind, canonical, st.session_state.lore[kind][canonical]
+    return None
+
 def add_vexal_note(text):
     init_lore()
-    st.session_state.lore["vexal"].setdefault("notes", []).append(text)
+    notes = st.session_state.lore["vexal"].setdefault("notes", [])
+    notes.append(text)
+    trim_oldest(notes, _CAPS.max_notes)
 
 def add_person(name, role=None, significance=None, note=None, tags=None):
     init_lore()
+    name = _canonical_name("persons", name)
     people = st.session_state.lore["persons"]
     if name not in people:
         people[name] = {"role": role or "", "significance": significance or "", "notes": [], "tags": []}
     if note:
         people[name]["notes"].append(note)
+        trim_oldest(people[name]["notes"], _CAPS.max_notes)
     if tags:
         # ensure list uniqueness
         for t in tags:
             if t not in people[name]["tags"]:
                 people[name]["tags"].append(t)
             st.session_state.lore["tags"].add(t)
+    return name
 
 def add_location(name, description=None, tags=None):
     init_lore()
+    name = _canonical_name("locations", name)
     locs = st.session_state.lore["locations"]
     if name not in locs:
         locs[name] = {"description": description or "", "discovered_at_turn": st.session_state.get("turn_count", 0), "tags": []}
@@ -53,6 +105,66 @@ def add_location(name, description=None, tags=None):
             if t not in locs[name]["tags"]:
                 locs[name]["tags"].append(t)
             st.session_state.lore["tags"].add(t)
+    return name
+
+def add_faction(name, description=None, tags=None):
+    init_lore()
+    name = _canonical_name("factions", name)
+    factions = st.session_state.lore["factions"]
+    if name not in factions:
+        factions[name] = {"description": description or "", "tags": []}
+    if description:
+        factions[name]["description"] = description
+    if tags:
+        for t in tags:
+            if t not in factions[name]["tags"]:
+                factions[name]["tags"].append(t)
+            st.session_state.lore["tags"].add(t)
+    return name
+
+# ----------------- Relationship graph -----------------
+_ADDERS = {"persons": add_person, "locations": add_location, "factions": add_faction}
+
+def _lore_graph():
+    if "lore_graph" not in st.session_state:
+        st.session_state.lore_graph = LoreGraph()
+    return st.session_state.lore_graph
+
+def add_relation(src, relation, dst, src_kind="persons", dst_kind=None):
+    """
+    Record src -relation-> dst in the lore graph. Both ends resolve to canonical entries;
+    a target that is not known yet is created in `dst_kind` (default: the source's registry).
+    """
+    src = _ADDERS[src_kind](src)
+    found = find_entity(dst)
+    if found is not None:
+        dst_kind, dst = found[0], found[1]
+    else:
+        dst_kind = dst_kind or src_kind
+        dst = _ADDERS[dst_kind](dst)
+    _lore_graph().add_edge(src, relation, dst, src_kind, dst_kind)
+
+def lore_context(name, hops=2, limit=40):
+    """
+    Relationship lines among entities within `hops` of `name` (e.g. the current location),
+    at most `limit` entities, for GM prompt context.
+    """
+    found = find_entity(name)
+    if found is None:
+        return []
+    graph = _lore_graph()
+    nearby = graph.k_hop(found[1], k=hops, max_nodes=limit)
+    return [f"{src} {relation.replace('_', ' ')} {dst}" for src, relation, dst in graph.edges_within(nearby)]
+
+def _note_quest_terms(txt):
+    """Update the main quest / Vexal notes when the narrative mentions the Bastion or Vexal."""
+    if "bastion" in txt.lower():
+        st.session_state.lore["vexal"]["main_quest"] = (
+            "Recover the fragments of the Bastion artifact. Seek scholars and ruins that can identify fragments."
+        )
+        add_vexal_note("Mentioned the Bastion: " + (txt[:200] if len(txt) > 200 else txt))
+    if "vexal" in txt.lower():
+        add_vexal_note("Vexal referenced: " + (txt[:200] if len(txt) > 200 else txt))
 
 # Heuristic extractor (fallback)
 _name_rx = re.compile(r"\b([A-Z][a-z]{2,}(?:\s[A-Z][a-z]{2,})*)\b")
@@ -68,13 +180,7 @@ def auto_extract_and_add(text):
     if not text:
         return {"source": "heuristic"}
     txt = text or ""
-    if "bastion" in txt.lower():
-        st.session_state.lore["vexal"]["main_quest"] = (
-            "Recover the fragments of the Bastion artifact. Seek scholars and ruins that can identify fragments."
-        )
-        add_vexal_note("Mentioned the Bastion: " + (txt[:200] if len(txt) > 200 else txt))
-    if "vexal" in txt.lower():
-        add_vexal_note("Vexal referenced: " + (txt[:200] if len(txt) > 200 else txt))
+    _note_quest_terms(txt)
 
     candidates = set(m.group(1) for m in _name_rx.finditer(txt))
     for cand in sorted(candidates):
@@ -88,6 +194,43 @@ def auto_extract_and_add(text):
                 add_location(cand, description="Discovered in narrative (heuristic).")
     return {"source": "heuristic"}
 
+# spaCy NER extractor (default): see lore_nlp
+def nlp_extract_and_add(text):
+    """
+    Add PERSON / place / organization entities found by spaCy NER to the lore.
+    Falls back to auto_extract_and_add when spaCy or its model is unavailable.
+    Returns a small dict describing source and what was found.
+    """
+    init_lore()
+    if not text:
+        return {"source": "nlp"}
+    import lore_nlp  # deferred: loading spaCy is only paid by sessions that use it
+
+    try:
+        found = lore_nlp.extract_entities(text)
+    except Exception as e:
+        _log.warning("NLP extraction failed, using heuristic: %s", e)
+        found = None
+    if found is None:
+        return auto_extract_and_add(text)
+
+    _note_quest_terms(text)
+    lore = st.session_state.lore
+    persons = [add_person(name, note="Auto-extracted (NLP).") for name in found["persons"]]
+    locations = []
+    for name in found["locations"]:
+        known = lore["locations"].get(_entity_index("locations").resolve(name) or name)
+        locations.append(add_location(name, description=None if known else "Discovered in narrative (NLP)."))
+    factions = [add_faction(name) for name in found["factions"]]
+    # Entities mentioned in the same narrative are linked in the lore graph.
+    graph = _lore_graph()
+    for person in persons:
+        for location in locations:
+            graph.add_edge(person, "seen_at", location, "persons", "locations")
+        for faction in factions:
+            graph.add_edge(person, "associated_with", faction, "persons", "factions")
+    return {"source": "nlp", **found}
+
 # ----------------- Static Markdown loader -----------------
 def _parse_markdown_entries(text):
     """
@@ -233,6 +376,8 @@ def load_static_lore_files(file_paths=None):
                     role, significance, notes = _extract_role_significance(e.get("bullets", []))
                     tags = _extract_tags_from_bullets(e.get("bullets", []))
                     add_person(name, role=role, significance=significance, note="; ".join(notes) if notes else (e.get("description") or None), tags=tags)
+                    for relation, target, target_kind in relations_from_bullets(e.get("bullets", [])):
+                        add_relation(name, relation, target, "persons", target_kind)
             elif "location" in sec_lower or "place" in sec_lower or "site" in sec_lower or "city" in sec_lower:
                 for e in entries:
                     name = e.get("name") or ""
@@ -242,6 +387,8 @@ def load_static_lore_files(file_paths=None):
                     role, significance, notes = _extract_role_significance(e.get("bullets", []))
                     tags = _extract_tags_from_bullets(e.get("bullets", []))
                     add_location(name, description=(desc + (" " + "; ".join(notes) if notes else "")).strip(), tags=tags)
+                    for relation, target, target_kind in relations_from_bullets(e.get("bullets", [])):
+                        add_relation(name, relation, target, "locations", target_kind)
             elif "faction" in sec_lower or "order" in sec_lower:
                 for e in entries:
                     name = e.get("name") or ""
@@ -253,6 +400,8 @@ def load_static_lore_files(file_paths=None):
                     if tags:
                         for t in tags:
                             st.session_state.lore["tags"].add(t)
+                    for relation, target, target_kind in relations_from_bullets(e.get("bullets", [])):
+                        add_relation(name, relation, target, "factions", target_kind)
             else:
                 # Generic: try to infer person/location or add to vexal notes
                 for e in entries:
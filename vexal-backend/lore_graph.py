@@ -0,0 +1,203 @@
+# lore_graph.py
+# Relationship graph over lore entities ("Mera -member_of-> Iron Order",
+# "Bastion Fragment -located_in-> Khar Ruins").
+#
+# Nodes are interned canonical names (see entity_index); edges are kept in
+# per-node out/in adjacency lists of (node id, relation id), so neighbourhood and
+# k-hop queries touch only the edges they return. The graph serializes to one
+# zlib-compressed CBOR blob with edges packed as int32 triples, and a graph
+# restored from a blob decodes it only on first use.
+import re
+import zlib
+from array import array
+from collections import deque
+
+from serialization import from_cbor, to_cbor
+
+FORMAT_VERSION = 1
+
+# Bullet label (markdown "- Label: A, B") -> relation, and the registry its targets belong to.
+BULLET_RELATIONS = {
+    "belongs to": ("member_of", "factions"),
+    "member of": ("member_of", "factions"),
+    "faction": ("member_of", "factions"),
+    "order": ("member_of", "factions"),
+    "located in": ("located_in", "locations"),
+    "location": ("located_in", "locations"),
+    "found at": ("located_in", "locations"),
+    "found in": ("located_in", "locations"),
+    "lives in": ("located_in", "locations"),
+    "leader of": ("leads", "factions"),
+    "leads": ("leads", "factions"),
+    "ally": ("ally_of", None),
+    "allies": ("ally_of", None),
+    "enemy": ("enemy_of", None),
+    "enemies": ("enemy_of", None),
+    "related to": ("related_to", None),
+}
+_LIST_SPLIT_RX = re.compile(r"\s*(?:,|;|\band\b)\s*")
+
+
+def relations_from_bullets(bullets):
+    """Yield (relation, target name, target registry or None) for relationship bullets."""
+    for bullet in bullets:
+        label, sep, rest = bullet.partition(":")
+        if not sep:
+            continue
+        relation = BULLET_RELATIONS.get(label.strip().lower())
+        if relation is None:
+            continue
+        for target in _LIST_SPLIT_RX.split(rest.strip().rstrip(".")):
+            if target:
+                yield relation[0], target, relation[1]
+
+
+class LoreGraph:
+    """Directed, labelled multigraph with out/in adjacency indexes."""
+
+    def __init__(self):
+        self._blob = None
+        self._reset()
+
+    def _reset(self):
+        self.names = []      # node id -> canonical name
+        self.kinds = []      # node id -> lore registry ("persons", ...) or None
+        self.ids = {}        # name -> node id
+        self.relations = []  # relation id -> label
+        self._rel_ids = {}
+        self._out = []       # node id -> [(dst, rel)]
+        self._in = []        # node id -> [(src, rel)]
+        self._edges = set()  # (src, dst, rel), for de-duplication
+
+    def _ensure(self):
+        if self._blob is not None:
+            blob, self._blob = self._blob, None
+            self._decode(blob)
+
+    # ----------------- building -----------------
+    def node(self, name, kind=None):
+        """Id of `name`, adding the node if needed (a known kind is kept if `kind` is None)."""
+        self._ensure()
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.kinds.append(kind)
+            self._out.append([])
+            self._in.append([])
+        elif kind is not None and self.kinds[node_id] is None:
+            self.kinds[node_id] = kind
+        return node_id
+
+    def _relation(self, label):
+        rel = self._rel_ids.get(label)
+        if rel is None:
+            rel = self._rel_ids[label] = len(self.relations)
+            self.relations.append(label)
+        return rel
+
+    def add_edge(self, src, relation, dst, src_kind=None, dst_kind=None):
+        """Add src -relation-> dst; returns False if it already existed or is a self-loop."""
+        s = self.node(src, src_kind)
+        d = self.node(dst, dst_kind)
+        rel = self._relation(relation)
+        if s == d or (s, d, rel) in self._edges:
+            return False
+        self._edges.add((s, d, rel))
+        self._out[s].append((d, rel))
+        self._in[d].append((s, rel))
+        return True
+
+    def __len__(self):
+        self._ensure()
+        return len(self._edges)
+
+    def __contains__(self, name):
+        self._ensure()
+        return name in self.ids
+
+    # ----------------- queries -----------------
+    def neighbors(self, name, relation=None):
+        """[(neighbor, relation, "out"|"in")] for edges touching `name`."""
+        self._ensure()
+        node_id = self.ids.get(name)
+        if node_id is None:
+            return []
+        rel_filter = self._rel_ids.get(relation) if relation is not None else None
+        if relation is not None and rel_filter is None:
+            return []
+        found = []
+        for direction, adjacency in (("out", self._out), ("in", self._in)):
+            for other, rel in adjacency[node_id]:
+                if rel_filter is None or rel == rel_filter:
+                    found.append((self.names[other], self.relations[rel], direction))
+        return found
+
+    def k_hop(self, name, k=2, max_nodes=None):
+        """{name: hops} for every node within `k` hops of `name` (either direction), BFS order."""
+        self._ensure()
+        start = self.ids.get(name)
+        if start is None:
+            return {}
+        dist = {start: 0}
+        frontier = deque([start])
+        while frontier:
+            node_id = frontier.popleft()
+            hops = dist[node_id]
+            if hops == k:
+                continue
+            for adjacency in (self._out[node_id], self._in[node_id]):
+                for other, _ in adjacency:
+                    if other not in dist:
+                        dist[other] = hops + 1
+                        frontier.append(other)
+                        if max_nodes is not None and len(dist) >= max_nodes:
+                            return {self.names[n]: h for n, h in dist.items()}
+        return {self.names[n]: h for n, h in dist.items()}
+
+    def edges_within(self, names):
+        """[(src, relation, dst)] for edges whose two ends are both in `names`."""
+        self._ensure()
+        members = {self.ids[n] for n in names if n in self.ids}
+        return [(self.names[s], self.relations[rel], self.names[d])
+                for s in members for d, rel in self._out[s] if d in members]
+
+    # ----------------- persistence -----------------
+    def to_bytes(self):
+        if self._blob is not None:
+            return self._blob
+        edges = array("i")
+        for s, adjacency in enumerate(self._out):
+            for d, rel in adjacency:
+                edges.extend((s, d, rel))
+        return zlib.compress(to_cbor({
+            "v": FORMAT_VERSION,
+            "names": self.names,
+            "kinds": self.kinds,
+            "relations": self.relations,
+            "edges": edges.tobytes(),
+        }), 6)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """Graph backed by `blob`; decoding is deferred until the graph is first used."""
+        graph = cls()
+        graph._blob = blob
+        return graph
+
+    def _decode(self, blob):
+        data = from_cbor(zlib.decompress(blob))
+        if data.get("v") != FORMAT_VERSION:
+            raise ValueError(f"unsupported lore graph format {data.get('v')!r}")
+        self._reset()
+        for name, kind in zip(data["names"], data["kinds"]):
+            self.node(name, kind)
+        self.relations = list(data["relations"])
+        self._rel_ids = {label: i for i, label in enumerate(self.relations)}
+        edges = array("i")
+        edges.frombytes(data["edges"])
+        for i in range(0, len(edges), 3):
+            s, d, rel = edges[i], edges[i + 1], edges[i + 2]
+            self._edges.add((s, d, rel))
+            self._out[s].append((d, rel))
+            self._in[d].append((s, rel))
@@ -0,0 +1,138 @@
+# lore_nlp.py
+# spaCy named-entity extraction for lore: sits between the heuristic
+# (lore.auto_extract_and_add) and the LLM extractor in precision and cost.
+#
+# The model (LORE_SPACY_MODEL, default en_core_web_sm) is loaded once per process
+# with every pipe except NER (and the tok2vec it listens to) disabled. Narratives
+# from all sessions go through one background batcher that runs nlp.pipe over
+# whatever has queued up, so concurrent turns share a batch.
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from lazy import LazyResource
+
+try:
+    import spacy
+except ImportError:  # optional: callers fall back to the heuristic extractor
+    spacy = None
+
+_log = logging.getLogger("vexal.lore_nlp")
+
+SPACY_MODEL = os.getenv("LORE_SPACY_MODEL", "en_core_web_sm")
+BATCH_SIZE = 32
+
+# spaCy label -> lore registry
+LABEL_KINDS = {
+    "PERSON": "persons",
+    "GPE": "locations", "LOC": "locations", "FAC": "locations",
+    "ORG": "factions", "NORP": "factions",
+}
+_STOP_NAMES = {"The", "A", "An", "You", "Your", "Narrative"}
+
+
+def _needed_pipes(nlp):
+    """NER plus any shared tok2vec/transformer it listens to."""
+    needed = {name for name in nlp.pipe_names if name in ("ner", "entity_ruler")}
+    for name in nlp.pipe_names:
+        listeners = getattr(nlp.get_pipe(name), "listening_components", ())
+        if needed.intersection(listeners):
+            needed.add(name)
+    return needed
+
+
+def load_model(name=SPACY_MODEL):
+    """Load `name` with only the NER path enabled; None if spaCy or the model is missing."""
+    if spacy is None:
+        _log.warning("spaCy is not installed; NLP lore extraction disabled")
+        return None
+    try:
+        nlp = spacy.load(name)
+    except OSError:
+        _log.warning("spaCy model %s is not installed (python -m spacy download %s)", name, name)
+        return None
+    needed = _needed_pipes(nlp)
+    nlp.select_pipes(disable=[p for p in nlp.pipe_names if p not in needed])
+    _log.info("Loaded spaCy model %s", name, extra={"pipes": nlp.pipe_names})
+    return nlp
+
+
+def _clean_name(text):
+    name = " ".join(text.split()).strip(" .,;:!?\"'")
+    if name.lower().startswith("the "):
+        name = name[4:]
+    name = name.removesuffix("'s").removesuffix("’s")
+    return name if len(name) > 2 and name not in _STOP_NAMES else None
+
+
+def entities_from_doc(doc):
+    """{"persons": [...], "locations": [...], "factions": [...]} in first-mention order."""
+    found = {"persons": [], "locations": [], "factions": []}
+    for ent in doc.ents:
+        kind = LABEL_KINDS.get(ent.label_)
+        name = _clean_name(ent.text) if kind else None
+        if name and name not in found[kind]:
+            found[kind].append(name)
+    return found
+
+
+def extract_batch(texts, nlp=None, batch_size=BATCH_SIZE, n_process=1):
+    """
+    Entities for many texts at once (bulk backfills, static lore).
+    n_process > 1 fans nlp.pipe out over worker processes.
+    """
+    nlp = nlp or model.get()
+    if nlp is None:
+        raise RuntimeError(f"spaCy model {SPACY_MODEL} is not available")
+    return [entities_from_doc(doc) for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process)]
+
+
+class EntityBatcher:
+    """
+    Background micro-batcher: submit() returns a Future; one worker thread drains the
+    queue (up to `batch_size` texts) through nlp.pipe and resolves the futures.
+    """
+
+    def __init__(self, nlp, batch_size=BATCH_SIZE):
+        self.nlp = nlp
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="lore-nlp", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                docs = self.nlp.pipe([text for text, _ in batch], batch_size=self.batch_size)
+                for (_, future), doc in zip(batch, docs):
+                    future.set_result(entities_from_doc(doc))
+            except Exception as exc:
+                _log.exception("NLP batch failed")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+
+model = LazyResource("spacy", load_model)
+batcher = LazyResource("lore_nlp_batcher", lambda: EntityBatcher(model.get()) if model.get() is not None else None)
+
+
+def extract_entities(text, timeout=5.0):
+    """Entities for one narrative via the shared batcher; None if NLP is unavailable."""
+    worker = batcher.get()
+    if worker is None:
+        return None
+    return worker.submit(text).result(timeout=timeout)
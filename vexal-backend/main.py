@@ -1,38 +1,66 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from google.cloud import firestore
-import openai
+import asyncio
 import logging
 import os
+import re
+import resource
+import secrets
+from typing import Optional
+import catalog
+import cluster
+import profiling
+import traffic
+from admission import AdmissionController, Rejected
+from cluster import LockHeld, TierUnavailable
+from event_log import EventSourcedStore, FirestoreEventLog, SegmentFileLog
+from firestore_store import AsyncFirestoreStore
+from lazy import LazyResource, status as lazy_status
+from log_config import configure_logging, state_diff, timed
+from pubsub import InMemoryHub, create_hub
+from serialization import FastJSONResponse, dumps, loads
+from snapshots import CowDict
+from speculation import Speculator
+from state_sync import StateVersions, state_delta
 
 # === ENVIRONMENT CONFIGURATION ===
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
+
+# Heavy clients (OpenAI, Firestore) are built on first use or by the warm-up task
+# started at startup, so importing this module and opening the port stay fast.
 
 # === Load OpenAI API Key ===
-OPENAI_API_KEY = None
-
-# OPTION 1: OpenAI API key as ENV VAR
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if OPENAI_API_KEY:
-    logging.debug(f"Using OpenAI API key: {OPENAI_API_KEY[:8]}... (truncated)")
-else:
-    # OPTION 2: OpenAI API key from Secret File
-    OPENAI_KEY_PATH = "/secrets/openai_api_key"
-    try:
-        with open(OPENAI_KEY_PATH, "r") as key_file:
-            OPENAI_API_KEY = key_file.read().strip()
-            logging.debug(f"Using OpenAI API key from secret file at {OPENAI_KEY_PATH}.")
-    except FileNotFoundError:
-        logging.error(f"OpenAI API key is missing. Check the environment configuration for Cloud Run.")
+def _init_openai():
+    import openai
 
-if OPENAI_API_KEY:
+    # OPTION 1: OpenAI API key as ENV VAR
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    if OPENAI_API_KEY:
+        logging.debug("Using OpenAI API key: %s... (truncated)", OPENAI_API_KEY[:8])
+    else:
+        # OPTION 2: OpenAI API key from Secret File
+        OPENAI_KEY_PATH = "/secrets/openai_api_key"
+        try:
+            with open(OPENAI_KEY_PATH, "r") as key_file:
+                OPENAI_API_KEY = key_file.read().strip()
+                logging.debug("Using OpenAI API key from secret file at %s.", OPENAI_KEY_PATH)
+        except FileNotFoundError:
+            logging.error("OpenAI API key is missing. Check the environment configuration for Cloud Run.")
+
+    if not OPENAI_API_KEY:
+        # Raise rather than return a keyless client: LazyResource retries on the next
+        # get(), and /ready stays 503 until a key is found.
+        raise RuntimeError("OpenAI API key could not be loaded.")
     openai.api_key = OPENAI_API_KEY
-else:
-    logging.error("Critical: OpenAI API key could not be loaded, functionality will be limited.")
+    return openai
+
+
+openai_client = LazyResource("openai", _init_openai)
 
 # === FASTAPI INITIALIZATION ===
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Enable CORS: Allow client requests from any domain
 app.add_middleware(
@@ -43,25 +71,260 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Anonymized request/timing traces for replay (off unless TRAFFIC_TRACE_PATH is set)
+trace_options = traffic.recorder_options()
+if trace_options is not None:
+    app.add_middleware(traffic.TrafficRecorderMiddleware, **trace_options)
+
 # === Set up Firestore Database Connection ===
-try:
-    credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "/secrets/service_account.json")
-    if os.path.exists(credentials_path):  # Ensure credentials file exists
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-        db = firestore.Client()
-        GAME_STATE_DOC = "sessions/rpg_game_state"
-        logging.info("Successfully connected to Firestore.")
-    else:
-        logging.error(f"Firestore credentials file not found at {credentials_path}")
-        db = None
-except Exception as firestore_error:
-    logging.error(f"Error initializing Firestore: {firestore_error}")
-    db = None
+GAME_STATE_DOC = "sessions/rpg_game_state"
+# "shared": every client plays GAME_STATE_DOC (default, the document the frontend reads).
+# "header": the X-Session-Id header (or ?session=) selects sessions/<id>, so sessions
+#           can be spread over workers (see router.py).
+SESSION_DOCS = os.getenv("SESSION_DOCS", "shared")
+_SESSION_ID_RX = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def session_doc(request):
+    """Game state document for a request (HTTP or WebSocket)."""
+    if SESSION_DOCS != "header":
+        return GAME_STATE_DOC
+    session_id = request.headers.get("x-session-id") or request.query_params.get("session")
+    if session_id and _SESSION_ID_RX.match(session_id):
+        return f"sessions/{session_id}"
+    return GAME_STATE_DOC
+
+
+def _init_firestore(use_async=False):
+    try:
+        from google.cloud import firestore
+
+        credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "/secrets/service_account.json")
+        if os.path.exists(credentials_path):  # Ensure credentials file exists
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
+            db = firestore.AsyncClient() if use_async else firestore.Client()
+            logging.info("Successfully connected to Firestore.")
+            return db
+        logging.error("Firestore credentials file not found at %s", credentials_path)
+    except Exception as firestore_error:
+        logging.error("Error initializing Firestore: %s", firestore_error)
+    return None
+
+
+def _init_session_store():
+    client = _init_firestore(use_async=True)
+    return AsyncFirestoreStore(client) if client is not None else None
+
+
+# Document mode goes through the AsyncClient (one shared gRPC channel, no blocking in routes);
+# the synchronous client is only built for the Firestore event log.
+session_store = LazyResource("firestore", _init_session_store)
+firestore_db = LazyResource("firestore_sync", _init_firestore)
+
+# === Persistence Mode ===
+# "document": overwrite GAME_STATE_DOC every turn (default).
+# "events":   append each turn's command, response and state delta to an event log
+#             (EVENT_LOG_DIR on local disk, else Firestore subcollections) with periodic snapshots.
+PERSISTENCE_MODE = os.getenv("PERSISTENCE_MODE", "document")
+
+
+def _build_event_store(doc):
+    snapshot_every = int(os.getenv("EVENT_SNAPSHOT_EVERY", "20"))
+    if os.getenv("EVENT_LOG_DIR"):
+        directory = os.getenv("EVENT_LOG_DIR")
+        if doc != GAME_STATE_DOC:
+            directory = os.path.join(directory, doc.replace("/", "_"))
+        return EventSourcedStore(SegmentFileLog(directory), snapshot_every=snapshot_every)
+    if firestore_db.get() is not None:
+        return EventSourcedStore(FirestoreEventLog(firestore_db.get(), doc), snapshot_every=snapshot_every)
+    return None
+
+
+def _init_event_store():
+    if PERSISTENCE_MODE != "events":
+        return None
+    store = _build_event_store(GAME_STATE_DOC)
+    logging.info("Event-sourced persistence enabled: %s", type(store.log).__name__ if store else None)
+    return store
+
+
+event_store = LazyResource("event_store", _init_event_store)
+_session_event_stores = {}   # doc -> EventSourcedStore, for SESSION_DOCS=header
+
+
+def event_store_for(doc):
+    """The event store of `doc`, or None outside "events" mode."""
+    store = event_store.get()
+    if store is None or doc == GAME_STATE_DOC:
+        return store
+    if doc not in _session_event_stores:
+        _session_event_stores[doc] = _build_event_store(doc)
+    return _session_event_stores[doc]
+
+
+async def persistence_available():
+    """True if the event store or Firestore is usable; builds them off the event loop on first call."""
+    return (await event_store.aget()) is not None or (await session_store.aget()) is not None
+
+
+# === World Simulation ===
+# Active sessions are ticked in the background when WORLD_TICK_SECONDS > 0.
+WORLD_TICK_SECONDS = float(os.getenv("WORLD_TICK_SECONDS", "0"))
+WORLD_HOURS_PER_TICK = float(os.getenv("WORLD_HOURS_PER_TICK", "1"))
+# Sessions without a turn for this long (and no live subscriber) stop being ticked.
+WORLD_IDLE_SECONDS = float(os.getenv("WORLD_IDLE_SECONDS", "1800"))
+world = None  # WorldState, created at startup when ticking is enabled (pulls in numpy)
+
+# === Live State Push ===
+# Committed state deltas and world ticks are published per session; SSE and
+# WebSocket subscribers receive them. PUBSUB_URL=redis://... fans out across workers.
+hub = create_hub(os.getenv("PUBSUB_URL"))
+
+# === Multi-worker Coordination ===
+# Shared cache/lock tier (see cluster.py): in-process by default; router.py points its
+# workers at its own tier (CLUSTER_CACHE_URL=http://...), or use redis://... across hosts.
+cluster_cache = cluster.create_cache(os.getenv("CLUSTER_CACHE_URL"))
+if cluster_cache.distributed and type(hub) is InMemoryHub:
+    # No Redis pub/sub configured: carry pushed deltas between workers over the shared tier.
+    hub = cluster.ClusterHub(cluster_cache)
+TURN_LOCK_TTL = float(os.getenv("GM_TURN_LOCK_TTL", "120"))
+TIER_RETRY_AFTER = 5   # Retry-After (s) when the shared tier is unreachable
+
+
+def on_cluster_message(message):
+    """Another worker committed a turn: drop this worker's copies of that session."""
+    if message.get("type") == "committed":
+        doc = message["doc"]
+        state_versions.discard(doc)
+        if speculator is not None:
+            speculator.discard(doc)
+        if world is not None and doc in world.index:
+            # Its row was loaded from a state that is no longer the latest.
+            world.remove(doc)
+        store = event_store_for(doc)
+        if store is not None:
+            store.log.refresh()
+
+
+cluster_cache.on_message(on_cluster_message)
+
+
+async def publish_world_tick(ticked_world):
+    """Drop idle sessions, then push ticked pools/time to sessions that currently have local subscribers."""
+    for session_id in ticked_world.evict_idle(WORLD_IDLE_SECONDS, keep=hub.has_subscribers):
+        logging.debug("World tick: evicted idle session", extra={"session": session_id})
+    for session_id in ticked_world.ids:
+        if hub.has_subscribers(session_id):
+            hub.deliver(session_id, {"type": "world", **ticked_world.export(session_id)})
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    global world
+    await cluster_cache.start()
+    await hub.start()
+    # Build clients in the background: the port opens right away and /ready reports when they are up.
+    app.state.warm_up_task = asyncio.create_task(warm_up_clients())
+    if WORLD_TICK_SECONDS > 0:
+        from world_tick import WorldState, run_world_ticks
+
+        world = WorldState()
+        app.state.world_task = asyncio.create_task(
+            run_world_ticks(world, WORLD_TICK_SECONDS, WORLD_HOURS_PER_TICK, on_tick=publish_world_tick))
+        logging.info("World tick engine started: every %ss, %sh per tick", WORLD_TICK_SECONDS, WORLD_HOURS_PER_TICK)
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for name in ("warm_up_task", "world_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await hub.stop()
+    await cluster_cache.stop()
+    if trace_options is not None:
+        trace_options["writer"].close()
+
+
+async def warm_up_clients():
+    results = await asyncio.gather(persistence_available(), openai_client.aget(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error("Client warm-up failed: %s", result)
+
+
+# === Text-to-Speech ===
+# Built on first /api/tts call (imports the TTS client); see tts.create_pipeline for the env settings.
+def _init_tts():
+    import tts
+
+    return tts.create_pipeline()
+
+
+tts_pipeline = LazyResource("tts", _init_tts)
+MAX_TTS_CHARS = 5000
+
+
+# === Admission Control ===
+# Per-client token bucket, one turn at a time per player, turns on one document
+# queued behind each other, and a global cap on concurrent GM turns with a bounded
+# wait queue; excess requests get 429/409/503.
+gm_admission = AdmissionController(
+    rate_per_min=float(os.getenv("GM_RATE_PER_MIN", "20")),
+    burst=int(os.getenv("GM_BURST", "5")),
+    max_concurrent=int(os.getenv("GM_MAX_CONCURRENT", "8")),
+    max_queue=int(os.getenv("GM_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("GM_QUEUE_TIMEOUT", "10")),
+)
+# /api/tts goes through the same checks with its own budget: one narration per
+# player at a time, and a cap on concurrent syntheses.
+tts_admission = AdmissionController(
+    rate_per_min=float(os.getenv("TTS_RATE_PER_MIN", "30")),
+    burst=int(os.getenv("TTS_BURST", "5")),
+    max_concurrent=int(os.getenv("TTS_MAX_CONCURRENT", "8")),
+    max_queue=int(os.getenv("TTS_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("TTS_QUEUE_TIMEOUT", "5")),
+)
+
+
+# Peers whose X-Forwarded-For is believed (router.py sets this for its workers).
+TRUSTED_PROXIES = frozenset(filter(None, os.getenv("TRUSTED_PROXIES", "").split(",")))
+# Proxies of the hosting platform in front of this process, whatever their address
+# (1 on Cloud Run, whose front end appends the caller's address; set in the Dockerfile).
+FORWARDED_HOPS = int(os.getenv("FORWARDED_HOPS", "0"))
+
+
+def client_key(request: Request):
+    """
+    Rate-limit key: the client's address. The X-Forwarded-For chain is read from the
+    right, skipping one entry per trusted proxy (router.py, FORWARDED_HOPS platform
+    proxies), so the key is the address the outermost trusted proxy saw. Entries the
+    client wrote itself are left of that and never used.
+    """
+    host = request.client.host if request.client else "unknown"
+    hops = FORWARDED_HOPS + (host in TRUSTED_PROXIES)
+    if not hops:
+        return host
+    chain = [part.strip() for header in request.headers.getlist("x-forwarded-for")
+             for part in header.split(",") if part.strip()]
+    chain.append(host)
+    return chain[max(0, len(chain) - 1 - hops)]
+
+
+def player_key(request: Request):
+    """Single-flight key: one turn at a time per client address and session id."""
+    return client_key(request), request.headers.get("x-session-id") or request.query_params.get("session")
 
 
 # === PYDANTIC DATA MODELS ===
 class CommandInput(BaseModel):
     prompt: str
+    # state_version the client currently holds; when set, the response carries a delta.
+    state_version: Optional[int] = None
+
+
+# Recent state versions per session, for delta responses.
+state_versions = StateVersions()
 
 
 # === UTILITY FUNCTIONS ===
@@ -70,57 +333,438 @@ def update_game_state(game_state, gm_response):
     """
     Updates the game state based on the GM response or player actions.
     """
-    logging.info("Updating game state...")
+    player = game_state["player"]
+    before = {key: player.get(key) for key in ("hp", "mana", "stamina")}
 
     # Parse GM response for predefined actions
     response_lower = gm_response.lower()
 
     if "you are attacked" in response_lower:
-        logging.info("Player attacked: reduce HP by 10")
         game_state["player"]["hp"] -= 10
 
     elif "you cast" in response_lower:
-        logging.info("Player casts spell: reduce Mana by 5")
         game_state["player"]["mana"] -= 5
 
     elif "you attack" in response_lower:
-        logging.info("Player attacks: reduce Stamina by 5")
         game_state["player"]["stamina"] -= 5
 
     # Ensure no attributes go below zero
     for key in ["hp", "mana", "stamina"]:
         game_state["player"][key] = max(0, game_state["player"].get(key, 0))
 
-    logging.info(f"Updated game state: {game_state}")
+    # Log only what changed; the full state is never formatted into the log line.
+    logging.info("Updated game state", extra={"diff": state_diff(before, {key: player.get(key) for key in before})})
     return game_state
 
 
-def save_game_state(game_state):
+async def load_game_state(doc=GAME_STATE_DOC):
+    """
+    Loads the current game state from the event log or the Firestore document.
+    """
+    store = event_store_for(doc)
+    if store is not None:
+        # Event log reads are blocking (disk or the sync Firestore client): keep them off the loop.
+        return await asyncio.to_thread(store.load)
+    return (await session_store.get().load(doc, parts=("state",)))["state"]
+
+
+async def save_game_state(game_state, command=None, gm_response=None, previous_state=None, doc=GAME_STATE_DOC):
     """
-    Saves the updated game state to Firestore.
+    Saves the updated game state: appends a turn event in "events" mode,
+    otherwise writes the state document and a history entry in one batch.
+    Returns True once the state is stored.
     """
     try:
-        if db is None:
+        store = event_store_for(doc)
+        if store is not None:
+            await asyncio.to_thread(store.append_turn, command, gm_response, previous_state, game_state)
+            logging.debug("Turn appended to event log.")
+            return True
+
+        sessions = session_store.get()
+        if sessions is None:
             logging.warning("Database connection is unavailable. Cannot save game state.")
-            return
-
-        db.document(GAME_STATE_DOC).set(game_state)
-        logging.info("Game state successfully saved to Firestore.")
+            return False
+
+        history = None
+        if command is not None:
+            history = {"turn": game_state.get("state_version", 0), "command": command, "response": gm_response}
+        await sessions.save(doc, state=game_state, history=history)
+        logging.debug("Game state successfully saved to Firestore.")
+        return True
     except Exception as save_error:
-        logging.error(f"Error saving game state to Firestore: {save_error}")
+        logging.error("Error saving game state to Firestore: %s", save_error)
+        return False
 
 
 # === API ROUTES ===
 @app.get("/")
 async def root():
     return {"message": "Hello, World! FastAPI is running!"}
-    
+
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until persistence and the OpenAI client are initialized and usable."""
+    store_ready = event_store.available or session_store.available
+    ready = store_ready and openai_client.available
+    return FastJSONResponse({"ready": ready, "resources": lazy_status()}, status_code=200 if ready else 503)
+
+
+@app.get("/api/catalog")
+async def get_catalog(request: Request):
+    """
+    Conditions, materials and skills for the frontend. Versioned by content hash:
+    clients revalidate with If-None-Match and get 304 when nothing changed.
+    """
+    cat = catalog.get_catalog()
+    headers = {"ETag": cat.etag, "Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == cat.etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(cat.gzip_body, media_type="application/json", headers=headers)
+    return Response(cat.body, media_type="application/json", headers=headers)
+
+
+async def state_payload(since=None, doc=GAME_STATE_DOC):
+    """
+    Current game state. With `since` (a state_version) only the delta since that
+    version is returned, or the full state with resync=true if it is unknown.
+    """
+    if not await persistence_available():
+        return {"error": "Could not connect to Firestore. Please contact the administrator."}, 500
+    game_state = await load_game_state(doc)
+    version = game_state.get("state_version", 0)
+    if state_versions.get(doc, version) is None:
+        state_versions.record(doc, version, game_state)
+    return state_versions.encode(doc, game_state, version, since)
+
+
+@app.get("/api/state")
+async def fetch_game_state(request: Request, since: Optional[int] = None):
+    """See state_payload; ?since=<state_version> returns a delta."""
+    payload = await state_payload(since, session_doc(request))
+    if isinstance(payload, tuple):
+        return payload
+    return FastJSONResponse(payload)
+
+
+async def state_updates(since=None, keepalive_s=15.0, doc=GAME_STATE_DOC):
+    """
+    Yield state payloads for one subscriber: an initial catch-up (delta since `since`
+    or full state), then pushed deltas and world ticks. Falls back to a fresh
+    catch-up whenever a delta does not start from the version the subscriber holds.
+    Yields None as a keepalive when nothing happened for `keepalive_s`.
+    """
+    with hub.subscribe(doc) as sub:
+        payload = await state_payload(since, doc)
+        version = payload.get("state_version") if isinstance(payload, dict) else None
+        yield payload
+        while True:
+            try:
+                message = await sub.get(timeout=keepalive_s)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if message.get("type") == "delta" and message.get("base_version") == version:
+                version = message["state_version"]
+                yield message
+            elif message.get("type") == "world":
+                yield message
+            else:
+                # Missed a version (or overflowed): catch up from the current state.
+                payload = await state_payload(version, doc)
+                if isinstance(payload, dict):
+                    version = payload.get("state_version", version)
+                yield payload
+
+
+@app.get("/api/state/stream")
+async def stream_game_state(request: Request, since: Optional[int] = None):
+    """Server-sent events: one `data:` JSON payload per state change."""
+    async def events():
+        async for payload in state_updates(since, doc=session_doc(request)):
+            if await request.is_disconnected():
+                break
+            if payload is None:
+                yield ": keepalive\n\n"
+            else:
+                yield b"data: " + dumps(payload) + b"\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/ws/state")
+async def websocket_game_state(websocket: WebSocket, since: Optional[int] = None):
+    """WebSocket variant of /api/state/stream."""
+    await websocket.accept()
+    try:
+        async for payload in state_updates(since, doc=session_doc(websocket)):
+            if payload is not None:
+                await websocket.send_text(dumps(payload).decode("utf-8"))
+    except WebSocketDisconnect:
+        pass
+
+
+async def _admitted_stream(admission, chunks):
+    """Yield from `chunks` inside an already entered admit() context, leaving it when done."""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception:
+        # Headers are already sent: abort the response (no clean end of the body), so
+        # clients see a failed download rather than a complete, truncated file.
+        logging.exception("TTS synthesis failed mid-stream")
+        raise
+    finally:
+        await admission.__aexit__(None, None, None)
+
+
+@app.get("/api/tts")
+async def narrate(text: str, request: Request):
+    """
+    Streams narration audio for `text`, chunk by chunk as sentences are synthesized.
+    A GET so the URL can be used directly as an <audio> source. Subject to admission
+    control like /api/gm (tts_admission); rejected calls get 429/409/503 with Retry-After.
+    """
+    text = text.strip()
+    if not text or len(text) > MAX_TTS_CHARS:
+        return FastJSONResponse({"error": f"text must be 1-{MAX_TTS_CHARS} characters."}, status_code=400)
+    admission = tts_admission.admit(client_key(request), player_key(request))
+    try:
+        await admission.__aenter__()
+    except Rejected as rejected:
+        return FastJSONResponse({"error": rejected.reason}, status_code=rejected.status, headers=rejected.headers)
+    try:
+        pipeline = await tts_pipeline.aget()
+    except Exception:
+        await admission.__aexit__(None, None, None)
+        logging.exception("TTS pipeline unavailable")
+        return FastJSONResponse({"error": "Narration is unavailable."}, status_code=503)
+    # The admission slot is held until the last chunk is sent (or the client goes away).
+    # no-store: the status is sent before synthesis finishes, so a 200 body may still be cut short.
+    return StreamingResponse(_admitted_stream(admission, pipeline.stream(text)), media_type=pipeline.media_type,
+                             headers={"Cache-Control": "no-store"})
+
+
 @app.post("/api/gm")
-async def get_gpt_response(command: CommandInput):
+async def get_gpt_response(command: CommandInput, request: Request):
     """
     Processes user commands, interacts with OpenAI API, and updates game state.
+    Subject to admission control; rejected calls get 429/409/503 with Retry-After.
+    """
+    doc = session_doc(request)
+    try:
+        async with gm_admission.admit(client_key(request), player_key(request), doc):
+            try:
+                # One turn per document across workers: the document's lock in the shared tier.
+                async with cluster_cache.lock(f"turn:{doc}", ttl=TURN_LOCK_TTL, wait=gm_admission.queue_timeout):
+                    result = await run_gm_turn(command, doc)
+                if isinstance(result, tuple):
+                    # (error body, status): send the status rather than a 200 with a list body.
+                    body, status = result
+                    return FastJSONResponse(body, status_code=status)
+                return result
+            except LockHeld:
+                raise Rejected(409, "A turn is already in progress for this session.", gm_admission.service_s) from None
+            except TierUnavailable:
+                logging.exception("Shared tier unavailable; cannot lock the session")
+                raise Rejected(503, "The Game Master is busy. Try again shortly.", TIER_RETRY_AFTER) from None
+    except Rejected as rejected:
+        logging.info("GM request rejected", extra={"sample": "gm_rejected", "status": rejected.status,
+                                                   **gm_admission.stats()})
+        return FastJSONResponse({"error": rejected.reason}, status_code=rejected.status, headers=rejected.headers)
+
+
+async def generate_gm_response(game_state, prompt):
+    """One GM completion for `prompt` in `game_state`: (response text, tokens used)."""
+    # Summarize the current game state for the AI
+    state_summary = f"""
+    RPG GAME STATE:
+    Player Stats:
+    - HP: {game_state['player']['hp']}
+    - Mana: {game_state['player']['mana']}
+    - Stamina: {game_state['player']['stamina']}
+    """
+
+    # Call OpenAI to get the GM's response
+    # Run in a worker thread so a slow completion does not stall the event loop.
+    openai = await openai_client.aget()
+    response = await asyncio.to_thread(
+        openai.ChatCompletion.create,
+        model="gpt-4",  # Use GPT-4 or other compatible model
+        messages=[
+            {"role": "system", "content": "You are an RPG Game Master. Simulate a game scenario."},
+            {"role": "assistant", "content": state_summary.strip()},
+            {"role": "user", "content": prompt.strip()},
+        ],
+        max_tokens=500,
+        temperature=0.7,
+    )
+    text = response["choices"][0]["message"]["content"].strip()
+    usage = response.get("usage") or {}
+    return text, usage.get("total_tokens") or (len(state_summary) + len(prompt) + len(text)) // 4
+
+
+# === Speculative Pre-generation (GM_SPECULATE=1) ===
+# After each turn, responses to the likely next commands are generated in the
+# background against the committed state; a matching command is then answered
+# without waiting for the LLM. Metrics at /api/speculation.
+speculator = None
+if os.getenv("GM_SPECULATE", "0").lower() in ("1", "true", "yes"):
+    speculator = Speculator(
+        generate_gm_response,
+        max_predictions=int(os.getenv("GM_SPECULATE_PREDICTIONS", "3")),
+        tokens_per_min=float(os.getenv("GM_SPECULATE_TOKENS_PER_MIN", "1500")),
+        token_burst=float(os.getenv("GM_SPECULATE_TOKEN_BURST", "3000")),
+        max_concurrent=int(os.getenv("GM_SPECULATE_CONCURRENCY", "2")),
+    )
+
+
+@app.get("/api/speculation")
+async def speculation_stats():
+    """Hit rate and token spend of speculative pre-generation."""
+    if speculator is None:
+        return {"enabled": False}
+    return {"enabled": True, **speculator.stats()}
+
+
+@app.post("/_cluster/message")
+async def receive_cluster_message(request: Request):
+    """Messages relayed by router.py from the other workers (see cluster.py)."""
+    if not cluster_cache.distributed or request.headers.get(cluster.TOKEN_HEADER) != os.getenv("CLUSTER_TOKEN"):
+        return Response(status_code=403)
+    cluster_cache.deliver(loads(await request.body()))
+    return Response(status_code=204)
+
+
+# === Admin Profiling (ADMIN_TOKEN) ===
+# Per-session memory by subsystem, and sampling CPU profiles of the GM turn path as
+# folded stacks (flamegraph.pl / speedscope input). Disabled unless ADMIN_TOKEN is
+# set; send it as X-Admin-Token. Reports cover the worker that serves the request.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MAX_PROFILE_SECONDS = 60.0
+# The GM turn path: the request handler on the event loop, event-log I/O in to_thread workers.
+GM_TURN_FOCUS = ("main.py:get_gpt_response", "event_log.py:EventSourcedStore.append_turn",
+                 "event_log.py:EventSourcedStore.load")
+_profile_lock = asyncio.Lock()
+
+
+def admin_denied(request):
+    """None if the request carries ADMIN_TOKEN, else the response to send (404 while none is set)."""
+    if not ADMIN_TOKEN:
+        return Response(status_code=404)
+    if not secrets.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        return Response(status_code=403)
+    return None
+
+
+@app.get("/admin/profile/memory")
+async def profile_memory(request: Request, top: int = 20):
+    """
+    Deep size of every session this worker holds, by subsystem (state, lore, messages,
+    timers, skills; its older recent versions under "history"), largest first.
+    """
+    denied = admin_denied(request)
+    if denied is not None:
+        return denied
+    sessions = {}
+    for doc, history in state_versions.sessions():
+        versions = list(history.values())
+        sessions[doc] = {"game_state": versions[-1], "state_history": versions[:-1]}
+    report = profiling.memory_report(sessions, top, profiling.initial_state_ids())
+    return {"worker": cluster_cache.worker_id, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            **report}
+
+
+@app.get("/admin/profile/cpu")
+async def profile_cpu(request: Request, seconds: float = 10.0, interval_ms: float = 5.0, all_threads: bool = False):
+    """
+    Sample stacks for `seconds` and return them folded, e.g.
+      curl -H "X-Admin-Token: $T" ".../admin/profile/cpu?seconds=30" | flamegraph.pl > gm.svg
+    Only stacks inside the GM turn path are kept unless all_threads=true.
     """
-    if not db:
+    denied = admin_denied(request)
+    if denied is not None:
+        return denied
+    if _profile_lock.locked():
+        return FastJSONResponse({"error": "A profile is already running."}, status_code=409)
+    async with _profile_lock:
+        sampler = profiling.StackSampler(max(interval_ms, 1.0) / 1000, None if all_threads else GM_TURN_FOCUS)
+        sampler.start()
+        try:
+            await asyncio.sleep(min(max(seconds, 0.1), MAX_PROFILE_SECONDS))
+        finally:
+            sampler.stop()
+    return Response(sampler.folded(), media_type="text/plain",
+                    headers={"X-Profile-Samples": str(sampler.samples), "X-Profile-Seconds": f"{sampler.elapsed:.2f}"})
+
+
+async def load_turn_state(doc):
+    """
+    State a turn starts from; the caller holds the session's turn lock. The shared tier
+    records the last committed state_version: a per-session document this worker
+    holds at that version is served from memory, anything else is reloaded from
+    storage. (GAME_STATE_DOC is always reloaded: the frontend also writes it directly.)
+    The result may be the snapshot held in state_versions: read it, don't modify it.
+    """
+    committed = await cluster_cache.get(f"version:{doc}")
+    if doc in _pending_commits:
+        # This worker committed a newer version the shared tier has not recorded yet.
+        committed = max(committed or 0, _pending_commits[doc])
+    cached = state_versions.get(doc, committed) if committed is not None else None
+    if cached is None:
+        store = event_store_for(doc)
+        if store is not None and committed is not None:
+            store.log.refresh()   # another worker may have appended since this one last did
+    elif doc != GAME_STATE_DOC:
+        return cached
+    return await load_game_state(doc)
+
+
+# doc -> committed version the shared tier has not been told about yet (retried in the background).
+_pending_commits = {}
+_commit_retry_task = None
+
+
+async def _announce_commit(doc, version):
+    await cluster_cache.set(f"version:{doc}", version)
+    await cluster_cache.publish({"type": "committed", "doc": doc, "version": version})
+
+
+async def _retry_pending_commits():
+    while _pending_commits:
+        await asyncio.sleep(TIER_RETRY_AFTER)
+        for doc, version in list(_pending_commits.items()):
+            try:
+                await _announce_commit(doc, version)
+            except Exception as exc:
+                logging.warning("Commit of %s v%s still not announced: %s", doc, version, exc)
+                continue
+            if _pending_commits.get(doc) == version:
+                del _pending_commits[doc]
+
+
+async def publish_commit(doc, version):
+    """
+    Record `version` as committed (before the turn lock is released) and tell the other
+    workers. Best effort: the turn is already stored, so a failing shared tier must not
+    fail it. The version is then kept here and announced from a background task.
+    """
+    global _commit_retry_task
+    try:
+        await _announce_commit(doc, version)
+        _pending_commits.pop(doc, None)
+        return
+    except Exception:
+        logging.exception("Could not announce commit of %s v%s; retrying in the background", doc, version)
+    _pending_commits[doc] = max(version, _pending_commits.get(doc, 0))
+    if _commit_retry_task is None or _commit_retry_task.done():
+        _commit_retry_task = asyncio.create_task(_retry_pending_commits())
+
+
+async def run_gm_turn(command: CommandInput, doc=GAME_STATE_DOC):
+    if not await persistence_available():
         logging.error("Firestore database connection is unavailable.")
         return {"error": "Could not connect to Firestore. Please contact the administrator."}, 500
 
@@ -130,9 +774,11 @@ async def get_gpt_response(command: CommandInput):
             logging.warning("Received an empty or invalid prompt.")
             return {"error": "Command input cannot be empty."}, 400
 
-        # Retrieve the current game state
-        game_state_doc = db.document(GAME_STATE_DOC).get()
-        game_state = game_state_doc.to_dict() if game_state_doc.exists else {}
+        # Retrieve the current game state: the committed snapshot stays untouched as
+        # previous_state (the base of the logged delta); the turn writes through a
+        # copy-on-write view of it, so only the changed paths are copied.
+        previous_state = await load_turn_state(doc)
+        game_state = CowDict(previous_state)
 
         # Default game state if none exists
         game_state.setdefault("player", {
@@ -140,39 +786,66 @@ async def get_gpt_response(command: CommandInput):
             "mana": 50,
             "stamina": 30,
         })
-
-        # Summarize the current game state for the AI
-        state_summary = f"""
-        RPG GAME STATE:
-        Player Stats:
-        - HP: {game_state['player']['hp']}
-        - Mana: {game_state['player']['mana']}
-        - Stamina: {game_state['player']['stamina']}
-        """
-
-        # Call OpenAI to get the GM's response
-        response = openai.ChatCompletion.create(
-            model="gpt-4",  # Use GPT-4 or other compatible model
-            messages=[
-                {"role": "system", "content": "You are an RPG Game Master. Simulate a game scenario."},
-                {"role": "assistant", "content": state_summary.strip()},
-                {"role": "user", "content": command.prompt.strip()},
-            ],
-            max_tokens=500,
-            temperature=0.7,
-        )
-
-        gm_response = response["choices"][0]["message"]["content"].strip()
-        logging.info(f"GM Response: {gm_response}")
+        if world is not None:
+            # Fold in regeneration, drains and expiries accumulated since the last turn.
+            world.apply_to(doc, game_state)
+
+        # A response pre-generated for this exact state and command skips the LLM call.
+        gm_response = None
+        if speculator is not None:
+            gm_response = await speculator.take(doc, previous_state, command.prompt)
+        if gm_response is not None:
+            logging.info("GM Response (speculative)", extra={"sample": "gm_response", "chars": len(gm_response)})
+            traffic.note(prompt=command.prompt, response=gm_response, llm_ms=0.0, speculative=True)
+        else:
+            with timed() as llm_timer:
+                gm_response, _ = await generate_gm_response(game_state, command.prompt)
+            logging.info("GM Response", extra={"sample": "gm_response", "chars": len(gm_response),
+                                               "llm_ms": llm_timer.ms})
+            traffic.note(prompt=command.prompt, response=gm_response, llm_ms=llm_timer.ms)
+        logging.debug("GM Response text: %s", gm_response)
 
         # Update and save the game state
         game_state = update_game_state(game_state, gm_response)
-        save_game_state(game_state)
-
-        # Return the response and updated game state to the user
-        return {"response": gm_response, "game_state": game_state}
+        previous_version = previous_state.get("state_version", 0)
+        game_state["state_version"] = previous_version + 1
+        # The new version as plain dicts, sharing every untouched subtree with previous_state.
+        game_state = game_state.freeze()
+        saved = await save_game_state(game_state, command.prompt.strip(), gm_response, previous_state, doc)
+        if not saved:
+            # Nothing was committed: don't record, publish or tick a state storage doesn't have.
+            return {"error": "The turn could not be saved. Please try again."}, 500
+        if world is not None:
+            world.upsert(doc, game_state)
+        # Both snapshots are kept without copying; neither is modified after this point.
+        if state_versions.get(doc, previous_version) is None:
+            state_versions.record(doc, previous_version, previous_state)
+        state_versions.record(doc, game_state["state_version"], game_state)
+        await publish_commit(doc, game_state["state_version"])
+        if speculator is not None and gm_admission.stats()["waiting"] == 0:
+            # Pre-generate likely next turns while the player reads, unless real turns are queueing.
+            speculator.schedule(doc, game_state, gm_response)
+        try:
+            await hub.publish(doc, {
+                "type": "delta",
+                "base_version": previous_version,
+                "state_version": game_state["state_version"],
+                "delta": state_delta(previous_state, game_state),
+            })
+        except Exception:
+            # Committed already: subscribers catch up on their next resync instead.
+            logging.exception("Could not publish the state delta of %s", doc)
+
+        # Return the response plus the updated game state: a delta against the client's
+        # state_version when it sent one, else the full state.
+        # Returned as a Response so FastAPI skips jsonable_encoder on the nested state.
+        return FastJSONResponse({
+            "response": gm_response,
+            **state_versions.encode(doc, game_state, game_state["state_version"], command.state_version),
+            "catalog_version": catalog.get_catalog().version,
+        })
 
     except Exception as critical_error:
-        logging.error(f"Critical error: {critical_error}")
+        logging.exception("Critical error: %s", critical_error)
         return {"error": "An unexpected error occurred. Please try again later."}, 500
 
@@ -0,0 +1,271 @@
+# profiling.py
+# Per-session memory accounting, memory caps and a sampling CPU profiler.
+#
+# Memory: session_breakdown() walks a session's values (Streamlit session_state, or
+# a game state plus its recent versions in main.py) and attributes every object
+# to the first subsystem that reaches it (messages, lore, timers, skills, state,
+# history, other), so subtrees shared between the live state and its snapshots are
+# counted once.
+#
+# Caps: apply_caps() trims the oldest chat messages and lore notes once a session
+# holds more than SESSION_MAX_MESSAGES / SESSION_MAX_NOTES entries, and keeps
+# trimming while it is above SESSION_MAX_BYTES. Unset or 0 means no cap.
+#
+# CPU: StackSampler snapshots the stacks of the other threads every few ms and
+# counts them as folded stacks ("outer;inner;leaf count", the input format of
+# flamegraph.pl and speedscope). With `focus`, only stacks running through one of
+# the focus functions are kept, rooted at it.
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FunctionType, MethodType, ModuleType
+
+# Subsystem -> session keys, in attribution order. A key missing from the session
+# is also looked up inside its game_state (e.g. skills_exp).
+SUBSYSTEMS = (
+    ("messages", ("messages",)),
+    ("lore", ("lore", "lore_graph", "lore_index")),
+    ("timers", ("condition_timers",)),
+    ("skills", ("skills_exp",)),
+    ("state", ("game_state",)),
+    ("history", ("state_history",)),
+)
+_LORE_REGISTRIES = ("persons", "locations", "factions")
+# Never traversed: code and interpreter objects are shared by every session.
+_OPAQUE = (type, ModuleType, FunctionType, MethodType, type(len), type(sys._getframe()), threading.Thread)
+
+
+# ----------------- memory -----------------
+def deep_sizeof(obj, seen=None):
+    """Bytes of `obj` and everything it references that is not already in `seen` (ids; updated)."""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _OPAQUE):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, bytearray, int, float, complex, bool)) and obj is not None:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for klass in type(obj).__mro__:
+                for name in getattr(klass, "__slots__", ()):
+                    if name not in ("__dict__", "__weakref__"):
+                        stack.append(getattr(obj, name, None))
+    return total
+
+
+def session_breakdown(values, shared=None):
+    """
+    {subsystem: bytes, ..., "total": bytes} for one session's `values` (a mapping of
+    session keys). Objects whose ids are in `shared` (e.g. a process-wide initial
+    state that sessions read through to) are not charged to the session.
+    """
+    seen = set(shared or ())
+    game_state = values.get("game_state")
+    report = {}
+    charged = set()
+    for subsystem, keys in SUBSYSTEMS:
+        size = 0
+        for key in keys:
+            if key in values:
+                value = values[key]
+                charged.add(key)
+            elif game_state is not None and key in game_state:
+                # read the raw value: item access on a CowDict would copy lists
+                value = _raw(game_state).get(key)
+            else:
+                continue
+            size += deep_sizeof(value, seen)
+        report[subsystem] = size
+    report["other"] = sum(deep_sizeof(values[key], seen) for key in list(values) if key not in charged)
+    report["total"] = sum(report.values())
+    return report
+
+
+def _raw(state):
+    current = getattr(state, "_current", None)
+    return current() if current is not None else state
+
+
+def reachable_ids(obj):
+    """Ids of every object reachable from `obj` (for `shared` above)."""
+    seen = set()
+    deep_sizeof(obj, seen)
+    return seen
+
+
+_initial_ids = None
+
+
+def initial_state_ids():
+    """
+    reachable_ids of data.INITIAL_GAME_STATE, computed once: copy-on-write game states
+    read through to it, so it is shared by every session rather than owned by one.
+    """
+    global _initial_ids
+    if _initial_ids is None:
+        try:
+            from data import INITIAL_GAME_STATE
+        except ImportError:
+            INITIAL_GAME_STATE = None
+        _initial_ids = frozenset(reachable_ids(INITIAL_GAME_STATE)) if INITIAL_GAME_STATE is not None else frozenset()
+    return _initial_ids
+
+
+def memory_report(sessions, top=20, shared=None):
+    """Breakdowns of {session_id: values}, largest first, plus per-subsystem totals."""
+    rows = []
+    totals = Counter()
+    for session_id, values in sessions.items():
+        breakdown = session_breakdown(values, shared)
+        totals.update(breakdown)
+        rows.append({"session": session_id, **breakdown})
+    rows.sort(key=lambda row: row["total"], reverse=True)
+    return {"sessions": len(rows), "totals": dict(totals), "largest": rows[:top]}
+
+
+# ----------------- caps -----------------
+class SessionCaps:
+    """Per-session limits; 0 disables a limit. max_notes applies to each lore notes list."""
+    __slots__ = ("max_messages", "max_notes", "max_bytes")
+
+    def __init__(self, max_messages=0, max_notes=0, max_bytes=0):
+        self.max_messages = max_messages
+        self.max_notes = max_notes
+        self.max_bytes = max_bytes
+
+    def __bool__(self):
+        return bool(self.max_messages or self.max_notes or self.max_bytes)
+
+
+def caps_from_env():
+    """SESSION_MAX_MESSAGES, SESSION_MAX_NOTES (per notes list) and SESSION_MAX_BYTES; 0 = no cap."""
+    return SessionCaps(int(os.getenv("SESSION_MAX_MESSAGES", "0")), int(os.getenv("SESSION_MAX_NOTES", "0")),
+                       int(os.getenv("SESSION_MAX_BYTES", "0")))
+
+
+def trim_oldest(items, keep):
+    """Drop the oldest entries of the list `items` beyond the newest `keep` (0: no cap). Returns how many went."""
+    if keep <= 0:
+        return 0
+    return _drop_oldest(items, len(items) - keep)
+
+
+def _drop_oldest(items, n):
+    n = max(0, min(n, len(items)))
+    del items[:n]
+    return n
+
+
+def _note_lists(lore):
+    if not isinstance(lore, dict):
+        return []
+    lists = [lore.get("vexal", {}).get("notes")]
+    for registry in _LORE_REGISTRIES:
+        lists.extend(entry.get("notes") for entry in (lore.get(registry) or {}).values() if isinstance(entry, dict))
+    return [notes for notes in lists if isinstance(notes, list) and notes]
+
+
+def apply_caps(values, caps, shared=None):
+    """
+    Enforce `caps` on one session's `values` in place. Over max_bytes, the oldest
+    quarter of the longer of messages / all lore notes is dropped until the session
+    fits or nothing trimmable is left. Returns {"messages": n, "notes": n} trimmed.
+    """
+    trimmed = {"messages": 0, "notes": 0}
+    messages = values.get("messages")
+    if not isinstance(messages, list):
+        messages = []
+    if caps.max_messages:
+        trimmed["messages"] += trim_oldest(messages, caps.max_messages)
+    if caps.max_notes:
+        for notes in _note_lists(values.get("lore")):
+            trimmed["notes"] += trim_oldest(notes, caps.max_notes)
+    if caps.max_bytes:
+        while session_breakdown(values, shared)["total"] > caps.max_bytes:
+            note_lists = _note_lists(values.get("lore"))
+            n_notes = sum(len(notes) for notes in note_lists)
+            if not messages and not n_notes:
+                break
+            if len(messages) >= n_notes:
+                trimmed["messages"] += _drop_oldest(messages, max(1, len(messages) // 4))
+            else:
+                for notes in note_lists:
+                    trimmed["notes"] += _drop_oldest(notes, max(1, len(notes) // 4))
+    return trimmed
+
+
+# ----------------- CPU -----------------
+def _label(code):
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    Wall-clock sampler of Python stacks in a background thread. Only frames that are
+    running are on a stack: an awaiting coroutine or a sleeping lock holder's wait
+    shows up as the call it is blocked in, not as time in its caller.
+    `focus` is a set of "file.py:function" labels (see _label).
+    """
+
+    def __init__(self, interval=0.005, focus=None):
+        self.interval = interval
+        self.focus = frozenset(focus or ())
+        self.counts = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def sample(self, skip=None):
+        """Record one stack per thread (except `skip`)."""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            if self.focus:
+                root = next((i for i, label in enumerate(stack) if label in self.focus), None)
+                if root is None:
+                    continue
+                stack = stack[root:]
+            self.counts[";".join(stack)] += 1
+        self.samples += 1
+
+    def folded(self):
+        """Folded stacks, heaviest first: one "frame;frame;frame count" line per distinct stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
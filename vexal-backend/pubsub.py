@@ -0,0 +1,138 @@
+# pubsub.py
+# In-process pub/sub hub for pushing committed state changes to subscribers
+# (SSE / WebSocket connections), one topic per session.
+#
+#   InMemoryHub  - single worker, also used in tests
+#   RedisHub     - fans out across workers through Redis pub/sub (optional dependency),
+#                  delivering locally through an InMemoryHub
+import asyncio
+import logging
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional: only needed for RedisHub
+    aioredis = None
+
+from serialization import dumps, loads
+
+_log = logging.getLogger("vexal.pubsub")
+
+# Sent to a subscriber whose queue overflowed; it must resync from the full state.
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """Async iterator over messages for one subscriber; close() (or `with`) unsubscribes."""
+
+    def __init__(self, hub, topic, maxsize):
+        self.hub = hub
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog and tell it to resync instead of blocking publishers.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryHub:
+    """Fan-out of messages to local subscribers. publish() never blocks."""
+
+    def __init__(self, queue_size=64):
+        self.queue_size = queue_size
+        self._subs = {}   # topic -> set(Subscription)
+
+    def subscribe(self, topic):
+        sub = Subscription(self, topic, self.queue_size)
+        self._subs.setdefault(topic, set()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub):
+        subs = self._subs.get(sub.topic)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.topic]
+
+    def has_subscribers(self, topic):
+        return bool(self._subs.get(topic))
+
+    async def publish(self, topic, message):
+        self.deliver(topic, message)
+
+    def deliver(self, topic, message):
+        for sub in list(self._subs.get(topic, ())):
+            sub._offer(message)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisHub(InMemoryHub):
+    """
+    Publishes through Redis so every worker's subscribers see the message.
+    Each worker runs one listener task that delivers into its local subscribers.
+    """
+
+    def __init__(self, url, channel_prefix="vexal:state:", queue_size=64):
+        if aioredis is None:
+            raise RuntimeError("redis is not installed")
+        super().__init__(queue_size)
+        self.redis = aioredis.from_url(url)
+        self.prefix = channel_prefix
+        self._task = None
+
+    async def publish(self, topic, message):
+        await self.redis.publish(self.prefix + topic, dumps(message))
+
+    async def start(self):
+        pubsub = self.redis.pubsub()
+        await pubsub.psubscribe(self.prefix + "*")
+        self._task = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        async for item in pubsub.listen():
+            if item.get("type") != "pmessage":
+                continue
+            channel = item["channel"].decode() if isinstance(item["channel"], bytes) else item["channel"]
+            try:
+                self.deliver(channel[len(self.prefix):], loads(item["data"]))
+            except ValueError:
+                _log.warning("Dropping malformed pub/sub message on %s", channel)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        await self.redis.aclose()
+
+
+def create_hub(url=None):
+    """InMemoryHub by default; RedisHub when a redis:// URL is given."""
+    if url and url.startswith(("redis://", "rediss://")):
+        return RedisHub(url)
+    return InMemoryHub()
@@ -0,0 +1,260 @@
+# router.py
+# Entry point of the container (see Dockerfile).
+#   WORKERS=1 (default): serves main:app in this process, as before.
+#   WORKERS=N: starts N uvicorn workers on local ports and proxies each request to
+#   the worker that owns its session on a consistent-hash ring. The session key is
+#   the X-Session-Id header or ?session= parameter, else a sticky `vexal_route`
+#   cookie set on the first response. The router also serves the shared cache/lock
+#   tier for its workers under /_cluster (see cluster.py) and relays cross-worker
+#   messages, unless CLUSTER_CACHE_URL points them at Redis instead.
+#
+#   WORKERS=4 PORT=8080 python router.py
+#
+# ROUTER_POLICY=round-robin ignores sessions (each request goes to the next worker);
+# only useful to check that the shared locks alone keep sessions consistent.
+import asyncio
+import itertools
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import uuid
+
+_log = logging.getLogger("vexal.router")
+
+ROUTE_COOKIE = "vexal_route"
+_HOP_HEADERS = frozenset({"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length",
+                          "proxy-authorization", "proxy-authenticate", "te", "trailer"})
+
+
+def session_key(request):
+    """(routing key, whether a new sticky cookie must be set)."""
+    key = request.headers.get("x-session-id") or request.query_params.get("session")
+    if key:
+        return key, False
+    cookie = request.cookies.get(ROUTE_COOKIE)
+    if cookie:
+        return cookie, False
+    return uuid.uuid4().hex, True
+
+
+class Worker:
+    def __init__(self, worker_id, port):
+        self.id = worker_id
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = None
+        self.restarts = 0
+
+
+def create_router(workers, app_spec="main:app", token=None, router_url=None, cache_url=None, policy="hash"):
+    """
+    The router ASGI app for `workers` [(worker_id, port)]. Worker processes are
+    started and supervised from its lifespan.
+    """
+    if policy not in ("hash", "round-robin"):
+        raise ValueError(f"unknown routing policy {policy!r}")
+    import httpx
+    from fastapi import FastAPI, Request, Response, WebSocket
+    from fastapi.responses import StreamingResponse
+    from starlette.background import BackgroundTask
+
+    from cluster import TOKEN_HEADER, HashRing, LocalCache
+    from serialization import dumps, loads
+
+    token = token or secrets.token_hex(16)
+    pool = {worker_id: Worker(worker_id, port) for worker_id, port in workers}
+    ring = HashRing(pool)
+    tier = LocalCache("router")
+    app = FastAPI()
+    app.state.ring = ring
+    app.state.pool = pool
+    rotation = itertools.cycle(list(pool))
+
+    def worker_for(key):
+        return pool[ring.node_for(key) if policy == "hash" else next(rotation)]
+
+    def spawn(worker):
+        # TRUSTED_PROXIES: workers see the router as the peer and take the client address from it.
+        env = {**os.environ, "WORKER_ID": worker.id, "CLUSTER_TOKEN": token, "TRUSTED_PROXIES": "127.0.0.1",
+               "CLUSTER_CACHE_URL": cache_url or f"{router_url}/_cluster"}
+        worker.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", app_spec, "--host", "127.0.0.1", "--port", str(worker.port),
+             "--log-level", "warning"], env=env)
+
+    async def supervise():
+        while True:
+            await asyncio.sleep(1.0)
+            for worker in pool.values():
+                if worker.process.poll() is not None:
+                    worker.restarts += 1
+                    _log.warning("Worker %s exited with %s; restarting", worker.id, worker.process.returncode)
+                    spawn(worker)
+
+    @app.on_event("startup")
+    async def start_workers():
+        app.state.client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=1000))
+        for worker in pool.values():
+            spawn(worker)
+        for worker in pool.values():   # ready once every worker answers
+            for _ in range(600):
+                try:
+                    if (await app.state.client.get(worker.url + "/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        app.state.supervisor = asyncio.create_task(supervise())
+
+    @app.on_event("shutdown")
+    async def stop_workers():
+        app.state.supervisor.cancel()
+        for worker in pool.values():
+            worker.process.terminate()
+        for worker in pool.values():
+            try:
+                worker.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+        await app.state.client.aclose()
+
+    # ----------------- shared tier for the workers -----------------
+    def authorized(request):
+        return secrets.compare_digest(request.headers.get(TOKEN_HEADER, ""), token)
+
+    def forbidden():
+        return Response(status_code=403)
+
+    @app.get("/_cluster/cache/{key:path}")
+    async def cache_get(key: str, request: Request):
+        if not authorized(request):
+            return forbidden()
+        value = await tier.get(key)
+        if value is None:
+            return Response(status_code=404)
+        return Response(dumps({"value": value}), media_type="application/json")
+
+    @app.put("/_cluster/cache/{key:path}")
+    async def cache_set(key: str, request: Request):
+        if not authorized(request):
+            return forbidden()
+        body = loads(await request.body())
+        await tier.set(key, body["value"], body.get("ttl"))
+        return Response(status_code=204)
+
+    @app.delete("/_cluster/cache/{key:path}")
+    async def cache_delete(key: str, request: Request):
+        if not authorized(request):
+            return forbidden()
+        await tier.delete(key)
+        return Response(status_code=204)
+
+    @app.post("/_cluster/lock/{name:path}")
+    async def lock_acquire(name: str, request: Request):
+        if not authorized(request):
+            return forbidden()
+        body = loads(await request.body())
+        return Response(dumps({"acquired": await tier.acquire(name, body["token"], body["ttl"])}),
+                        media_type="application/json")
+
+    @app.delete("/_cluster/lock/{name:path}")
+    async def lock_release(name: str, request: Request):
+        if not authorized(request):
+            return forbidden()
+        body = loads(await request.body())
+        return Response(dumps({"released": await tier.release(name, body["token"])}), media_type="application/json")
+
+    @app.post("/_cluster/publish")
+    async def publish(request: Request):
+        if not authorized(request):
+            return forbidden()
+        body = await request.body()
+        origin = loads(body).get("origin")
+
+        async def relay(worker):
+            try:
+                await app.state.client.post(worker.url + "/_cluster/message", content=body,
+                                            headers={TOKEN_HEADER: token, "Content-Type": "application/json"})
+            except httpx.TransportError as exc:
+                _log.warning("Could not relay cluster message to %s: %s", worker.id, exc)
+
+        await asyncio.gather(*(relay(w) for w in pool.values() if w.id != origin))
+        return Response(status_code=204)
+
+    @app.get("/_router")
+    async def router_status():
+        return {"policy": policy, "workers": {w.id: {"port": w.port, "alive": w.process is not None and w.process.poll() is None,
+                                   "restarts": w.restarts} for w in pool.values()}}
+
+    # ----------------- proxy -----------------
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+    async def proxy(path: str, request: Request):
+        if path.startswith("_cluster/"):
+            return Response(status_code=404)   # worker-internal endpoints are never proxied
+        key, new_cookie = session_key(request)
+        worker = worker_for(key)
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS]
+        headers.append(("x-forwarded-for", request.client.host if request.client else ""))
+        upstream = app.state.client.build_request(
+            request.method, worker.url + request.url.path, params=request.query_params,
+            headers=headers, content=await request.body())
+        try:
+            response = await app.state.client.send(upstream, stream=True)
+        except httpx.TransportError:
+            return Response(status_code=502)
+        out_headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+        result = StreamingResponse(response.aiter_raw(), status_code=response.status_code, headers=out_headers,
+                                   background=BackgroundTask(response.aclose))
+        if new_cookie:
+            result.set_cookie(ROUTE_COOKIE, key, httponly=True, samesite="lax")
+        return result
+
+    @app.websocket("/{path:path}")
+    async def proxy_websocket(path: str, websocket: WebSocket):
+        import websockets
+
+        key = (websocket.headers.get("x-session-id") or websocket.query_params.get("session")
+               or websocket.cookies.get(ROUTE_COOKIE) or uuid.uuid4().hex)
+        worker = worker_for(key)
+        target = f"ws://127.0.0.1:{worker.port}{websocket.url.path}"
+        if websocket.url.query:
+            target += "?" + websocket.url.query
+        await websocket.accept()
+        async with websockets.connect(target) as upstream:
+            async def downstream():
+                async for message in upstream:
+                    await (websocket.send_text(message) if isinstance(message, str) else websocket.send_bytes(message))
+
+            task = asyncio.create_task(downstream())
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        break
+                    await upstream.send(message.get("text") if message.get("text") is not None else message["bytes"])
+            finally:
+                task.cancel()
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8080"))
+    n_workers = int(os.getenv("WORKERS", "1"))
+    if n_workers <= 1:
+        uvicorn.run("main:app", host=host, port=port)
+        return
+    base = int(os.getenv("WORKER_BASE_PORT", str(port + 1)))
+    app = create_router([(f"w{i}", base + i) for i in range(n_workers)],
+                        app_spec=os.getenv("WORKER_APP", "main:app"),
+                        router_url=f"http://127.0.0.1:{port}", cache_url=os.getenv("CLUSTER_CACHE_URL"),
+                        policy=os.getenv("ROUTER_POLICY", "hash"))
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# serialization.py
+# Fast encoding for API responses and persistence.
+#   JSON: orjson (falls back to the stdlib json module if orjson is missing)
+#   CBOR: cbor2, for compact storage
+# Both handle the types game/lore state actually holds: sets (lore tags),
+# OrderedDicts, copy-on-write CowDicts, array.array and numpy arrays.
+from array import array
+from collections.abc import Mapping
+import hashlib
+import json
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+try:
+    import cbor2
+except ImportError:  # optional: only needed for to_cbor/from_cbor
+    cbor2 = None
+
+
+def _default(obj):
+    """Encode the non-JSON types found in game and lore state."""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, array):
+        return obj.tolist()
+    if hasattr(obj, "tolist"):  # numpy arrays and scalars
+        return obj.tolist()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj):
+        """Serialize to compact JSON bytes."""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+
+    loads = orjson.loads
+
+    def _dumps_sorted(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS | orjson.OPT_SORT_KEYS)
+else:
+    def dumps(obj):
+        """Serialize to compact JSON bytes."""
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    loads = json.loads
+
+    def _dumps_sorted(obj):
+        return json.dumps(obj, default=_default, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def fingerprint(obj):
+    """Content hash independent of key order, e.g. to tell whether a game state changed."""
+    return hashlib.blake2b(_dumps_sorted(obj), digest_size=16).hexdigest()
+
+
+def _cbor_default(encoder, obj):
+    encoder.encode(_default(obj))
+
+
+def to_cbor(obj, value_sharing=False):
+    """
+    Serialize to CBOR bytes (sets are kept as CBOR sets). With value_sharing, objects
+    referenced more than once (structurally shared snapshots) are written once.
+    """
+    if cbor2 is None:
+        raise RuntimeError("cbor2 is not installed")
+    return cbor2.dumps(obj, default=_cbor_default, value_sharing=value_sharing)
+
+
+def from_cbor(data):
+    if cbor2 is None:
+        raise RuntimeError("cbor2 is not installed")
+    return cbor2.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with `dumps`; return it directly to skip jsonable_encoder."""
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
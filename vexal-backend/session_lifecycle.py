@@ -0,0 +1,265 @@
+# session_lifecycle.py
+# Idle-session hibernation for the Streamlit app.
+#
+# Every script run registers its session (attach()). A background sweeper finds
+# sessions idle for longer than `idle_seconds` (by last_action_time, or the last
+# script run if later), packs their heavy keys (game_state, lore, messages,
+# snapshot history, ...) into a compressed CBOR blob in a cold tier and deletes
+# them from memory, leaving only a marker. The next run of that session
+# rehydrates the keys before anything reads them. Worker memory then scales with
+# active players instead of connected ones. The sweep also enforces the per-session
+# caps of profiling.caps_from_env() on active sessions (oldest messages/notes go first).
+#
+# Cold tiers:
+#   DiskColdStore      - one file per session under a local directory
+#   FirestoreColdStore - one document per session (blob field, 1 MiB limit)
+import logging
+import os
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from lore_graph import LoreGraph
+from profiling import apply_caps, caps_from_env, initial_state_ids, memory_report
+from serialization import from_cbor, to_cbor
+from snapshots import CowDict, StateHistory
+
+_log = logging.getLogger("vexal.session_lifecycle")
+
+HIBERNATE_KEYS = ("game_state", "lore", "lore_graph", "messages", "state_history", "condition_timers")
+# Derived caches: dropped on hibernation and rebuilt on demand after rehydration.
+DERIVED_KEYS = ("lore_index",)
+MARKER = "_hibernated_at"
+_LORE_REGISTRIES = ("persons", "locations", "factions")
+FIRESTORE_MAX_BLOB = 1_000_000
+
+
+# ----------------- packing -----------------
+def pack(values):
+    """Session values -> zlib-compressed CBOR. Snapshots sharing subtrees are stored once."""
+    payload = dict(values)
+    if isinstance(payload.get("game_state"), CowDict):
+        payload["game_state"] = payload["game_state"].to_dict()
+    history = payload.get("state_history")
+    if isinstance(history, StateHistory):
+        payload["state_history"] = {"max_turns": history.max_turns, "items": history.items()}
+    if isinstance(payload.get("lore_graph"), LoreGraph):
+        payload["lore_graph"] = payload["lore_graph"].to_bytes()
+    return zlib.compress(to_cbor(payload, value_sharing=True), 6)
+
+
+def unpack(blob):
+    """
+    Inverse of pack: restores CowDict game_state, StateHistory, OrderedDict lore registries
+    and the lore graph (decoded lazily on its first query).
+    """
+    values = from_cbor(zlib.decompress(blob))
+    if isinstance(values.get("lore_graph"), bytes):
+        values["lore_graph"] = LoreGraph.from_bytes(values["lore_graph"])
+    if isinstance(values.get("game_state"), dict):
+        values["game_state"] = CowDict(values["game_state"])
+    history = values.get("state_history")
+    if isinstance(history, dict) and "items" in history:
+        values["state_history"] = StateHistory.from_items(
+            [tuple(item) for item in history["items"]], history.get("max_turns", 200))
+    lore = values.get("lore")
+    if isinstance(lore, dict):
+        for name in _LORE_REGISTRIES:
+            if isinstance(lore.get(name), dict):
+                lore[name] = OrderedDict(lore[name])
+    return values
+
+
+# ----------------- cold tiers -----------------
+class DiskColdStore:
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, session_id):
+        return self.dir / f"{session_id}.cbor.z"
+
+    def put(self, session_id, blob):
+        tmp = self._path(session_id).with_suffix(".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, self._path(session_id))
+
+    def get(self, session_id):
+        try:
+            return self._path(session_id).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, session_id):
+        self._path(session_id).unlink(missing_ok=True)
+
+
+class FirestoreColdStore:
+    def __init__(self, db, collection="hibernated_sessions"):
+        self.collection = db.collection(collection)
+
+    def put(self, session_id, blob):
+        if len(blob) > FIRESTORE_MAX_BLOB:
+            raise ValueError(f"session blob of {len(blob)} bytes exceeds the Firestore document limit")
+        self.collection.document(session_id).set({"blob": blob, "ts": time.time()})
+
+    def get(self, session_id):
+        snap = self.collection.document(session_id).get()
+        return snap.to_dict()["blob"] if snap.exists else None
+
+    def delete(self, session_id):
+        self.collection.document(session_id).delete()
+
+
+# ----------------- lifecycle -----------------
+def _timestamp(value):
+    """Epoch seconds of an ISO time; naive values are UTC (they come from datetime.utcnow())."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class SessionLifecycle:
+    """Registry of live sessions plus the hibernate / rehydrate logic and its sweeper thread."""
+
+    def __init__(self, cold_store, idle_seconds=900, sweep_seconds=60, keys=HIBERNATE_KEYS, caps=None):
+        self.cold_store = cold_store
+        self.idle_seconds = idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self.keys = keys
+        self.caps = caps
+        self._sessions = weakref.WeakValueDictionary()   # session_id -> SafeSessionState
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.hibernations = 0
+        self.rehydrations = 0
+        self.trimmed = {"messages": 0, "notes": 0}
+
+    def attach(self):
+        """
+        Call at the start of every script run: registers the session and rehydrates
+        it first if it was hibernated. No-op outside a Streamlit script run.
+        """
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return
+        with self._lock:
+            self._sessions[ctx.session_id] = ctx.session_state
+            self._last_seen[ctx.session_id] = time.time()
+            if MARKER in ctx.session_state:
+                self._rehydrate(ctx.session_id, ctx.session_state)
+        self._ensure_sweeper()
+
+    def _rehydrate(self, session_id, state):
+        blob = self.cold_store.get(session_id)
+        if blob is None:
+            _log.warning("No cold copy for hibernated session %s; it starts fresh", session_id)
+        else:
+            for key, value in unpack(blob).items():
+                state[key] = value
+            self.cold_store.delete(session_id)
+            self.rehydrations += 1
+        del state[MARKER]
+
+    def idle_for(self, session_id, state, now=None):
+        now = time.time() if now is None else now
+        last_action = _timestamp(state["last_action_time"]) if "last_action_time" in state else 0.0
+        return now - max(last_action, self._last_seen.get(session_id, 0.0))
+
+    def hibernate(self, session_id, state):
+        """Move the session's heavy keys to the cold tier. Returns the blob size, or 0 if skipped."""
+        if MARKER in state:
+            return 0
+        values = {key: state[key] for key in self.keys if key in state}
+        if not values:
+            return 0
+        blob = pack(values)
+        self.cold_store.put(session_id, blob)
+        for key in (*values, *(k for k in DERIVED_KEYS if k in state)):
+            del state[key]
+        state[MARKER] = time.time()
+        self.hibernations += 1
+        return len(blob)
+
+    def enforce_caps(self, session_id, state):
+        """Trim an active session down to self.caps (see profiling.apply_caps)."""
+        if not self.caps or MARKER in state:
+            return
+        trimmed = apply_caps(state.filtered_state, self.caps, initial_state_ids())
+        if any(trimmed.values()):
+            for key, n in trimmed.items():
+                self.trimmed[key] += n
+            _log.info("Trimmed session to its caps", extra={"session": session_id, **trimmed})
+
+    def sweep(self, now=None):
+        """Hibernate every registered session idle for longer than idle_seconds; cap the others."""
+        now = time.time() if now is None else now
+        count = 0
+        for session_id, state in list(self._sessions.items()):
+            with self._lock:
+                if self.idle_for(session_id, state, now) < self.idle_seconds:
+                    try:
+                        self.enforce_caps(session_id, state)
+                    except Exception as exc:
+                        _log.warning("Could not cap session %s: %s", session_id, exc)
+                    continue
+                try:
+                    size = self.hibernate(session_id, state)
+                except Exception as exc:
+                    _log.warning("Could not hibernate session %s: %s", session_id, exc)
+                    continue
+            if size:
+                count += 1
+                _log.info("Hibernated session", extra={"session": session_id, "bytes": size})
+        for session_id in [sid for sid in self._last_seen if sid not in self._sessions]:
+            self._last_seen.pop(session_id, None)
+        return count
+
+    def _ensure_sweeper(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+            self._thread.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self.sweep()
+            except Exception:
+                _log.exception("Session sweep failed")
+
+    def stats(self):
+        sessions = list(self._sessions.values())
+        hibernated = sum(1 for state in sessions if MARKER in state)
+        return {"sessions": len(sessions), "active": len(sessions) - hibernated, "hibernated": hibernated,
+                "hibernations": self.hibernations, "rehydrations": self.rehydrations, "trimmed": dict(self.trimmed)}
+
+    def memory_report(self, top=20):
+        """Per-session memory by subsystem for the active sessions (profiling.memory_report)."""
+        with self._lock:
+            sessions = {sid: state.filtered_state for sid, state in list(self._sessions.items()) if MARKER not in state}
+            return memory_report(sessions, top, initial_state_ids())
+
+
+def create_lifecycle():
+    """
+    From the environment: SESSION_IDLE_SECONDS (900), SESSION_COLD_STORE (disk|firestore),
+    SESSION_COLD_DIR (/tmp/vexal-sessions) and the SESSION_MAX_* caps (profiling.caps_from_env).
+    """
+    if os.getenv("SESSION_COLD_STORE", "disk") == "firestore":
+        from google.cloud import firestore
+
+        cold_store = FirestoreColdStore(firestore.Client())
+    else:
+        cold_store = DiskColdStore(os.getenv("SESSION_COLD_DIR", "/tmp/vexal-sessions"))
+    return SessionLifecycle(cold_store, idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "900")),
+                            caps=caps_from_env())
@@ -1,23 +1,119 @@
 import streamlit as st
+import numpy as np
+from state_model import Layout, skill_keys
+
+# Skills receive this fraction (integer division) of every character experience award.
+SKILL_EXP_DIVISOR = 10
+LEVEL_UP_GAINS = {"hp_max": 10, "stamina_max": 5, "mana_max": 5}
+
+
+def skill_table(skills):
+    """Precomputed skill-id table for a {category: {skill: level}} mapping (interned, shared)."""
+    return Layout.intern(skill_keys(skills))
+
+
+def skill_exp_vector(skills_exp, table):
+    """Dense int64 vector of skill exp in `table` order; missing entries count as 0."""
+    skills_exp = skills_exp or {}
+    return np.fromiter(
+        (skills_exp.get(cat, {}).get(name, 0) for cat, name in table.keys),
+        dtype=np.int64, count=len(table),
+    )
+
+
+def levels_gained(experience, per_level=100):
+    """
+    Closed-form level-up: returns (levels, remaining_experience).
+    Works on scalars and on numpy arrays (bulk awards).
+    """
+    return np.divmod(experience, per_level) if isinstance(experience, np.ndarray) else divmod(experience, per_level)
+
 
 def gain_experience(exp):
     """
     Adds experience to the session game_state, distributes small skill exp,
-    and handles character level-up when threshold is reached.
-    This preserves the original behaviour from app.py.
+    and handles character level-ups (several at once for large awards).
     """
     gs = st.session_state.game_state
     gs["experience"] = gs.get("experience", 0) + exp
-    # Level up skills based on usage
-    for cat, sks in gs.get("skills", {}).items():
-        for skill in sks:
-            if skill in gs.setdefault("skills_exp", {}).setdefault(cat, {s: 0 for s in sks.keys()}):
-                gs["skills_exp"][cat][skill] += exp // 10
+
+    # Every known skill gets the same share: one vectorized add over the dense table.
+    table = skill_table(gs.get("skills", {}))
+    if len(table):
+        exp_vec = skill_exp_vector(gs.get("skills_exp"), table)
+        exp_vec += exp // SKILL_EXP_DIVISOR
+        skills_exp = gs.setdefault("skills_exp", {})
+        for (cat, skill), value in zip(table.keys, exp_vec.tolist()):
+            skills_exp.setdefault(cat, {})[skill] = value
+
     # Level up character
-    if gs["experience"] >= 100:
-        gs["level"] = gs.get("level", 1) + 1
-        gs["hp_max"] = gs.get("hp_max", 0) + 10
-        gs["stamina_max"] = gs.get("stamina_max", 0) + 5
-        gs["mana_max"] = gs.get("mana_max", 0) + 5
-        gs["experience"] = 0
+    levels, remaining = levels_gained(gs["experience"], gs.get("experience_next", 100) or 100)
+    if levels:
+        gs["level"] = gs.get("level", 1) + levels
+        for key, gain in LEVEL_UP_GAINS.items():
+            gs[key] = gs.get(key, 0) + gain * levels
+        gs["experience"] = remaining
         st.success(f"Level up! New level: {gs['level']}")
+
+
+class SkillBook:
+    """
+    Skill exp and character progress for many characters/NPCs at once.
+    Rows are characters, columns are skill ids from one shared skill table,
+    so an award to every character is a single numpy add.
+    """
+
+    def __init__(self, table, n_rows):
+        self.table = table
+        self.exp = np.zeros((n_rows, len(table)), dtype=np.int64)
+        self.experience = np.zeros(n_rows, dtype=np.int64)
+        self.level = np.ones(n_rows, dtype=np.int64)
+
+    @classmethod
+    def from_states(cls, states):
+        """Build from game_state dicts; the skill table is the union of their skills."""
+        keys = {}
+        for gs in states:
+            for key in skill_keys(gs.get("skills", {})):
+                keys.setdefault(key, None)
+        book = cls(Layout.intern(keys), len(states))
+        for row, gs in enumerate(states):
+            book.exp[row] = skill_exp_vector(gs.get("skills_exp"), book.table)
+            book.experience[row] = gs.get("experience", 0)
+            book.level[row] = gs.get("level", 1)
+        return book
+
+    def skill_id(self, category, skill):
+        return self.table.index[(category, skill)]
+
+    def award(self, exp, rows=None):
+        """
+        Character experience award (scalar or one value per selected row); every
+        skill of the selected rows gets exp // SKILL_EXP_DIVISOR.
+        """
+        sel = slice(None) if rows is None else rows
+        exp = np.asarray(exp, dtype=np.int64)
+        self.experience[sel] += exp
+        self.exp[sel] += (exp // SKILL_EXP_DIVISOR)[..., None] if exp.ndim else exp // SKILL_EXP_DIVISOR
+
+    def award_skills(self, rows, skill_ids, amounts):
+        """Targeted skill exp: amounts[i] goes to (rows[i], skill_ids[i]); repeats accumulate."""
+        np.add.at(self.exp, (np.asarray(rows), np.asarray(skill_ids)), np.asarray(amounts, dtype=np.int64))
+
+    def apply_level_ups(self, per_level=100):
+        """Resolve all pending level-ups; returns levels gained per row."""
+        levels, self.experience = levels_gained(self.experience, per_level)
+        self.level += levels
+        return levels
+
+    def write_back(self, states, levels=None):
+        """Copy exp, experience, level (and pool gains for `levels`) back into the state dicts."""
+        for row, gs in enumerate(states):
+            skills_exp = gs.setdefault("skills_exp", {})
+            for (cat, skill), value in zip(self.table.keys, self.exp[row].tolist()):
+                skills_exp.setdefault(cat, {})[skill] = value
+            gs["experience"] = int(self.experience[row])
+            gs["level"] = int(self.level[row])
+            if levels is not None and levels[row]:
+                for key, gain in LEVEL_UP_GAINS.items():
+                    gs[key] = gs.get(key, 0) + gain * int(levels[row])
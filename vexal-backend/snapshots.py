@@ -0,0 +1,263 @@
+# snapshots.py
+# Copy-on-write game_state with structurally shared, immutable per-turn snapshots.
+#
+# A CowDict reads through to a shared base dict (e.g. INITIAL_GAME_STATE) and only
+# copies the dicts and lists along a path when something below them is written;
+# reads never copy. freeze()
+# hands out the current tree as a snapshot that shares every untouched subtree
+# with the previous one, so keeping one snapshot per turn costs O(changed fields).
+# Snapshots and bases are plain dicts and must be treated as read-only.
+from collections.abc import Mapping, MutableMapping, MutableSequence
+
+
+class _CowView:
+    """
+    Copy-on-write plumbing shared by CowDict and CowList: reads go to the shared
+    `_base`; the first write below this level makes an owned shallow copy (`_data`)
+    and links it into the parent's copy, so only the containers on the written
+    path are ever copied.
+    """
+    __slots__ = ()
+
+    def _current(self):
+        return self._data if self._data is not None else self._base
+
+    def _materialize(self):
+        if self._data is None:
+            self._data = self._copy(self._base)
+            if self._parent is not None:
+                self._parent._materialize()
+                self._parent._data[self._key] = self._data
+        return self._data
+
+    def _drop_view(self, key):
+        # Detach it: a view the caller still holds must not write into the slot's new value.
+        view = self._views.pop(key, None)
+        if view is not None:
+            view._parent = None
+
+    def _drop_views(self):
+        for key in list(self._views):
+            self._drop_view(key)
+
+    def _child(self, key, value):
+        """Nested containers come back as (cached) child views, so writes land in one place."""
+        if isinstance(value, dict):
+            view = self._views[key] = CowDict(value, _parent=self, _key=key)
+            return view
+        if isinstance(value, list):
+            view = self._views[key] = CowList(value, _parent=self, _key=key)
+            return view
+        return value
+
+    def __eq__(self, other):
+        return self._current() == (other._current() if isinstance(other, _CowView) else other)
+
+    __hash__ = None
+
+    def to_dict(self):
+        """
+        Current tree as plain nested dicts and lists, without resetting copy-on-write
+        state. Read-only: it may be the shared base or a snapshot's tree.
+        """
+        return self._current()
+
+    def freeze(self):
+        """
+        Return the current tree as an immutable snapshot and make every live view
+        copy-on-write again, so later writes never touch the snapshot.
+        """
+        snap = self._current()
+        self._reset()
+        return snap
+
+    def _reset(self):
+        if self._data is not None:
+            self._base = self._data
+            self._data = None
+        for key, view in list(self._views.items()):
+            current = self._peek(key)
+            if current is not view._base and current is not view._data:
+                # The key was replaced or removed underneath this view.
+                self._drop_view(key)
+                continue
+            view._reset()
+
+
+def _plain(value):
+    return value.to_dict() if isinstance(value, _CowView) else value
+
+
+class CowDict(_CowView, MutableMapping):
+    """
+    Mutable, copy-on-write view over a read-only nested dict.
+    Nested dicts and lists come back as child views (CowDict / CowList).
+    """
+    __slots__ = ("_base", "_data", "_views", "_parent", "_key")
+    _copy = dict
+
+    def __init__(self, base=None, _parent=None, _key=None):
+        self._base = base if base is not None else {}
+        self._data = None      # owned shallow copy of _base, created on first write
+        self._views = {}       # key -> child view
+        self._parent = _parent
+        self._key = _key
+
+    def _peek(self, key):
+        return self._base.get(key)
+
+    # ----------------- Mapping interface -----------------
+    def __getitem__(self, key):
+        view = self._views.get(key)
+        if view is not None:
+            return view
+        return self._child(key, self._current()[key])
+
+    def __setitem__(self, key, value):
+        self._drop_view(key)
+        self._materialize()[key] = _plain(value)
+
+    def __delitem__(self, key):
+        data = self._materialize()
+        del data[key]
+        self._drop_view(key)
+
+    def __iter__(self):
+        return iter(self._current())
+
+    def __len__(self):
+        return len(self._current())
+
+    def __contains__(self, key):
+        return key in self._current()
+
+    def __repr__(self):
+        return f"CowDict({self._current()!r})"
+
+    def copy(self):
+        """Shallow plain-dict copy of this level (nested values are the shared originals)."""
+        return dict(self._current())
+
+
+class CowList(_CowView, MutableSequence):
+    """
+    Mutable, copy-on-write view over a read-only list inside a CowDict. Inserting
+    or deleting shifts positions, so it drops the cached child views.
+    """
+    __slots__ = ("_base", "_data", "_views", "_parent", "_key")
+    _copy = list
+
+    def __init__(self, base, _parent=None, _key=None):
+        self._base = base
+        self._data = None
+        self._views = {}       # index -> child view
+        self._parent = _parent
+        self._key = _key
+
+    def _peek(self, index):
+        return self._base[index] if index < len(self._base) else None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        view = self._views.get(index)
+        if view is not None:
+            return view
+        return self._child(index, self._current()[index])
+
+    def __setitem__(self, index, value):
+        data = self._materialize()
+        if isinstance(index, slice):
+            data[index] = [_plain(v) for v in value]
+            self._drop_views()
+            return
+        if index < 0:
+            index += len(data)
+        data[index] = _plain(value)
+        self._drop_view(index)
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+        self._drop_views()
+
+    def insert(self, index, value):
+        self._materialize().insert(index, _plain(value))
+        self._drop_views()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __len__(self):
+        return len(self._current())
+
+    def __repr__(self):
+        return f"CowList({self._current()!r})"
+
+    def copy(self):
+        """Shallow plain-list copy (nested values are the shared originals)."""
+        return list(self._current())
+
+
+class StateHistory:
+    """
+    Bounded list of per-turn snapshots. Each snapshot shares unchanged subtrees
+    with its neighbours, so memory grows with what changed, not with state size.
+    """
+
+    def __init__(self, max_turns=200):
+        self.max_turns = max_turns
+        self._snaps = []   # [(turn, snapshot)]
+
+    def record(self, turn, snapshot):
+        if self._snaps and self._snaps[-1][0] == turn:
+            self._snaps[-1] = (turn, snapshot)
+        else:
+            self._snaps.append((turn, snapshot))
+        if len(self._snaps) > self.max_turns:
+            del self._snaps[: len(self._snaps) - self.max_turns]
+
+    def turns(self):
+        return [t for t, _ in self._snaps]
+
+    def get(self, turn):
+        """Snapshot recorded at `turn` (or the latest one before it), else None."""
+        found = None
+        for t, snap in self._snaps:
+            if t > turn:
+                break
+            found = snap
+        return found
+
+    def truncate_after(self, turn):
+        """Drop history newer than `turn` (used after a rewind)."""
+        self._snaps = [(t, s) for t, s in self._snaps if t <= turn]
+
+    def items(self):
+        """[(turn, snapshot)], oldest first (for serialization)."""
+        return list(self._snaps)
+
+    @classmethod
+    def from_items(cls, items, max_turns=200):
+        history = cls(max_turns)
+        history._snaps = [(t, s) for t, s in items][-max_turns:]
+        return history
+
+    def __len__(self):
+        return len(self._snaps)
+
+
+def assoc_in(state, path, value):
+    """
+    Persistent update: return a new dict equal to `state` with `value` at `path`,
+    copying only the dicts along the path.
+    """
+    if not path:
+        return value
+    key = path[0]
+    current = state.get(key) if isinstance(state, Mapping) else None
+    out = dict(state) if state is not None else {}
+    out[key] = assoc_in(current if isinstance(current, Mapping) else {}, path[1:], value)
+    return out
@@ -0,0 +1,219 @@
+# speculation.py
+# Speculative pre-generation of GM turns.
+#
+# While the player reads a narration, the backend predicts a few likely next
+# commands (choices the narration offers, else common verbs) and generates their
+# responses in the background against the committed state. Each batch is keyed by
+# the state's fingerprint: when the next command matches a prediction and the
+# state is unchanged, the stored response is used without waiting for the LLM.
+# Any state change or a non-matching command discards the batch.
+#
+# Speculation spends tokens that may be thrown away, so each session has a token
+# bucket (admission.TokenBucket) and a small global concurrency cap keeps
+# background generations from competing with real turns.
+import asyncio
+import logging
+import re
+from collections import OrderedDict
+
+from admission import TokenBucket
+from serialization import fingerprint
+
+_log = logging.getLogger("vexal.speculation")
+
+COMMON_COMMANDS = ("look around", "continue", "search the area", "attack")
+_FILLER_PREFIX_RX = re.compile(r"^(?:i\s+(?:want|would like|will|try)\s+to\s+|i\s+|let's\s+|let me\s+|please\s+|try to\s+)+")
+_PUNCT_RX = re.compile(r"[^\w\s']+")
+# Offered choices: list items ("1. Open the door", "- Flee", "(b) Hide") ...
+_CHOICE_LINE_RX = re.compile(r"^\s*(?:[-*•]|\d+[.)]|\(?[a-eA-E][.)])\s+(.{3,80}?)\s*[.!?]?\s*$", re.M)
+# ... and inline offers ("You could fight the guard, sneak past, or turn back.")
+_OFFER_RX = re.compile(
+    r"\b(?:you (?:can|could|may|might)|will you|do you|would you|you must decide whether to)\s+([^.?!\n]{3,160})[.?!]",
+    re.I)
+_ALTERNATIVES_RX = re.compile(r"\s*(?:,\s*or\s+|,\s*|\s+or\s+)")
+_ARTICLE_RX = re.compile(r"^(?:the|a|an)\s", re.I)
+
+
+def normalize_command(text):
+    """Comparison key for commands: 'I want to open the door!' -> 'open the door'."""
+    text = " ".join(_PUNCT_RX.sub(" ", str(text).lower()).split())
+    return _FILLER_PREFIX_RX.sub("", text).strip()
+
+
+def predict_commands(narration, limit=3):
+    """
+    Likely next commands for `narration`, most likely first: [(command, aliases)].
+    Numbered choices also match their number ("2" picks the second option).
+    """
+    predictions = []
+    seen = set()
+
+    def offer(command, aliases=()):
+        key = normalize_command(command)
+        if key and key not in seen and len(predictions) < limit:
+            seen.add(key)
+            predictions.append((command.strip(), tuple(aliases)))
+
+    for number, match in enumerate(_CHOICE_LINE_RX.finditer(narration or ""), 1):
+        offer(match.group(1), (str(number),))
+    for match in _OFFER_RX.finditer(narration or ""):
+        verb = None
+        for alternative in _ALTERNATIVES_RX.split(match.group(1)):
+            alternative = re.sub(r"^(?:to|either)\s+", "", alternative.strip(), flags=re.I)
+            if verb is None:
+                verb = alternative.split(" ", 1)[0]
+            elif _ARTICLE_RX.match(alternative):
+                alternative = f"{verb} {alternative}"   # "take the left path or the right path"
+            if 3 <= len(alternative) <= 60:
+                offer(alternative)
+    for command in COMMON_COMMANDS:
+        offer(command)
+    return predictions
+
+
+class _Entry:
+    __slots__ = ("command", "task", "tokens", "estimate", "bucket", "started")
+
+    def __init__(self, command, estimate, bucket):
+        self.command = command
+        self.task = None
+        self.tokens = None
+        self.estimate = estimate
+        self.bucket = bucket
+        self.started = False
+
+
+class _Batch:
+    __slots__ = ("fingerprint", "entries")
+
+    def __init__(self, state_fingerprint):
+        self.fingerprint = state_fingerprint
+        self.entries = {}   # normalized command or alias -> _Entry
+
+
+class Speculator:
+    """
+    `generate(state, command)` is an async callable returning (response text, tokens used).
+    schedule() after a committed turn; take() at the start of the next one.
+    """
+
+    def __init__(self, generate, max_predictions=3, tokens_per_min=1500, token_burst=3000,
+                 cost_estimate=350, max_concurrent=2, max_sessions=1000):
+        self.generate = generate
+        self.max_predictions = max_predictions
+        self.tokens_per_min = tokens_per_min
+        self.token_burst = token_burst
+        self.cost_estimate = cost_estimate
+        self.max_sessions = max_sessions
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._batches = OrderedDict()   # session -> _Batch
+        self._budgets = OrderedDict()   # session -> TokenBucket
+        self.counts = dict.fromkeys(("scheduled", "budget_skipped", "failed", "lookups", "hits", "hits_pending",
+                                     "misses", "stale", "generated_tokens", "wasted_tokens"), 0)
+
+    # ----------------- scheduling -----------------
+    def _budget(self, session):
+        bucket = self._budgets.get(session)
+        if bucket is None:
+            bucket = self._budgets[session] = TokenBucket(self.tokens_per_min / 60.0, self.token_burst)
+            if len(self._budgets) > self.max_sessions:
+                self._budgets.popitem(last=False)
+        else:
+            self._budgets.move_to_end(session)
+        return bucket
+
+    def schedule(self, session, state, narration):
+        """Start background generations for the likely next commands. Returns the commands scheduled."""
+        self.discard(session)
+        batch = _Batch(fingerprint(state))
+        bucket = self._budget(session)
+        scheduled = []
+        for command, aliases in predict_commands(narration, self.max_predictions):
+            if bucket.take(amount=self.cost_estimate):
+                self.counts["budget_skipped"] += 1
+                break
+            entry = _Entry(command, self.cost_estimate, bucket)
+            entry.task = asyncio.create_task(self._run(entry, state))
+            for key in (normalize_command(command), *aliases):
+                batch.entries.setdefault(key, entry)
+            scheduled.append(command)
+        if scheduled:
+            self._batches[session] = batch
+            while len(self._batches) > self.max_sessions:
+                self.discard(next(iter(self._batches)))
+            self.counts["scheduled"] += len(scheduled)
+        return scheduled
+
+    async def _run(self, entry, state):
+        """The generated text, or None if generation failed (nobody may ever await this task)."""
+        try:
+            async with self._slots:
+                entry.started = True
+                text, tokens = await self.generate(state, entry.command)
+        except Exception as exc:
+            self.counts["failed"] += 1
+            _log.warning("Speculative generation failed: %s", exc)
+            entry.bucket.tokens += entry.estimate   # nothing usable was produced: refund the budget
+            return None
+        entry.tokens = tokens
+        self.counts["generated_tokens"] += tokens
+        entry.bucket.tokens -= tokens - entry.estimate   # settle the estimate against actual use
+        return text
+
+    def discard(self, session):
+        """Drop a session's pending speculation, counting unused generations as waste."""
+        batch = self._batches.pop(session, None)
+        if batch is None:
+            return
+        for entry in set(batch.entries.values()):
+            if not entry.task.done():
+                entry.task.cancel()
+                if entry.started:   # the completion in flight still bills: count it as spent and wasted
+                    self.counts["generated_tokens"] += entry.estimate
+                    self.counts["wasted_tokens"] += entry.estimate
+                else:
+                    entry.bucket.tokens += entry.estimate   # never sent: refund the budget
+            elif not entry.task.cancelled() and entry.task.exception() is None:
+                self.counts["wasted_tokens"] += entry.tokens or 0
+
+    # ----------------- lookup -----------------
+    async def take(self, session, state, command):
+        """The speculated response for `command` in `state`, or None (the caller asks the LLM)."""
+        batch = self._batches.get(session)
+        if batch is None:
+            return None
+        self.counts["lookups"] += 1
+        if batch.fingerprint != fingerprint(state):
+            self.counts["stale"] += 1
+            self.discard(session)
+            return None
+        entry = batch.entries.get(normalize_command(command))
+        if entry is None:
+            self.counts["misses"] += 1
+            self.discard(session)
+            return None
+        pending = not entry.task.done()
+        try:
+            # shield: a client disconnect must not cancel a generation we may still use
+            text = await asyncio.shield(entry.task)
+        except Exception:
+            text = None
+        if text is None:   # the generation failed: same as no prediction
+            self.counts["misses"] += 1
+            self.discard(session)
+            return None
+        self.counts["hits_pending" if pending else "hits"] += 1
+        for key in [key for key, other in batch.entries.items() if other is entry]:
+            del batch.entries[key]
+        self.discard(session)
+        return text
+
+    def stats(self):
+        served = self.counts["hits"] + self.counts["hits_pending"]
+        generated = self.counts["generated_tokens"]
+        return {
+            **self.counts,
+            "sessions": len(self._batches),
+            "hit_rate": round(served / self.counts["lookups"], 3) if self.counts["lookups"] else None,
+            "waste_ratio": round(self.counts["wasted_tokens"] / generated, 3) if generated else None,
+        }
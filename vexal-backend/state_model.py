@@ -0,0 +1,74 @@
+# state_model.py
+# Shared key layouts for the dict game_state: interned key tables (Layout), the
+# flattened skill order, the pool/progress key sets and the condition bitset order
+# over CONDITION_EFFECTS. Sessions are stored as plain dicts (Firestore format);
+# the vectorized paths (skills, combat, world_tick, catalog ids) use these tables
+# to map dict keys onto dense array positions.
+import weakref
+
+from conditions import CONDITION_EFFECTS
+
+POOL_KEYS = ("hp", "hp_max", "mana", "mana_max", "stamina", "stamina_max")
+POOL_INDEX = {k: i for i, k in enumerate(POOL_KEYS)}
+CONDITION_NAMES = tuple(CONDITION_EFFECTS)
+CONDITION_BITS = {name: 1 << i for i, name in enumerate(CONDITION_NAMES)}
+PROGRESS_KEYS = ("level", "experience", "experience_next", "game_datetime", "hours_per_turn")
+
+
+class Layout:
+    """
+    Immutable ordered key table (name -> dense index), interned so every session
+    with the same attribute or skill set shares one instance. The intern table holds
+    layouts weakly: a layout no state uses any more is freed.
+    """
+    __slots__ = ("keys", "index", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+
+    @classmethod
+    def intern(cls, keys):
+        keys = tuple(keys)
+        layout = cls._interned.get(keys)
+        if layout is None:
+            layout = cls._interned[keys] = cls(keys)
+        return layout
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def skill_keys(skills):
+    """Flatten {category: {skill: value}} into [(category, skill), ...]."""
+    return [(cat, name) for cat, sks in (skills or {}).items() for name in sks]
+
+
+def nest_skills(layout, values):
+    """Inverse of skill_keys: rebuild {category: {skill: value}} from a dense array."""
+    out = {}
+    for (cat, name), val in zip(layout.keys, values):
+        out.setdefault(cat, {})[name] = val
+    return out
+
+
+def conditions_to_bits(conditions):
+    """Split a conditions mapping into (bitset of known flags, dict of non-flag entries)."""
+    bits = 0
+    extra = {}
+    for name, value in (conditions or {}).items():
+        bit = CONDITION_BITS.get(name)
+        if bit is not None and value is True:
+            bits |= bit
+        else:
+            extra[name] = value
+    return bits, extra
+
+
+def bits_to_conditions(bits, extra=None):
+    """Inverse of conditions_to_bits; known flags come first in CONDITION_EFFECTS order."""
+    out = {name: True for name in CONDITION_NAMES if bits & CONDITION_BITS[name]}
+    if extra:
+        out.update(extra)
+    return out
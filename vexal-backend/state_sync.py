@@ -0,0 +1,93 @@
+# state_sync.py
+# Versioned game_state deltas, shared by the event log and the API responses.
+# A delta is a list of ops:  ["set", [path...], value]  or  ["del", [path...]].
+# Clients send the state_version they hold and receive only the ops since then;
+# if that version is no longer known they get the full state (resync).
+from collections import OrderedDict
+from copy import deepcopy
+
+_MISSING = object()
+
+
+def state_delta(old, new, _path=()):
+    """
+    Return a list of delta ops turning `old` into `new`:
+      ["set", [path...], value]  or  ["del", [path...]]
+    Nested dicts are diffed key by key; any other changed value is replaced whole.
+    """
+    ops = []
+    for key, value in new.items():
+        prev = old.get(key, _MISSING) if isinstance(old, dict) else _MISSING
+        path = _path + (key,)
+        if prev is value:
+            continue
+        if isinstance(prev, dict) and isinstance(value, dict):
+            ops.extend(state_delta(prev, value, path))
+        elif prev is _MISSING or prev != value:
+            ops.append(["set", list(path), value])
+    if isinstance(old, dict):
+        for key in old.keys() - new.keys():
+            ops.append(["del", list(_path + (key,))])
+    return ops
+
+
+def apply_delta(state, ops):
+    """Apply delta ops in place and return `state`."""
+    for op in ops:
+        path = op[1]
+        node = state
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        if op[0] == "set":
+            node[path[-1]] = deepcopy(op[2])
+        else:
+            node.pop(path[-1], None)
+    return state
+
+
+class StateVersions:
+    """
+    Recent (version -> snapshot) history per session, kept in process memory.
+    Only the last `depth` versions can be diffed against; older or unknown
+    versions (e.g. after a restart or on another worker) trigger a full resync.
+    """
+
+    def __init__(self, depth=16, max_sessions=10_000):
+        self.depth = depth
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()   # session_id -> OrderedDict(version -> snapshot)
+
+    def record(self, session_id, version, game_state):
+        """Keep `game_state` as `version`. It is stored as is, not copied: callers must not modify it afterwards."""
+        history = self._sessions.pop(session_id, None) or OrderedDict()
+        history[version] = game_state
+        while len(history) > self.depth:
+            history.popitem(last=False)
+        self._sessions[session_id] = history
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id, version):
+        return self._sessions.get(session_id, {}).get(version)
+
+    def sessions(self):
+        """[(session_id, OrderedDict(version -> snapshot))], least recently recorded first."""
+        return list(self._sessions.items())
+
+    def discard(self, session_id):
+        """Forget a session's versions (e.g. another worker committed a newer one)."""
+        self._sessions.pop(session_id, None)
+
+    def encode(self, session_id, game_state, version, client_version=None):
+        """
+        Response payload for a client holding `client_version`:
+          {"state_version": v, "delta": ops}                       when it can be diffed
+          {"state_version": v, "game_state": full, "resync": True}  otherwise
+        """
+        if client_version is not None:
+            if client_version == version:
+                return {"state_version": version, "delta": []}
+            base = self.get(session_id, client_version)
+            if base is not None:
+                return {"state_version": version, "delta": state_delta(base, game_state)}
+        return {"state_version": version, "game_state": game_state, "resync": client_version is not None}
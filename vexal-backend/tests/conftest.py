@@ -0,0 +1,7 @@
+# conftest.py
+# The backend is a flat set of modules run from vexal-backend/; make them importable
+# when pytest is started from anywhere.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, RateLimiter, Rejected, TokenBucket
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=1.0, burst=2, now=0.0)
+    assert bucket.take(now=0.0) == 0.0
+    assert bucket.take(now=0.0) == 0.0
+    assert bucket.take(now=0.0) == pytest.approx(1.0)
+    assert bucket.take(now=0.5) == pytest.approx(0.5)
+    assert bucket.take(now=1.0) == 0.0
+
+
+def test_rate_limiter_keeps_buckets_per_key_and_evicts_lru():
+    limiter = RateLimiter(rate=1.0, burst=1, max_keys=2)
+    assert limiter.check("a", now=0.0) == 0.0
+    assert limiter.check("a", now=0.0) > 0
+    assert limiter.check("b", now=0.0) == 0.0
+    assert limiter.check("c", now=0.0) == 0.0   # evicts "a"
+    assert limiter.check("a", now=0.0) == 0.0
+
+
+def test_rejected_rounds_retry_after_up():
+    assert Rejected(429, "slow", 0.2).headers == {"Retry-After": "1"}
+    assert Rejected(503, "busy", 2.5).retry_after == 3
+
+
+def test_rate_limit_rejects_with_429():
+    async def scenario():
+        admission = AdmissionController(rate_per_min=60, burst=1)
+        async with admission.admit("1.2.3.4", "p1"):
+            pass
+        with pytest.raises(Rejected) as info:
+            async with admission.admit("1.2.3.4", "p1"):
+                pass
+        return info.value.status
+
+    assert asyncio.run(scenario()) == 429
+
+
+def test_single_flight_per_player():
+    async def scenario():
+        admission = AdmissionController(rate_per_min=0)
+        statuses = []
+        async with admission.admit("ip", "p1"):
+            try:
+                async with admission.admit("ip", "p1"):
+                    pass
+            except Rejected as exc:
+                statuses.append(exc.status)
+            async with admission.admit("ip", "p2"):   # another player is not blocked
+                statuses.append("p2 ran")
+        async with admission.admit("ip", "p1"):   # released after the first turn
+            statuses.append("p1 again")
+        return statuses
+
+    assert asyncio.run(scenario()) == [409, "p2 ran", "p1 again"]
+
+
+def test_full_queue_sheds_with_503():
+    async def scenario():
+        admission = AdmissionController(rate_per_min=0, max_concurrent=1, max_queue=1, queue_timeout=1.0)
+        release = asyncio.Event()
+
+        async def turn(player):
+            async with admission.admit(player, player):
+                await release.wait()
+
+        first = asyncio.create_task(turn("a"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(turn("b"))
+        await asyncio.sleep(0)
+        assert admission.stats()["running"] == 1 and admission.stats()["waiting"] == 1
+        with pytest.raises(Rejected) as info:
+            async with admission.admit("c", "c"):
+                pass
+        release.set()
+        await asyncio.gather(first, queued)
+        return info.value.status, admission.stats()
+
+    status, stats = asyncio.run(scenario())
+    assert status == 503
+    assert stats["running"] == 0 and stats["waiting"] == 0
+
+
+def test_queue_timeout_rejects_with_503():
+    async def scenario():
+        admission = AdmissionController(rate_per_min=0, max_concurrent=1, queue_timeout=0.05)
+        async with admission.admit("a", "a"):
+            with pytest.raises(Rejected) as info:
+                async with admission.admit("b", "b"):
+                    pass
+        return info.value.status
+
+    assert asyncio.run(scenario()) == 503
+
+
+def test_same_document_runs_in_arrival_order():
+    async def scenario():
+        admission = AdmissionController(rate_per_min=0, max_concurrent=4)
+        order = []
+
+        async def turn(player, delay):
+            async with admission.admit(player, player, doc="sessions/shared"):
+                order.append(f"{player} start")
+                await asyncio.sleep(delay)
+                order.append(f"{player} end")
+
+        await asyncio.gather(turn("a", 0.02), turn("b", 0.0))
+        return order
+
+    assert asyncio.run(scenario()) == ["a start", "a end", "b start", "b end"]
@@ -0,0 +1,53 @@
+from entity_index import EntityIndex, core_name, normalize_name
+
+
+def make_index():
+    index = EntityIndex()
+    index.add("Sister Mira")
+    index.add("Archivist Mera", aliases=["Mera of the Archive"])
+    index.add("Captain Aldric Vane")
+    index.add("Thornwood Keep")
+    return index
+
+
+def test_normalization_ignores_order_case_articles_and_titles():
+    assert normalize_name("Mera the Archivist") == normalize_name("archivist MERA") == "archivist mera"
+    assert core_name("Archivist Mera") == "mera"
+    assert normalize_name("Mera's") == "mera"
+
+
+def test_exact_and_core_lookups():
+    index = make_index()
+    assert index.resolve("mera the archivist") == "Archivist Mera"
+    assert index.resolve("Mira") == "Sister Mira"
+    assert index.resolve("Mera of the Archive") == "Archivist Mera"
+    assert len(index) == 4
+
+
+def test_fuzzy_matches_typos_in_long_names():
+    index = make_index()
+    assert index.resolve("Captain Aldric Vain") == "Captain Aldric Vane"
+    assert index.resolve("Lord Aldrik Vane") == "Captain Aldric Vane"
+    assert index.resolve("Thornwod Keep") == "Thornwood Keep"
+
+
+def test_titles_do_not_make_different_names_match():
+    index = make_index()
+    assert index.resolve("Sister Nira") is None
+    assert index.resolve("Nira") is None
+    assert index.resolve("Archivist Tera") is None
+
+
+def test_ambiguous_core_names_do_not_resolve():
+    index = EntityIndex()
+    index.add("Lord Aldric")
+    index.add("Brother Aldric")
+    assert index.resolve("Aldric") is None
+    assert index.resolve("Aldrik") is None
+    assert index.resolve("Lord Aldric") == "Lord Aldric"
+
+
+def test_unknown_and_empty_names():
+    index = make_index()
+    assert index.resolve("Goblin") is None
+    assert index.resolve("the") is None
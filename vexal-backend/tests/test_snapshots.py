@@ -0,0 +1,90 @@
+from snapshots import CowDict, CowList, StateHistory, assoc_in
+
+
+def make_base():
+    return {
+        "player": {"hp": 100, "mana": 50},
+        "inventory": [{"id": "a", "name": "Rope"}, {"id": "b", "name": "Torch"}],
+        "conditions": {"Blessed": True},
+    }
+
+
+def test_reads_do_not_copy():
+    base = make_base()
+    state = CowDict(base)
+    assert state["player"]["hp"] == 100
+    assert [item["id"] for item in state["inventory"]] == ["a", "b"]
+    assert isinstance(state["inventory"], CowList)
+    assert state._data is None
+    assert state.to_dict() is base
+
+
+def test_writes_copy_only_the_written_path():
+    base = make_base()
+    state = CowDict(base)
+    state["player"]["hp"] = 90
+    tree = state.to_dict()
+    assert base["player"]["hp"] == 100
+    assert tree["player"] == {"hp": 90, "mana": 50}
+    assert tree["inventory"] is base["inventory"]
+    assert tree["conditions"] is base["conditions"]
+
+
+def test_list_writes_leave_the_base_untouched():
+    base = make_base()
+    state = CowDict(base)
+    bags = state["inventory"]
+    bags[0]["name"] = "Long rope"
+    bags.append({"id": "c", "name": "Map"})
+    del bags[1]
+    assert base["inventory"] == [{"id": "a", "name": "Rope"}, {"id": "b", "name": "Torch"}]
+    assert state.to_dict()["inventory"] == [{"id": "a", "name": "Long rope"}, {"id": "c", "name": "Map"}]
+    assert bags[-1]["id"] == "c"
+    assert bags[:1] == [{"id": "a", "name": "Long rope"}]
+
+
+def test_freeze_isolates_snapshots_and_shares_untouched_subtrees():
+    state = CowDict(make_base())
+    state["player"]["hp"] = 80
+    first = state.freeze()
+    state["player"]["hp"] = 70
+    state["inventory"][0]["name"] = "Frayed rope"
+    second = state.freeze()
+    assert first["player"]["hp"] == 80
+    assert first["inventory"][0]["name"] == "Rope"
+    assert second["player"]["hp"] == 70
+    assert second["conditions"] is first["conditions"]
+
+
+def test_replaced_values_detach_stale_views():
+    base = make_base()
+    state = CowDict(base)
+    old = state["player"]
+    state["player"] = {"hp": 1}
+    old["hp"] = 5
+    assert state.to_dict()["player"] == {"hp": 1}
+    assert base["player"]["hp"] == 100
+
+
+def test_views_compare_and_unwrap_like_plain_values():
+    state = CowDict(make_base())
+    assert state == make_base()
+    assert state["inventory"] == make_base()["inventory"]
+    state["copy"] = state["player"]
+    state["copy"]["hp"] = 1
+    assert state["player"]["hp"] == 100
+
+
+def test_state_history_and_assoc_in():
+    history = StateHistory(max_turns=2)
+    for turn in range(3):
+        history.record(turn, {"turn": turn})
+    assert history.turns() == [1, 2]
+    assert history.get(5) == {"turn": 2}
+    assert history.get(0) is None
+
+    base = {"a": {"b": 1}, "c": {"d": 2}}
+    updated = assoc_in(base, ("a", "b"), 3)
+    assert updated == {"a": {"b": 3}, "c": {"d": 2}}
+    assert updated["c"] is base["c"]
+    assert base["a"]["b"] == 1
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+import traffic
+from traffic import MAGIC, TraceWriter, TrafficRecorderMiddleware, prompt_shape, read_traces
+
+pytest.importorskip("cbor2")
+
+
+def test_trace_file_roundtrip(tmp_path):
+    path = tmp_path / "traces.vxt"
+    writer = TraceWriter(path)
+    records = [{"t": 1.5, "session": "abc", "status": 200}, {"t": 2.0, "session": "def", "status": 429}]
+    for record in records:
+        writer.write(record)
+    writer.close()
+    assert path.read_bytes().startswith(MAGIC)
+    assert list(read_traces(path)) == records
+    assert writer.written == 2
+
+
+def test_truncated_last_record_is_ignored(tmp_path):
+    path = tmp_path / "traces.vxt"
+    writer = TraceWriter(path)
+    writer.write({"n": 1})
+    writer.write({"n": 2})
+    writer.close()
+    path.write_bytes(path.read_bytes()[:-2])
+    assert list(read_traces(path)) == [{"n": 1}]
+
+
+def test_reopened_file_appends_without_a_second_header(tmp_path):
+    path = tmp_path / "traces.vxt"
+    for n in range(2):
+        writer = TraceWriter(path)
+        writer.write({"n": n})
+        writer.close()
+    assert [r["n"] for r in read_traces(path)] == [0, 1]
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"nope")
+    with pytest.raises(ValueError):
+        list(read_traces(path))
+
+
+def test_prompt_shape_hides_text():
+    shape = prompt_shape("Open  the Door", salt=b"s")
+    assert shape["prompt_chars"] == 14
+    assert shape["prompt_words"] == 3
+    assert shape["prompt_hash"] == prompt_shape("open the door", salt=b"s")["prompt_hash"]
+    assert shape["prompt_hash"] != prompt_shape("open the door", salt=b"t")["prompt_hash"]
+    assert "door" not in repr(shape).lower()
+
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+async def handler(scope, receive, send):
+    await receive()
+    traffic.note(prompt="look around", response="You see a door.", llm_ms=12.0)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def run_request(middleware, headers=(), query=b"", client=("10.0.0.1", 1234)):
+    scope = {"type": "http", "method": "POST", "path": "/api/gm", "headers": list(headers),
+             "query_string": query, "client": client}
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"prompt": "look around"}'}
+
+    async def send(message):
+        pass
+
+    asyncio.run(middleware(scope, receive, send))
+
+
+def test_middleware_records_anonymized_trace():
+    writer = ListWriter()
+    run_request(TrafficRecorderMiddleware(handler, writer, salt="s"), headers=[(b"x-session-id", b"browser-1")])
+    (trace,) = writer.records
+    assert trace["status"] == 200
+    assert trace["req_bytes"] == 25 and trace["res_bytes"] == 2
+    assert trace["prompt_words"] == 2 and trace["response_chars"] == 15
+    assert "prompt" not in trace and "response" not in trace
+
+
+def test_session_hash_prefers_the_browser_id():
+    writer = ListWriter()
+    middleware = TrafficRecorderMiddleware(handler, writer, salt="s")
+    run_request(middleware, headers=[(b"x-session-id", b"browser-1")], client=("10.0.0.1", 1))
+    run_request(middleware, query=b"session=browser-1", client=("10.0.0.2", 2))
+    run_request(middleware, headers=[(b"x-session-id", b"browser-2")], client=("10.0.0.1", 1))
+    run_request(middleware, client=("10.0.0.1", 1))
+    sessions = [r["session"] for r in writer.records]
+    assert sessions[0] == sessions[1]
+    assert len(set(sessions)) == 3
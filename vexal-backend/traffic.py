@@ -0,0 +1,238 @@
+# traffic.py
+# Anonymized traffic traces for capacity planning.
+#
+# TrafficRecorderMiddleware (ASGI) records one trace per request to the recorded
+# paths: arrival time, salted session hash, method, path, status, wall time and
+# body sizes. Handlers add turn details through note() (prompt, response, LLM
+# latency). Text never reaches the file: the middleware reduces a prompt to its
+# length, word count and a salted hash, and a response to its length, so replay
+# can reproduce request shapes and repeated commands without storing what
+# players typed.
+#
+# File format: a 4-byte magic, then records of a uint32 length + CBOR map.
+# Records go through an in-process queue to a writer thread, so disk I/O stays
+# off the request path (as in log_config). Read with read_traces().
+import contextvars
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import random
+import struct
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from serialization import from_cbor, to_cbor
+
+_log = logging.getLogger("vexal.traffic")
+
+MAGIC = b"VXT1"
+_LEN = struct.Struct("<I")
+DEFAULT_PATHS = ("/api/gm",)
+
+_current = contextvars.ContextVar("vexal_traffic_trace", default=None)
+
+
+def note(**fields):
+    """
+    Attach fields to the trace of the request being handled (no-op when not recording).
+    `prompt` and `response` text are anonymized before the trace is written.
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.update(fields)
+
+
+def prompt_shape(prompt, salt=b""):
+    """Anonymized stand-in for a prompt: length, word count and a salted hash of its normalized text."""
+    normalized = " ".join(prompt.lower().split())
+    digest = hmac.new(salt, normalized.encode(), hashlib.sha256).hexdigest()[:12]
+    return {"prompt_chars": len(prompt), "prompt_words": len(normalized.split()), "prompt_hash": digest}
+
+
+# ----------------- file format -----------------
+class TraceWriter:
+    """Append-only trace file fed by a background thread."""
+
+    def __init__(self, path, flush_every=64):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="traffic-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "ab") as fh:
+            if new:
+                fh.write(MAGIC)
+            pending = 0
+            while True:
+                try:
+                    record = self._queue.get(timeout=1.0)
+                except queue.Empty:
+                    if pending:
+                        fh.flush()
+                        pending = 0
+                    continue
+                if record is None:
+                    break
+                try:
+                    blob = to_cbor(record)
+                except Exception as exc:
+                    self.dropped += 1
+                    _log.warning("Dropped unserializable trace: %s", exc)
+                    continue
+                fh.write(_LEN.pack(len(blob)) + blob)
+                self.written += 1
+                pending += 1
+                if pending >= self.flush_every:
+                    fh.flush()
+                    pending = 0
+
+
+def read_traces(path):
+    """Yield the trace records of `path` in recording order (a truncated last record is ignored)."""
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a traffic trace file")
+        while True:
+            header = fh.read(_LEN.size)
+            if len(header) < _LEN.size:
+                return
+            (size,) = _LEN.unpack(header)
+            blob = fh.read(size)
+            if len(blob) < size:
+                return
+            yield from_cbor(blob)
+
+
+# ----------------- middleware -----------------
+class TrafficRecorderMiddleware:
+    """
+    ASGI middleware recording requests to `paths`. `sample_rate` keeps a fraction of
+    sessions (whole sessions, so replayed sessions keep their turn sequences).
+    """
+
+    def __init__(self, app, writer, paths=DEFAULT_PATHS, sample_rate=1.0, salt=None):
+        self.app = app
+        self.writer = writer
+        self.paths = frozenset(paths)
+        self.sample_rate = sample_rate
+        # Without a configured salt, hashes are only comparable within one process lifetime.
+        self.salt = salt.encode() if isinstance(salt, str) else (salt or os.urandom(16))
+
+    def _session_hash(self, scope):
+        # The frontend sends its per-browser id as X-Session-Id (?session= where it can't
+        # set headers); the peer address is only a fallback for other clients.
+        session = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-session-id":
+                session = value
+                break
+        if session is None:
+            session = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("session", [""])[0].encode() or None
+        if session is None:
+            client = scope.get("client")
+            session = (client[0] if client else "unknown").encode()
+        return hmac.new(self.salt, session, hashlib.sha256).hexdigest()[:16]
+
+    def _sampled(self, session_hash):
+        return self.sample_rate >= 1.0 or int(session_hash[:8], 16) / 0xFFFFFFFF < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        session = self._session_hash(scope)
+        if not self._sampled(session):
+            return await self.app(scope, receive, send)
+
+        trace = {"t": round(time.time(), 3), "session": session, "method": scope["method"],
+                 "path": scope["path"], "status": None, "req_bytes": 0, "res_bytes": 0}
+        t0 = time.perf_counter()
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                trace["req_bytes"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                trace["status"] = message["status"]
+                trace["ttfb_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            elif message["type"] == "http.response.body":
+                trace["res_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        token = _current.set(trace)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            _current.reset(token)
+            trace["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            if "prompt" in trace:
+                trace.update(prompt_shape(str(trace.pop("prompt")), self.salt))
+            if "response" in trace:
+                trace["response_chars"] = len(str(trace.pop("response")))
+            self.writer.write(trace)
+
+
+def recorder_options():
+    """
+    TrafficRecorderMiddleware keyword arguments from the environment, or None when
+    TRAFFIC_TRACE_PATH is unset. TRAFFIC_TRACE_SAMPLE (1.0), TRAFFIC_TRACE_PATHS
+    (/api/gm, comma-separated), TRAFFIC_TRACE_SALT (random per process).
+    """
+    path = os.getenv("TRAFFIC_TRACE_PATH")
+    if not path:
+        return None
+    paths = [p.strip() for p in os.getenv("TRAFFIC_TRACE_PATHS", ",".join(DEFAULT_PATHS)).split(",") if p.strip()]
+    sample_rate = float(os.getenv("TRAFFIC_TRACE_SAMPLE", "1.0"))
+    _log.info("Recording traffic traces", extra={"path": path, "paths": paths, "sample": sample_rate})
+    return {"writer": TraceWriter(path), "paths": paths, "sample_rate": sample_rate,
+            "salt": os.getenv("TRAFFIC_TRACE_SALT")}
+
+
+# ----------------- replay helpers -----------------
+def synthetic_prompt(chars, rng=random):
+    """A harmless prompt of about `chars` characters, standing in for a recorded one."""
+    words = ("look", "around", "the", "room", "and", "search", "for", "a", "hidden", "door", "then", "wait")
+    out, size = [], 0
+    while size < max(1, chars):
+        word = rng.choice(words)
+        out.append(word)
+        size += len(word) + 1
+    return " ".join(out)[:max(1, chars)]
+
+
+class EmpiricalDistribution:
+    """Resamples recorded values (e.g. LLM latencies) with their original distribution."""
+
+    def __init__(self, values, default=0.0):
+        self.values = sorted(v for v in values if v is not None)
+        self.default = default
+
+    def __len__(self):
+        return len(self.values)
+
+    def sample(self, rng=random):
+        return rng.choice(self.values) if self.values else self.default
+
+    def percentile(self, q):
+        if not self.values:
+            return self.default
+        return self.values[min(len(self.values) - 1, int(len(self.values) * q))]
@@ -0,0 +1,234 @@
+# tts.py
+# Server-side text-to-speech for GM narration.
+#
+# Narrative is split into sentence chunks that are synthesized concurrently and
+# streamed in order as soon as each is ready. Audio is cached on disk by content
+# hash (engine + voice + text) in an LRU bounded by size, so repeated lines
+# (static-mode responses, stock phrases) are never synthesized twice.
+#
+# Engines:
+#   GoogleTTSEngine - google-cloud-texttospeech (optional dependency), MP3 output
+#   StubTTSEngine   - offline, deterministic raw PCM tones for tests and local runs
+# Both produce formats whose chunks can be concatenated into one stream.
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from google.cloud import texttospeech
+except ImportError:  # optional: StubTTSEngine works without it
+    texttospeech = None
+
+_log = logging.getLogger("vexal.tts")
+
+MAX_CHUNK_CHARS = 400
+MIN_CHUNK_CHARS = 40
+_SENTENCE_RX = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"')\]])\s+")
+
+
+def split_sentences(text, max_chars=MAX_CHUNK_CHARS, min_chars=MIN_CHUNK_CHARS):
+    """
+    Split narrative into sentence chunks of at most `max_chars`. Sentences shorter
+    than `min_chars` are merged with the next one, so the first chunk (and the
+    first audio) stays small; an over-long sentence is cut at its last space.
+    """
+    text = " ".join(str(text or "").split())
+    chunks, current = [], ""
+    for sentence in _SENTENCE_RX.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and (len(current) >= min_chars or len(current) + 1 + len(sentence) > max_chars):
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ----------------- engines -----------------
+class GoogleTTSEngine:
+    media_type = "audio/mpeg"
+
+    def __init__(self, voice="en-US-Neural2-D", language_code="en-US", speaking_rate=1.0):
+        if texttospeech is None:
+            raise RuntimeError("google-cloud-texttospeech is not installed")
+        self.voice = voice
+        self.language_code = language_code
+        self.speaking_rate = speaking_rate
+        self.client = texttospeech.TextToSpeechClient()
+        self.cache_key = f"google:{language_code}:{voice}:{speaking_rate}"
+
+    def synthesize(self, text):
+        response = self.client.synthesize_speech(
+            input=texttospeech.SynthesisInput(text=text),
+            voice=texttospeech.VoiceSelectionParams(language_code=self.language_code, name=self.voice),
+            audio_config=texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3,
+                                                  speaking_rate=self.speaking_rate),
+        )
+        return response.audio_content
+
+
+class StubTTSEngine:
+    """Offline engine: a short 16-bit mono tone per chunk, its length and pitch derived from the text."""
+    sample_rate = 16000
+    media_type = f"audio/L16;rate={sample_rate};channels=1"
+    cache_key = "stub:v1"
+
+    def __init__(self, ms_per_char=20):
+        self.ms_per_char = ms_per_char
+
+    def synthesize(self, text):
+        n = self.sample_rate * len(text) * self.ms_per_char // 1000
+        freq = 220 + int(hashlib.md5(text.encode("utf-8")).hexdigest()[:2], 16)
+        step = 2 * math.pi * freq / self.sample_rate
+        # L16 is big-endian PCM.
+        return struct.pack(f">{n}h", *(int(8000 * math.sin(step * i)) for i in range(n)))
+
+
+def pcm_to_wav(pcm, sample_rate=StubTTSEngine.sample_rate):
+    """Wrap big-endian 16-bit mono PCM (L16) in a WAV container for players that need one."""
+    data = struct.pack(f"<{len(pcm) // 2}h", *struct.unpack(f">{len(pcm) // 2}h", pcm))
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(data), b"WAVE", b"fmt ", 16, 1, 1,
+                         sample_rate, sample_rate * 2, 2, 16, b"data", len(data))
+    return header + data
+
+
+# ----------------- cache -----------------
+class AudioCache:
+    """Disk LRU of synthesized chunks: one file per content hash, evicted past `max_bytes`."""
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> size, least recently used first
+        self._bytes = 0
+        for path in sorted(self.dir.glob("*.audio"), key=lambda p: p.stat().st_mtime):
+            self._entries[path.stem] = path.stat().st_size
+            self._bytes += self._entries[path.stem]
+
+    @staticmethod
+    def key(engine, text):
+        return hashlib.sha256(f"{engine.cache_key}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.dir / f"{key}.audio"
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            path = self._path(key)
+            os.utime(path)   # keeps LRU order across restarts
+            return path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._entries.pop(key, 0)
+            return None
+
+    def put(self, key, audio):
+        path = self._path(key)
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(audio) - self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self._path(old).unlink(missing_ok=True)
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+# ----------------- pipeline -----------------
+class TTSPipeline:
+    """
+    Chunk, synthesize concurrently (at most `max_concurrent` engine calls) and cache.
+    stream() runs chunks on the pipeline's own threads, so queued synthesis never
+    occupies the event loop's default executor (LLM calls, event-log I/O).
+    """
+
+    def __init__(self, engine, cache=None, max_concurrent=4):
+        self.engine = engine
+        self.cache = cache
+        self.media_type = engine.media_type
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="tts")
+
+    def chunk_audio(self, text):
+        key = AudioCache.key(self.engine, text) if self.cache is not None else None
+        if key is not None:
+            audio = self.cache.get(key)
+            if audio is not None:
+                return audio
+        with self._slots:
+            audio = self.engine.synthesize(text)
+        if key is not None:
+            self.cache.put(key, audio)
+        return audio
+
+    async def stream(self, text):
+        """Yield audio per chunk, in order; all chunks are synthesized concurrently."""
+        loop = asyncio.get_running_loop()
+        tasks = [loop.run_in_executor(self._executor, self.chunk_audio, chunk) for chunk in split_sentences(text)]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def synthesize(self, text):
+        """Whole narrative as one audio blob (blocking), for callers that cannot stream."""
+        chunks = split_sentences(text)
+        if len(chunks) <= 1:
+            return b"".join(self.chunk_audio(c) for c in chunks)
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), 8)) as pool:
+            return b"".join(pool.map(self.chunk_audio, chunks))
+
+
+def create_pipeline(engine=None, cache_dir=None, cache_mb=None):
+    """
+    Pipeline configured from the environment: TTS_ENGINE (google|stub, default google,
+    falling back to stub if the client library is missing), TTS_VOICE, TTS_CACHE_DIR, TTS_CACHE_MB.
+    """
+    engine = engine or os.getenv("TTS_ENGINE", "google")
+    if engine == "google" and texttospeech is None:
+        _log.warning("google-cloud-texttospeech is not installed; using the stub TTS engine")
+        engine = "stub"
+    if engine == "google":
+        tts_engine = GoogleTTSEngine(voice=os.getenv("TTS_VOICE", "en-US-Neural2-D"))
+    else:
+        tts_engine = StubTTSEngine()
+    cache_dir = cache_dir or os.getenv("TTS_CACHE_DIR", "/tmp/vexal-tts-cache")
+    cache_mb = cache_mb if cache_mb is not None else int(os.getenv("TTS_CACHE_MB", "256"))
+    cache = AudioCache(cache_dir, cache_mb * 1024 * 1024) if cache_mb > 0 else None
+    return TTSPipeline(tts_engine, cache)
@@ -0,0 +1,341 @@
+# world_tick.py
+# Background world simulation: advances game time, pool regeneration, condition
+# drains and condition expiry for every active session at once.
+#
+# Sessions are held as a struct of numpy arrays (one row per session) so one
+# tick is a handful of vectorized operations regardless of session count.
+# Usable as an asyncio task inside the FastAPI app (run_world_ticks) or as a
+# standalone process:  python world_tick.py [--bench]
+#
+# A row remembers the values it was loaded with (upsert), and apply_to() merges
+# only what the ticks changed since then into a freshly loaded state, so edits made
+# by turns in between are kept rather than overwritten with the row's copy.
+import asyncio
+import logging
+import time
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from conditions import CONDITION_EFFECTS
+from state_model import CONDITION_NAMES, POOL_KEYS
+
+_log = logging.getLogger("vexal.world_tick")
+
+EPOCH = datetime(1000, 1, 1, 8, 0)
+# Base regeneration per in-game hour, before condition modifiers.
+REGEN_PER_HOUR = {"hp": 1.0, "mana": 2.0, "stamina": 3.0}
+# Cap used when a state has no "<pool>_max" (the API player doc starts as {hp, mana, stamina}).
+DEFAULT_POOL_MAX = {"hp_max": 100.0, "mana_max": 50.0, "stamina_max": 30.0}
+
+# Per-condition effect columns, aligned with CONDITION_NAMES / state_model bit order.
+_STAMINA_DRAIN = np.array([CONDITION_EFFECTS[c]["effects"].get("stamina_drain", 0) for c in CONDITION_NAMES], dtype=np.float64)
+_MANA_REGEN = np.array([CONDITION_EFFECTS[c]["effects"].get("mana_regen", 1.0) for c in CONDITION_NAMES], dtype=np.float64)
+_HP_MAX_PENALTY = np.array([CONDITION_EFFECTS[c]["effects"].get("hp_max_penalty", 0) for c in CONDITION_NAMES], dtype=np.float64)
+_POOL_PENALTY = np.array([CONDITION_EFFECTS[c]["effects"].get("pool_penalty", 0) for c in CONDITION_NAMES], dtype=np.float64)
+_COND_INDEX = {name: i for i, name in enumerate(CONDITION_NAMES)}
+_NO_TIMER = np.inf
+
+
+def _pool_source(gs):
+    """Pools live at the top level in the Streamlit state and under "player" in the API doc."""
+    player = gs.get("player")
+    if isinstance(player, Mapping) and any(k in player for k in POOL_KEYS):
+        return player
+    return gs
+
+
+class WorldState:
+    """Struct-of-arrays view of all active sessions; rows are reused when sessions leave."""
+
+    def __init__(self, capacity=1024):
+        self.ids = []
+        self.index = {}
+        self.last_upsert = {}   # session_id -> time.monotonic() of its last upsert
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old = getattr(self, "pools", None)
+        n = len(self.ids)
+        pools = np.zeros((capacity, len(POOL_KEYS)), dtype=np.float64)
+        hours = np.zeros(capacity, dtype=np.float64)
+        hours_per_turn = np.full(capacity, 6.0)
+        timers = np.full((capacity, len(CONDITION_NAMES)), _NO_TIMER)
+        active = np.zeros((capacity, len(CONDITION_NAMES)), dtype=bool)
+        # Values as of the last upsert; apply_to merges the difference.
+        base_pools = np.zeros_like(pools)
+        base_hours = np.zeros_like(hours)
+        base_active = np.zeros_like(active)
+        if old is not None:
+            for new, cur in ((pools, self.pools), (hours, self.hours), (hours_per_turn, self.hours_per_turn),
+                             (timers, self.timers), (active, self.active), (base_pools, self.base_pools),
+                             (base_hours, self.base_hours), (base_active, self.base_active)):
+                new[:n] = cur[:n]
+        self.pools, self.hours, self.hours_per_turn = pools, hours, hours_per_turn
+        self.timers, self.active = timers, active
+        self.base_pools, self.base_hours, self.base_active = base_pools, base_hours, base_active
+
+    def _arrays(self):
+        return (self.pools, self.hours, self.hours_per_turn, self.timers, self.active,
+                self.base_pools, self.base_hours, self.base_active)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ----------------- session registry -----------------
+    def upsert(self, session_id, gs, condition_timers=None):
+        """
+        Load (or refresh) a session row from its game_state dict, which should be the
+        state as persisted (apply_to later merges the ticks since this call).
+        condition_timers: {name: turns_left}, else {"timer": n} values inside conditions are used.
+        A missing "<pool>_max" keeps the row's previous cap, else DEFAULT_POOL_MAX.
+        """
+        row = self.index.get(session_id)
+        known = row is not None
+        if not known:
+            row = len(self.ids)
+            if row >= len(self.hours):
+                self._alloc(max(16, 2 * len(self.hours)))
+            self.ids.append(session_id)
+            self.index[session_id] = row
+        self.last_upsert[session_id] = time.monotonic()
+        src = _pool_source(gs)
+        values = [float(src.get(k, 0) or 0) for k in POOL_KEYS]
+        for i in range(1, len(POOL_KEYS), 2):
+            key = POOL_KEYS[i]
+            if key not in src:
+                values[i] = self.pools[row, i] if known else max(DEFAULT_POOL_MAX[key], values[i - 1])
+        self.pools[row] = values
+        try:
+            dt = datetime.fromisoformat(gs.get("game_datetime"))
+        except Exception:
+            dt = EPOCH
+        self.hours[row] = (dt - EPOCH).total_seconds() / 3600.0
+        self.hours_per_turn[row] = float(gs.get("hours_per_turn", 6) or 6)
+        self.active[row] = False
+        self.timers[row] = _NO_TIMER
+        conditions = gs.get("conditions", src.get("conditions", {})) or {}
+        timers = condition_timers or {}
+        for name, value in conditions.items():
+            i = _COND_INDEX.get(name)
+            if i is None:
+                continue
+            self.active[row, i] = True
+            turns = timers.get(name, value.get("timer") if isinstance(value, Mapping) else None)
+            if turns is not None:
+                self.timers[row, i] = float(turns)
+        self.base_pools[row] = self.pools[row]
+        self.base_hours[row] = self.hours[row]
+        self.base_active[row] = self.active[row]
+        return row
+
+    def remove(self, session_id):
+        """Drop a session by moving the last row into its slot."""
+        row = self.index.pop(session_id)
+        self.last_upsert.pop(session_id, None)
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            for arr in self._arrays():
+                arr[row] = arr[last]
+            self.ids[row] = moved
+            self.index[moved] = row
+        self.ids.pop()
+
+    def evict_idle(self, max_idle_s, keep=None):
+        """Remove sessions not upserted for `max_idle_s` seconds (unless `keep(session_id)`); returns their ids."""
+        cutoff = time.monotonic() - max_idle_s
+        idle = [sid for sid, seen in self.last_upsert.items() if seen < cutoff and not (keep and keep(sid))]
+        for sid in idle:
+            self.remove(sid)
+        return idle
+
+    def export(self, session_id):
+        """
+        Return {"pools", "game_datetime", "conditions", "condition_timers"} for one session,
+        ready to merge back into its game_state (see apply_to).
+        """
+        row = self.index[session_id]
+        active = [CONDITION_NAMES[i] for i in np.flatnonzero(self.active[row])]
+        return {
+            "pools": {k: int(v) if float(v).is_integer() else round(float(v), 2)
+                      for k, v in zip(POOL_KEYS, self.pools[row])},
+            "game_datetime": (EPOCH + timedelta(hours=float(self.hours[row]))).isoformat(),
+            "conditions": active,
+            "condition_timers": {c: int(np.ceil(self.timers[row, _COND_INDEX[c]]))
+                                 for c in active if np.isfinite(self.timers[row, _COND_INDEX[c]])},
+        }
+
+    def apply_to(self, session_id, gs):
+        """
+        Merge what the ticks changed since the last upsert of `session_id` into its
+        game_state dict in place: pool regeneration/drain is added to the pools in `gs`
+        (clamped to their caps), game time advanced, and conditions that expired since
+        then removed. Values `gs` gained in the meantime are kept.
+        """
+        row = self.index.get(session_id)
+        if row is None:
+            return gs
+        src = _pool_source(gs)
+        gained = self.pools[row] - self.base_pools[row]
+        for i in range(0, len(POOL_KEYS), 2):
+            key, max_key = POOL_KEYS[i], POOL_KEYS[i + 1]
+            if key not in src or not gained[i]:
+                continue
+            cap = float(src.get(max_key, self.pools[row, i + 1]) or 0)
+            current = float(src[key] or 0)
+            # Regeneration stops at the cap, but never lowers a pool that is already above it.
+            value = max(0.0, min(current + gained[i], max(cap, current)))
+            src[key] = int(value) if value.is_integer() else round(value, 2)
+        hours = self.hours[row] - self.base_hours[row]
+        if hours:
+            try:
+                dt = datetime.fromisoformat(gs.get("game_datetime"))
+            except Exception:
+                dt = EPOCH
+            gs["game_datetime"] = (dt + timedelta(hours=float(hours))).isoformat()
+        expired = self.base_active[row] & ~self.active[row]
+        conditions = gs.get("conditions", src.get("conditions"))
+        if conditions and expired.any():
+            for i in np.flatnonzero(expired):
+                conditions.pop(CONDITION_NAMES[i], None)
+        return gs
+
+    # ----------------- simulation -----------------
+    def tick(self, hours=1.0):
+        """Advance every session by `hours` of in-game time."""
+        n = len(self.ids)
+        if not n:
+            return 0
+        pools = self.pools[:n]
+        active = self.active[:n]
+        activef = active.astype(np.float64)
+
+        self.hours[:n] += hours
+
+        # Condition modifiers: additive drains/penalties are a matrix product,
+        # multiplicative regen factors a product over the active columns.
+        drain = activef @ _STAMINA_DRAIN
+        mana_mult = np.prod(np.where(active, _MANA_REGEN, 1.0), axis=1)
+        hp_cap = np.maximum(pools[:, 1] + activef @ _HP_MAX_PENALTY, 1.0)
+        pool_penalty = activef @ _POOL_PENALTY
+
+        pools[:, 0] = np.clip(pools[:, 0] + REGEN_PER_HOUR["hp"] * hours, 0.0, hp_cap)
+        pools[:, 2] = np.clip(pools[:, 2] + REGEN_PER_HOUR["mana"] * mana_mult * hours,
+                              0.0, np.maximum(pools[:, 3] + pool_penalty, 0.0))
+        pools[:, 4] = np.clip(pools[:, 4] + (REGEN_PER_HOUR["stamina"] - drain) * hours,
+                              0.0, np.maximum(pools[:, 5] + pool_penalty, 0.0))
+
+        # Timers count turns; a tick of `hours` is hours / hours_per_turn turns.
+        timers = self.timers[:n]
+        timers -= (hours / self.hours_per_turn[:n])[:, None]
+        expired = active & (timers <= 0)
+        if expired.any():
+            active[expired] = False
+            timers[expired] = _NO_TIMER
+        return n
+
+
+# ----------------- runners -----------------
+async def run_world_ticks(world, interval_s=5.0, hours_per_tick=1.0, stop_event=None, on_tick=None):
+    """
+    Tick `world` every `interval_s` seconds until cancelled or `stop_event` is set.
+    `on_tick(world)` (a coroutine function) runs after each tick, e.g. to push updates.
+    """
+    while stop_event is None or not stop_event.is_set():
+        t0 = time.perf_counter()
+        n = world.tick(hours_per_tick)
+        _log.debug("World tick", extra={"sample": "world_tick", "sessions": n,
+                                        "tick_ms": round((time.perf_counter() - t0) * 1000, 3)})
+        if on_tick is not None:
+            try:
+                await on_tick(world)
+            except Exception:
+                _log.exception("World tick callback failed")
+        await asyncio.sleep(interval_s)
+
+
+def _random_world(n, seed=0):
+    rng = np.random.default_rng(seed)
+    world = WorldState(capacity=n)
+    world.ids = [f"s{i}" for i in range(n)]
+    world.index = {sid: i for i, sid in enumerate(world.ids)}
+    maxes = rng.integers(50, 150, size=(n, 3)).astype(np.float64)
+    world.pools[:n, 1::2] = maxes
+    world.pools[:n, 0::2] = maxes * rng.random((n, 3))
+    world.active[:n] = rng.random((n, len(CONDITION_NAMES))) < 0.15
+    world.timers[:n] = np.where(world.active[:n], rng.integers(1, 10, size=(n, len(CONDITION_NAMES))), _NO_TIMER)
+    return world
+
+
+def benchmark(sizes=(1_000, 10_000, 100_000), ticks=50):
+    """Print ticks/sec and ms/tick for increasing session counts."""
+    for n in sizes:
+        world = _random_world(n)
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            world.tick(1.0)
+        elapsed = time.perf_counter() - t0
+        print(f"{n:>8} sessions: {ticks / elapsed:9.1f} ticks/s  {elapsed / ticks * 1000:8.2f} ms/tick")
+
+
+def tick_fields(gs):
+    """The fields of a game_state apply_to() may change, as Firestore update() paths."""
+    src = _pool_source(gs)
+    prefix = "player." if src is not gs else ""
+    fields = {prefix + k: src[k] for k in POOL_KEYS[0::2] if k in src}
+    if "game_datetime" in gs:
+        fields["game_datetime"] = gs["game_datetime"]
+    if "conditions" in gs:
+        fields["conditions"] = gs["conditions"]
+    elif "conditions" in src:
+        fields[prefix + "conditions"] = src["conditions"]
+    return fields
+
+
+async def run_firestore_worker(collection="sessions", interval_s=5.0, hours_per_tick=1.0):
+    """
+    Standalone mode: tick every document in a Firestore collection and merge the results
+    back. Each merge re-reads the document in a transaction and writes only the tick
+    fields, so a turn committed since the read is neither lost nor overwritten.
+    """
+    from google.cloud import firestore
+
+    db = firestore.Client()
+    world = WorldState()
+
+    @firestore.transactional
+    def merge(transaction, ref, sid):
+        gs = ref.get(transaction=transaction).to_dict()
+        if gs is not None:
+            transaction.update(ref, tick_fields(world.apply_to(sid, gs)))
+
+    while True:
+        docs = {snap.id: snap.to_dict() or {} for snap in db.collection(collection).stream()}
+        for sid in [sid for sid in world.ids if sid not in docs]:
+            world.remove(sid)
+        for sid, gs in docs.items():
+            world.upsert(sid, gs)
+        world.tick(hours_per_tick)
+        for sid in docs:
+            try:
+                merge(db.transaction(), db.collection(collection).document(sid), sid)
+            except Exception:
+                _log.exception("World tick merge failed", extra={"session": sid})
+        await asyncio.sleep(interval_s)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vexal world tick engine")
+    parser.add_argument("--bench", action="store_true", help="run the ticks/sec benchmark and exit")
+    parser.add_argument("--collection", default="sessions", help="Firestore collection holding session states")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between ticks")
+    parser.add_argument("--hours", type=float, default=1.0, help="in-game hours per tick")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark()
+    else:
+        asyncio.run(run_firestore_worker(args.collection, args.interval, args.hours))
@@ -1,6 +1,11 @@
 import { createApp } from "vue";
 import App from "./App.vue";
 import axios from "axios";
+import { loadConditionEffects } from "./utils/ConditionEffects";
+import { getSessionId } from "./utils/Session";
+
+// Every backend request carries this browser's session id (traces, per-player limits).
+axios.defaults.headers.common["X-Session-Id"] = getSessionId();
 
 const app = createApp(App);
 
@@ -18,4 +23,7 @@ app.config.globalProperties.$gameState = {
   },
 };
 
+// Fetch the shared condition/material catalog once at startup.
+loadConditionEffects();
+
 app.mount("#app");
\ No newline at end of file
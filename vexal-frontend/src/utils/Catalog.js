@@ -0,0 +1,69 @@
+import axios from "axios";
+
+// Game catalog (conditions, materials, skills) served by the backend's /api/catalog.
+// The backend definitions are the single source of truth; the catalog is cached
+// in localStorage by version and revalidated with its ETag.
+const CATALOG_URL = "http://127.0.0.1:8000/api/catalog";
+const STORAGE_KEY = "vexal_catalog";
+
+let catalog = null;
+let pending = null;
+
+function readCachedCatalog() {
+  try {
+    const raw = localStorage.getItem(STORAGE_KEY);
+    return raw ? JSON.parse(raw) : null;
+  } catch (error) {
+    return null;
+  }
+}
+
+async function fetchCatalog() {
+  const cached = readCachedCatalog();
+  try {
+    const response = await axios.get(CATALOG_URL, {
+      headers: cached ? { "If-None-Match": `"${cached.version}"` } : {},
+      validateStatus: (status) => status === 200 || status === 304,
+    });
+    if (response.status === 304 && cached) {
+      return cached;
+    }
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(response.data));
+    return response.data;
+  } catch (error) {
+    console.error("[Catalog] Failed to fetch catalog, using cached copy:", error);
+    return cached;
+  } finally {
+    pending = null;
+  }
+}
+
+/**
+ * Returns the catalog, fetching it once per page load.
+ */
+export async function loadCatalog() {
+  if (catalog) return catalog;
+  if (!pending) pending = fetchCatalog().then((data) => (catalog = data));
+  return pending;
+}
+
+/**
+ * Refetches the catalog when the backend reports a different version
+ * (e.g. the `catalog_version` field of /api/gm responses).
+ */
+export async function ensureCatalogVersion(version) {
+  if (catalog && catalog.version === version) return catalog;
+  catalog = null;
+  return loadCatalog();
+}
+
+/**
+ * Looks up a condition by name or by its numeric catalog id.
+ */
+export function getCondition(key) {
+  if (!catalog) return null;
+  if (typeof key === "number") {
+    return Object.values(catalog.conditions).find((c) => c.id === key) || null;
+  }
+  return catalog.conditions[key] || null;
+}
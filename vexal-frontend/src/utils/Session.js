@@ -0,0 +1,38 @@
+// Per-browser session id, sent to the backend as the X-Session-Id header (and as
+// ?session= where headers can't be set, e.g. EventSource). The backend keys
+// traffic traces, single-flight turns and, with SESSION_DOCS=header, the game
+// state document on it. Persisted in localStorage so a reload keeps the session.
+const STORAGE_KEY = "vexal_session_id";
+
+let sessionId = null;
+
+function newSessionId() {
+  if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+/**
+ * Returns this browser's session id, creating and storing it on first use.
+ */
+export function getSessionId() {
+  if (sessionId) return sessionId;
+  try {
+    sessionId = localStorage.getItem(STORAGE_KEY);
+    if (!sessionId) {
+      sessionId = newSessionId();
+      localStorage.setItem(STORAGE_KEY, sessionId);
+    }
+  } catch (error) {
+    // Storage disabled: the id lasts for this page load only.
+    sessionId = sessionId || newSessionId();
+  }
+  return sessionId;
+}
+
+/**
+ * Appends the session id to `url` as ?session= (for requests that can't carry headers).
+ */
+export function withSessionParam(url) {
+  const separator = url.includes("?") ? "&" : "?";
+  return `${url}${separator}session=${encodeURIComponent(getSessionId())}`;
+}
@@ -0,0 +1,31 @@
+// Applies game-state deltas produced by the backend (vexal-backend/state_sync.py).
+// A delta is a list of ops: ["set", [path...], value] or ["del", [path...]].
+
+export function applyDelta(state, ops) {
+  const next = structuredClone(state || {});
+  for (const [op, path, value] of ops) {
+    let node = next;
+    for (const key of path.slice(0, -1)) {
+      if (typeof node[key] !== "object" || node[key] === null) node[key] = {};
+      node = node[key];
+    }
+    const last = path[path.length - 1];
+    if (op === "set") {
+      node[last] = value;
+    } else {
+      delete node[last];
+    }
+  }
+  return next;
+}
+
+/**
+ * Resolves a /api/gm or /api/state payload into a full game state:
+ * full states are taken as-is, deltas are applied to `current`.
+ * Returns null when the payload carries no state.
+ */
+export function resolveStatePayload(current, payload) {
+  if (payload.game_state) return payload.game_state;
+  if (payload.delta) return applyDelta(current, payload.delta);
+  return null;
+}
@@ -0,0 +1,46 @@
+import { resolveStatePayload } from "./StatePatch";
+import { withSessionParam } from "./Session";
+
+// Live game-state push from the backend (/api/state/stream, server-sent events).
+// Replaces polling /api/state: committed deltas and world ticks arrive as they happen.
+const STREAM_URL = "http://127.0.0.1:8000/api/state/stream";
+
+function mergeWorldTick(state, tick) {
+  const next = structuredClone(state || {});
+  const pools = next.player && typeof next.player === "object" ? next.player : next;
+  for (const [key, value] of Object.entries(tick.pools || {})) {
+    if (key in pools) pools[key] = value;
+  }
+  if (tick.game_datetime) next.game_datetime = tick.game_datetime;
+  return next;
+}
+
+/**
+ * Subscribes to state changes. `getState` returns the current local state and
+ * `onState` receives each new full state. Returns a function that closes the stream.
+ */
+export function subscribeToState(getState, onState) {
+  let version = null;
+  // EventSource can't send headers: the session id goes in the query string.
+  const source = new EventSource(withSessionParam(STREAM_URL));
+
+  source.onmessage = (event) => {
+    const payload = JSON.parse(event.data);
+    if (payload.type === "world") {
+      onState(mergeWorldTick(getState(), payload));
+      return;
+    }
+    const next = resolveStatePayload(getState(), payload);
+    if (next) {
+      version = payload.state_version ?? version;
+      onState(next);
+    }
+  };
+
+  source.onerror = () => {
+    // EventSource reconnects on its own; the server re-sends a catch-up payload.
+    console.warn("[StateStream] Connection lost, reconnecting... (last version:", version, ")");
+  };
+
+  return () => source.close();
+}